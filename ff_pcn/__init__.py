@@ -5,10 +5,6 @@ Package applying theoretical results about extensions of finite fields to
 give computational results on existence of primitive complete normal basis generators.
 """
 
-import sys
-import os
-sys.path.append(os.path.abspath(os.path.join(__file__, '../../')))
-
 
 class ExistanceReason(object):
 
@@ -82,6 +78,25 @@ class ExistanceReasonNotExisting(ExistanceReason):
         return 'NO PCN exists for (%d, %d, %d)' % (self.checker.p, self.checker.e, self.checker.n)
 
 
+class ExistanceReasonSearchDeferred(ExistanceReason):
+
+    def __str__(self):
+        return '%s False deferred' % ExistanceReason.__str__(self)
+
+    def __repr__(self):
+        return 'Search for (%d, %d, %d) deferred, existence undecided' % (self.checker.p, self.checker.e, self.checker.n)
+
+
+class ExistanceReasonSearchPartial(ExistanceReason):
+
+    def __str__(self):
+        return '%s False partial %d' % (ExistanceReason.__str__(self), self.checker.search.candidates)
+
+    def __repr__(self):
+        return 'Search for (%d, %d, %d) stopped after %d candidates at %s' % (
+            self.checker.p, self.checker.e, self.checker.n, self.checker.search.candidates, self.checker.search.last)
+
+
 class ExistanceReasonNeedFactorization(ExistanceReason):
 
     def __init__(self, checker):
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+
+"""
+Module splitting cyclotomic numbers Phi_n(b) by algebraic identities,
+before the remaining cofactors are handed to a factoring program.
+
+Applied identities:
+  - Perfect powers b = c^k:
+    Phi_n(x^r) = Phi_nr(x) if prime r divides n, else Phi_nr(x) * Phi_n(x).
+  - Aurifeuillian factorizations b = s*t^2 with s squarefree:
+    Phi_n(s*y^2) = F(y) * F(-y) for some F in Z[y] if the Galois orbits of
+    the roots y = w^k / sqrt(s) (w = exp(i pi / n)) split into two halves.
+    This is the case e.g. if s = 1 mod 4 and n is an odd multiple of s or
+    s = 2, 3 mod 4 and n = 2s mod 4s.
+  - Intrinsic factors: all prime factors of Phi_m(c) not dividing m are 1 mod m,
+    the primes dividing m are divided out directly.
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+from ff_pcn.backend import cyclotomic_value, divisors, euler_phi, factor, gcd, moebius, prime_divisors, prod
+from ff_pcn.datastore import store
+
+
+def perfect_power(b):
+    """
+    Returns (c, k) with b = c^k and k maximal.
+    """
+    facs = factor(b)
+    k = 0
+    for _, m in facs:
+        k = gcd(k, m)
+    return prod(p**(m//k) for p, m in facs), k
+
+
+def power_split(n, c, k):
+    """
+    Returns list of m with Phi_n(c^k) = prod_m Phi_m(c).
+    """
+    ms = [n]
+    for r, l in factor(k):
+        for _ in range(l):
+            ms = [m*r for m in ms] + [m for m in ms if m % r != 0]
+    return sorted(ms)
+
+
+def squarefree_decomposition(b):
+    """
+    Returns (s, t) with b = s * t^2 and s squarefree.
+    """
+    s = 1
+    t = 1
+    for p, m in factor(b):
+        s *= p**(m % 2)
+        t *= p**(m // 2)
+    return s, t
+
+
+def _kronecker(D, a):
+    """
+    Returns the Kronecker symbol (D|a) for a > 0.
+    """
+    ret = 1
+    while a % 2 == 0:
+        a //= 2
+        if D % 2 == 0:
+            return 0
+        if D % 8 in (3, 5):
+            ret = -ret
+    D %= a
+    while D:
+        while D % 2 == 0:
+            D //= 2
+            if a % 8 in (3, 5):
+                ret = -ret
+        D, a = a, D
+        if D % 4 == 3 and a % 4 == 3:
+            ret = -ret
+        D %= a
+    return ret if a == 1 else 0
+
+
+def _ramanujan_sum(M, j):
+    """
+    Returns sum of zeta_M^(j*a) over units a mod M, i.e. Tr(zeta_M^j).
+    """
+    g = gcd(j, M)
+    return moebius(M//g) * euler_phi(M) // euler_phi(M//g)
+
+
+@store('aurifeuillian_polynomial')
+def aurifeuillian_polynomial(n, s):
+    """
+    Returns coefficients [f_0, f_1, ...] of F in Z[y] with
+    Phi_n(s*y^2) = +-F(y)*F(-y) or [] if no such F exists.
+
+    The roots w^k / sqrt(s) with k mod 2n, gcd(k, n) = 1, w = exp(i pi / n),
+    are split into their Galois orbits. F is computed exactly in the group ring
+    of the M-th roots of unity and the coefficients in Q(sqrt(s)) are
+    recovered by traces.
+    """
+    if s == 1 or n == 1:
+        return []
+    # Necessary: n an odd multiple of s if s = 1 mod 4, else n = 2s mod 4s
+    if n % s != 0 or (n//s) % (2 if s % 4 == 1 else 4) != (1 if s % 4 == 1 else 2):
+        return []
+    D = s if s % 4 == 1 else 4*s
+    M = 2*n*D // gcd(2*n, D)
+    units = [a for a in range(1, M) if gcd(a, M) == 1]
+    roots = [k for k in range(2*n) if gcd(k, n) == 1]
+
+    # Orbit of the root k = 1 under sigma_a: w^k/sqrt(s) -> w^(ak)/((D|a) sqrt(s))
+    orbit = set((a*1 + (n if _kronecker(D, a) == -1 else 0)) % (2*n) for a in units)
+    if len(orbit) != len(roots) // 2 or any((k + n) % (2*n) in orbit for k in orbit):
+        return []
+
+    # P(z) = prod_(k in orbit) (z - w^k) with coefficients in Z[C_M], w = g^(M/2n)
+    step = M // (2*n)
+    coeffs = [[1] + [0]*(M-1)]
+    for k in sorted(orbit):
+        shift = (k*step) % M
+        new = [[0]*M for _ in range(len(coeffs) + 1)]
+        for j, c in enumerate(coeffs):
+            row = new[j+1]
+            for i, v in enumerate(c):
+                row[i] += v
+            row = new[j]
+            for i, v in enumerate(c):
+                if v:
+                    row[(i + shift) % M] -= v
+        coeffs = new
+
+    # F(y) = prod (sqrt(s) y - w^k) = sum_j c_j s^(j/2) y^j
+    # even j: c_j rational, odd j: c_j * sqrt(s) rational, where
+    # sqrt(D) = sum_(a mod D) (D|a) zeta_D^a.
+    phiM = euler_phi(M)
+    trace = [_ramanujan_sum(M, j) for j in range(M)]
+    trace_sqrt = [
+        sum(_kronecker(D, a) * trace[(j + a*(M//D)) % M] for a in range(1, D) if gcd(a, D) == 1)
+        for j in range(M)
+    ]
+    sqrt_factor = 1 if D == s else 2
+    ret = []
+    for j, c in enumerate(coeffs):
+        if j % 2 == 0:
+            num = sum(v*trace[i] for i, v in enumerate(c) if v) * s**(j//2)
+            den = phiM
+        else:
+            num = sum(v*trace_sqrt[i] for i, v in enumerate(c) if v) * s**(j//2)
+            den = phiM * sqrt_factor
+        if num % den != 0:
+            return []
+        ret += [num // den]
+    return ret
+
+
+def _eval(coeffs, y):
+    ret = 0
+    for c in reversed(coeffs):
+        ret = ret*y + c
+    return ret
+
+
+def aurifeuillian_split(n, b):
+    """
+    Returns (L, M) with Phi_n(b) = L * M given by an Aurifeuillian
+    factorization or None.
+    """
+    s, t = squarefree_decomposition(b)
+    F = aurifeuillian_polynomial(n, s)
+    if not F:
+        return None
+    L, M = abs(_eval(F, t)), abs(_eval(F, -t))
+    if L == 1 or M == 1 or L*M != cyclotomic_value(n, b):
+        return None
+    return tuple(sorted((L, M)))
+
+
+def intrinsic_factors(m, num):
+    """
+    Returns (factorization, cofactor) where factorization contains the
+    primes dividing m and num.
+    """
+    facs = []
+    for r in prime_divisors(m):
+        mul = 0
+        while num % r == 0:
+            num //= r
+            mul += 1
+        if mul:
+            facs += [(r, mul)]
+    return facs, num
+
+
+def algebraic_factors(n, b):
+    """
+    Splits Phi_n(b) algebraically.
+
+    Returns (factorization, cofactors), where factorization is a list of
+    (prime, multiplicity) and cofactors is a list of (m, c, cofactor)
+    with cofactor > 1 a divisor of Phi_m(c), such that
+    Phi_n(b) = prod(factorization) * prod(cofactors).
+    """
+    c, k = perfect_power(b)
+    facs = []
+    cofactors = []
+    for m in power_split(n, c, k):
+        num = cyclotomic_value(m, c)
+        intrinsic, num = intrinsic_factors(m, num)
+        facs += intrinsic
+        if num == 1:
+            continue
+        split = aurifeuillian_split(m, c)
+        if split is None:
+            cofactors += [(m, c, num)]
+            continue
+        for part in split:
+            g = gcd(part, num)
+            num //= g
+            if g > 1:
+                cofactors += [(m, c, g)]
+        if num > 1:
+            cofactors += [(m, c, num)]
+    return facs, cofactors
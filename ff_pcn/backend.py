@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""
+Module selecting the backend for the integer primitives of the criteria path.
+
+By default the pure python implementation of ff_pcn.pure_number_theory is used,
+so that criteria 1-5 run without loading Sage. Setting the environment variable
+FF_PCN_BACKEND=sage uses Sage for all primitives instead.
+Sage is loaded lazily by `sage()` where field arithmetic is needed (criterion 6).
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import os
+
+from ff_pcn.pure_number_theory import log
+
+
+BACKEND = os.environ.get('FF_PCN_BACKEND', 'pure')
+"""Name of the active backend: 'pure' or 'sage'."""
+
+
+if BACKEND == 'sage':
+    from sage.all import (
+        Integer,
+        cyclotomic_polynomial,
+        divisors,
+        euler_phi,
+        factor,
+        gcd,
+        is_prime,
+        lcm,
+        moebius,
+        prime_divisors,
+        primes,
+        prod,
+        uniq,
+    )
+
+    def cyclotomic_value(n, b):
+        """
+        Returns Phi_n(b).
+        """
+        return cyclotomic_polynomial(n)(b)
+elif BACKEND == 'pure':
+    from ff_pcn.pure_number_theory import (
+        Integer,
+        cyclotomic_value,
+        divisors,
+        euler_phi,
+        factor,
+        gcd,
+        is_prime,
+        lcm,
+        moebius,
+        prime_divisors,
+        primes,
+        prod,
+        uniq,
+    )
+else:
+    raise ImportError('Unknown backend FF_PCN_BACKEND=%s' % BACKEND)
+
+
+def sage():
+    """
+    Returns the module sage.all, which is imported on first call.
+    """
+    import sage.all
+    return sage.all
@@ -7,21 +7,17 @@ Module coding basic number theoretical applications.
 __author__ = "Stefan Hackenberg"
 
 
-from sage.all import (
-    GF,
-    Hom,
+from ff_pcn.backend import (
     Integer,
-    cyclotomic_polynomial,
+    cyclotomic_value,
     divisors,
     factor,
     gcd,
-    is_prime,
-    moebius,
-    prime_divisors,
     prod,
     uniq,
 )
-from ff_pcn import MissingFactorsException
+from ff_pcn.datastore import store
+from ff_pcn.shared_tables import get_shared_tables
 
 
 def regular(p, e, n):
@@ -41,10 +37,14 @@ def is_regular(p, e, k, t, pi):
     return gcd(ordn(squarefree(k*p_free_part(t, p)), p**e), k*t*pi) == 1
 
 
+@store('squarefree')
 def squarefree(n):
     """
     Returns squarefree part of n. Also called nu(n).
     """
+    tables = get_shared_tables()
+    if tables is not None and 0 < n <= tables.sieve_bound:
+        return prod(p for p, _ in tables.factor(n))
     return prod(map(lambda x: x[0], factor(Integer(n))))
 
 
@@ -52,11 +52,19 @@ def ordn(m, q):
     """
     Computes ordn_m(q) = min{ k: q ** k = 1 mod m }
     """
+    tables = get_shared_tables()
+    if tables is not None and 0 < m <= tables.order_bound:
+        return tables.ordn(m, q)
+    return _ordn(m, q)
+
+
+@store('ordn', max_entries=100000)
+def _ordn(m, q):
     if m == 1 or q == 1:
         return 1
 
     q_ = q % m
-    for i in xrange(1, m+1):
+    for i in range(1, m+1):
         if q_ == 1:
             return i
         q_ = (q_ * q) % m
@@ -66,8 +74,8 @@ def p_free_part(t, p):
     """
     Computes the p-free part of t.
     """
-    while p.divides(t):
-        t /= p
+    while t % p == 0:
+        t //= p
     return t
 
 
@@ -76,9 +84,9 @@ def multiplicity(p, n):
     Returns multiplicity of p in n
     """
     a = 0
-    while p.divides(n):
+    while n % p == 0:
         a += 1
-        n = Integer(n/p)
+        n //= p
     return a
 
 
@@ -93,35 +101,22 @@ def factor_with_euler_phi(p, m, use_factorer=True):
     """
     Returns factorization of p**m-1 with p prime by using
     p**m-1 = prod_(d|m) Phi_d(p).
+
+    With use_factorer the factorizations of Phi_d(p) are obtained from the
+    factorer and the result is cached, see ff_pcn.power_factorizations.
     """
-    from ff_pcn.factorer import factorer
-    pm = p**m-1
-    factors = []
-    missing_factors = []
+    if use_factorer:
+        from ff_pcn.power_factorizations import get_power_factorization_store
+        return get_power_factorization_store().factor(p, m)
+    ret = {}
     for d in divisors(m):
-        phi = cyclotomic_polynomial(d)(p)
-        assert phi.divides(pm)
+        phi = cyclotomic_value(d, p)
         if phi == 1:
             continue
-        if use_factorer:
-            facs = factorer.get((d, p))
-        else:
-            facs = list(factor(phi))
-        factors += facs or []
-        if facs is None:
-            missing_factors += [(d, p, phi)]
-    if len(missing_factors) == 0:
-        ret = {}
-        for k, l in factors:
-            if k not in ret:
-                ret[k] = l
-            else:
-                ret[k] += l
-        assert prod(k**l for k, l in ret.items()) == p**m - 1
-        return sorted(ret.items())
-    else:
-        factorer.queue += missing_factors
-    raise MissingFactorsException(missing_factors)
+        for k, l in factor(phi):
+            ret[k] = ret.get(k, 0) + l
+    assert prod(k**l for k, l in ret.items()) == p**m - 1
+    return sorted(ret.items())
 
 
 def euler_phi(factorization):
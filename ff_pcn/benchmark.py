@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+
+"""
+Module benchmarking the PCN pipeline.
+
+Usage:
+    python ff_pcn/benchmark.py startup [--backends pure sage]
+    python ff_pcn/benchmark.py suite [--only ordn u_qn ...] [--output FILE] [--baseline FILE] [--save-baseline]
+
+The startup benchmark measures, per backend, the time a fresh worker needs to
+import the criteria path, the time to run criteria 1-3 on a fixed workload and
+the peak memory (RSS) of the worker.
+
+The suite runs fixed workloads of the hot paths with cold caches and a frozen
+factor database and compares the best times against a stored baseline.
+Every workload returns a checksum of its results, so changed results are
+reported as well.
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import argparse
+import collections
+import csv
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+
+ROOT_FOLDER = os.path.abspath(os.path.join(__file__, '../../'))
+
+RANGE_FOLDER = os.path.join(ROOT_FOLDER, 'final/range')
+
+BENCHMARK_BASELINE = os.path.abspath(os.path.join(__file__, '../benchmark_baseline.json'))
+
+HIGHLY_COMPOSITE = [120, 180, 240, 360, 720, 840]
+
+PCN_POLYNOM_ROWS = [(2, 120), (3, 120), (5, 60), (7, 48), (11, 36)]
+"""Rows (p, n) of final/range with large p^n and many divisors of n."""
+
+TOLERANCE = 0.2
+"""Relative deviation from baseline reported as regression or gain."""
+
+
+STARTUP_WORKER = '''
+import json
+import resource
+import time
+t0 = time.time()
+from ff_pcn.finite_field_extension import FiniteFieldExtension
+from ff_pcn.finite_field_theory import pens_to_check
+t1 = time.time()
+for n in range(%(start)d, %(stop)d):
+    for p, e, n in pens_to_check(n):
+        ff = FiniteFieldExtension(p, e, n)
+        ff.pcn_criterion_1() or ff.pcn_criterion_2() or ff.pcn_criterion_3()
+t2 = time.time()
+print(json.dumps({
+    'import_time': t1 - t0,
+    'criteria_time': t2 - t1,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'sage_loaded': 'sage' in __import__('sys').modules,
+}))
+'''
+
+
+def benchmark_startup(backend, start=100, stop=110, python=None):
+    """
+    Returns startup measurements of a fresh worker process using backend.
+    """
+    env = dict(os.environ, FF_PCN_BACKEND=backend)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT_FOLDER, env.get('PYTHONPATH')]))
+    out = subprocess.check_output(
+        [python or sys.executable, '-c', STARTUP_WORKER % {'start': start, 'stop': stop}],
+        env=env,
+    )
+    ret = json.loads(out.decode().splitlines()[-1])
+    ret['backend'] = backend
+    return ret
+
+
+def _checksum(result):
+    return hashlib.sha1(repr(result).encode()).hexdigest()[:16]
+
+
+_frozen_factorer = None
+
+
+def reset_caches():
+    """
+    Replaces all global caches by empty ones and installs the frozen factorer.
+    """
+    from ff_pcn import datastore, factorer, power_factorizations, prime_cache, shared_tables
+    global _frozen_factorer
+    if _frozen_factorer is None:
+        _frozen_factorer = factorer.Factorer(frozen=True)
+    factorer._factorer = _frozen_factorer
+    datastore._datastore = datastore.DataStore(path=None)
+    power_factorizations._store = power_factorizations.PowerFactorizationStore(path=None)
+    prime_cache._prime_cache = prime_cache.PrimeCache(path=None)
+    shared_tables.detach_shared_tables()
+
+
+def bench_ordn():
+    from ff_pcn.basic_number_theory import ordn
+    return sum(ordn(m, q) or 0 for m in range(2, 3000) for q in (2, 3, 4, 5, 7, 8, 9, 25, 27))
+
+
+def bench_essential_divisors():
+    from ff_pcn.backend import primes
+    from ff_pcn.finite_field_theory import essential_divisors
+    return [len(essential_divisors(p, 1, n)) for n in HIGHLY_COMPOSITE for p in primes(14)]
+
+
+def bench_u_qn():
+    from ff_pcn.backend import primes
+    from ff_pcn.finite_field_theory import u_qn
+    return _checksum([u_qn(p, 1, n) for n in HIGHLY_COMPOSITE for p in primes(14)])
+
+
+def bench_criteria(start=100, stop=201):
+    """
+    Cascade of criteria 1-5 as in CriterionChecker without the explicit search.
+    """
+    from ff_pcn import MissingFactorsException
+    from ff_pcn.finite_field_extension import FiniteFieldExtension
+    from ff_pcn.finite_field_theory import pens_to_check
+    ret = []
+    for n in range(start, stop):
+        for p, e, n in pens_to_check(n):
+            ff = FiniteFieldExtension(p, e, n)
+            crits = [ff.pcn_criterion_1(), ff.pcn_criterion_2(), ff.pcn_criterion_3()]
+            if not any(crits):
+                try:
+                    crits += [ff.pcn_criterion_4()]
+                except MissingFactorsException:
+                    crits += [None]
+            if not any(crits) and None not in crits:
+                crits += [ff.pcn_criterion_5()]
+            ret += [crits]
+    return _checksum(ret)
+
+
+def bench_criterion_checker(start=100, stop=201):
+    from ff_pcn.finite_field_theory import pens_to_check
+    from ff_pcn.pcn_existence_checker import CriterionChecker
+    checker = CriterionChecker([])
+    return _checksum([checker.check_criterions(p, e, n) for n in range(start, stop) for p, e, n in pens_to_check(n)])
+
+
+def bench_factor_with_euler_phi():
+    from ff_pcn import MissingFactorsException
+    from ff_pcn.backend import primes
+    from ff_pcn.basic_number_theory import factor_with_euler_phi
+    ret = []
+    for p in primes(60):
+        for m in range(1, 101):
+            try:
+                ret += [factor_with_euler_phi(p, m)]
+            except MissingFactorsException:
+                ret += [None]
+    return _checksum(ret)
+
+
+def bench_pcn_polynom():
+    from ff_pcn.finite_field_extension import FiniteFieldExtension
+    expected = dict()
+    for p, n in PCN_POLYNOM_ROWS:
+        with open(os.path.join(RANGE_FOLDER, 'pcns_%d.csv' % p)) as fil:
+            for row in csv.DictReader(fil):
+                if int(row['n']) == n:
+                    expected[(p, n)] = row['poly']
+    ret = []
+    for p, n in PCN_POLYNOM_ROWS:
+        ff = FiniteFieldExtension(p, 1, n)
+        ff.factor()
+        poly = str(ff.pcn_polynom())
+        assert poly == expected[(p, n)], (p, n, poly)
+        ret += [poly]
+    return _checksum(ret)
+
+
+BENCHMARKS = collections.OrderedDict([
+    ('ordn', bench_ordn),
+    ('essential_divisors', bench_essential_divisors),
+    ('u_qn', bench_u_qn),
+    ('criteria', bench_criteria),
+    ('criterion_checker', bench_criterion_checker),
+    ('factor_with_euler_phi', bench_factor_with_euler_phi),
+    ('pcn_polynom', bench_pcn_polynom),
+])
+
+
+def run_benchmark(name, repeat=3):
+    """
+    Runs benchmark name repeat times with cold caches.
+    Returns dict with best and all times and the checksum of the result.
+    """
+    times = []
+    try:
+        for _ in range(repeat):
+            reset_caches()
+            start = time.time()
+            result = BENCHMARKS[name]()
+            times += [time.time() - start]
+    except ImportError as e:
+        return {'name': name, 'skipped': str(e)}
+    return {
+        'name': name,
+        'best': min(times),
+        'times': times,
+        'checksum': result if isinstance(result, str) else _checksum(result),
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Adds ratio to baseline and status (regression, gain, same, changed, new) to results.
+    """
+    baseline = dict((r['name'], r) for r in baseline if 'best' in r)
+    for r in results:
+        base = baseline.get(r['name'])
+        if 'best' not in r or base is None:
+            r['status'] = 'new' if 'best' in r else 'skipped'
+            continue
+        r['ratio'] = r['best'] / base['best']
+        if r['checksum'] != base['checksum']:
+            r['status'] = 'changed'
+        elif r['ratio'] > 1 + tolerance:
+            r['status'] = 'regression'
+        elif r['ratio'] < 1 - tolerance:
+            r['status'] = 'gain'
+        else:
+            r['status'] = 'same'
+    return results
+
+
+def run_suite(names=None, repeat=3, baseline=BENCHMARK_BASELINE, tolerance=TOLERANCE):
+    """
+    Runs the benchmarks names (default all) and compares against baseline file if it exists.
+    """
+    results = [run_benchmark(name, repeat=repeat) for name in (names or BENCHMARKS)]
+    if baseline and os.path.exists(baseline):
+        with open(baseline) as fil:
+            compare(results, json.load(fil), tolerance=tolerance)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmark', choices=['startup', 'suite'])
+    parser.add_argument('--backends', nargs='+', default=['pure', 'sage'])
+    parser.add_argument('--python', default=None, help='Interpreter for workers, e.g. path to sage python.')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help='Write results as JSON to file.')
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Store results as new baseline.')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    if args.benchmark == 'startup':
+        for backend in args.backends:
+            try:
+                print(json.dumps(benchmark_startup(backend, python=args.python)))
+            except subprocess.CalledProcessError:
+                print(json.dumps({'backend': backend, 'error': 'worker failed'}))
+        return
+
+    logging.disable(logging.CRITICAL)
+    results = run_suite(args.only, repeat=args.repeat, baseline=args.baseline, tolerance=args.tolerance)
+    for r in results:
+        print(json.dumps(r, sort_keys=True))
+    if args.output:
+        with open(args.output, 'w') as fil:
+            json.dump(results, fil, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as fil:
+            json.dump([dict((k, v) for k, v in r.items() if k not in ('ratio', 'status')) for r in results],
+                      fil, indent=2, sort_keys=True)
+    if any(r.get('status') in ('regression', 'changed') for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, ROOT_FOLDER)
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+"""
+Module estimating the runtime of checking a triple (p, e, n).
+
+The model is a least squares fit of log(seconds) against features of the
+triple: the size of q^n in bits, the number of divisors of n, the number of
+essential divisors and the criterion which decided the neighbouring triple
+(p, e, n') with n' < n maximal. It is fitted from the triples recorded by
+ff_pcn.instrumentation for the total time and the time of single stages,
+e.g. criterion_6 (the explicit search).
+
+Usage:
+    python ff_pcn/cost_model.py fit result/instrumentation/* [--output FILE]
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import bisect
+import json
+import math
+import os
+import sys
+
+
+COST_MODEL = os.path.abspath(os.path.join(__file__, '../../result/cost_model.json'))
+
+TARGETS = ['time', 'criterion_4', 'criterion_6']
+"""Fitted targets: total time per triple and time of expensive stages."""
+
+DEFAULT_COEFFICIENTS = [math.log(1e-3), 0.01, 0.0, 0.0, 0.0, 0.0]
+"""Rough default until fitted: 1ms growing with the size of q^n."""
+
+RIDGE = 1e-6
+
+
+def neighbour_features(decided_by):
+    """
+    Returns one-hot features of the criterion, which decided the neighbouring triple:
+    factorization needed (4, 5) and explicit search or undecided (6, None).
+    Unknown neighbours give no features.
+    """
+    if decided_by is False:
+        return [0.0, 0.0]
+    if decided_by in (4, 5):
+        return [1.0, 0.0]
+    if decided_by is None or decided_by >= 6:
+        return [0.0, 1.0]
+    return [0.0, 0.0]
+
+
+def features(p, e, n, decided_by=False):
+    """
+    Returns feature vector of (p, e, n), decided_by is the criterion
+    which decided the neighbouring triple or False if unknown.
+    """
+    from ff_pcn.backend import divisors
+    from ff_pcn.finite_field_theory import essential_divisors
+    return [
+        1.0,
+        e * n * math.log(p, 2),
+        float(len(divisors(n))),
+        float(len(essential_divisors(p, e, n))),
+    ] + neighbour_features(decided_by)
+
+
+def _solve(a, b):
+    """
+    Solves a x = b by Gaussian elimination with partial pivoting.
+    """
+    k = len(b)
+    m = [list(row) + [v] for row, v in zip(a, b)]
+    for i in range(k):
+        pivot = max(range(i, k), key=lambda j: abs(m[j][i]))
+        m[i], m[pivot] = m[pivot], m[i]
+        for j in range(i + 1, k):
+            f = m[j][i] / m[i][i]
+            for l in range(i, k + 1):
+                m[j][l] -= f * m[i][l]
+    x = [0.0] * k
+    for i in reversed(range(k)):
+        x[i] = (m[i][k] - sum(m[i][l] * x[l] for l in range(i + 1, k))) / m[i][i]
+    return x
+
+
+def least_squares(xs, ys, ridge=RIDGE):
+    """
+    Returns coefficients c minimizing sum (c*x - y)^2 + ridge*|c|^2.
+    """
+    k = len(xs[0])
+    a = [[sum(x[i] * x[j] for x in xs) + (ridge if i == j else 0.0) for j in range(k)] for i in range(k)]
+    b = [sum(x[i] * y for x, y in zip(xs, ys)) for i in range(k)]
+    return _solve(a, b)
+
+
+class CostModel(object):
+
+    def __init__(self, coefficients=None, decided=None):
+        """
+        :param coefficients: Dict mapping target to coefficients.
+        :param decided: Dict mapping (p, e, n) to the deciding criterion of recorded triples.
+        """
+        self.coefficients = coefficients or dict()
+        self.decided = decided or dict()
+        self._ns = None
+
+    def neighbour(self, p, e, n):
+        """
+        Returns the deciding criterion of (p, e, n') with n' < n maximal or False if unknown.
+        """
+        if self._ns is None:
+            self._ns = dict()
+            for pe_n in sorted(self.decided):
+                self._ns.setdefault(pe_n[:2], []).append(pe_n[2])
+        ns = self._ns.get((p, e), [])
+        i = bisect.bisect_left(ns, n)
+        if i == 0:
+            return False
+        return self.decided[(p, e, ns[i - 1])]
+
+    def fit(self, records, targets=TARGETS):
+        """
+        Fits the model from records of ff_pcn.instrumentation.
+        Targets with less records than features keep their coefficients.
+        """
+        self.decided = dict(((r['p'], r['e'], r['n']), r.get('decided_by')) for r in records)
+        self._ns = None
+        xs = [features(r['p'], r['e'], r['n'], self.neighbour(r['p'], r['e'], r['n'])) for r in records]
+        for target in targets:
+            data = [
+                (x, math.log(max(r['time'] if target == 'time' else r['stages'][target], 1e-6)))
+                for x, r in zip(xs, records)
+                if target == 'time' or target in r['stages']
+            ]
+            if len(data) < len(DEFAULT_COEFFICIENTS):
+                continue
+            self.coefficients[target] = least_squares([x for x, _ in data], [y for _, y in data])
+        return self
+
+    def predict(self, p, e, n, target='time'):
+        """
+        Returns estimated seconds of target for (p, e, n).
+        """
+        c = self.coefficients.get(target, DEFAULT_COEFFICIENTS)
+        x = features(p, e, n, self.neighbour(p, e, n))
+        return math.exp(min(sum(ci * xi for ci, xi in zip(c, x)), 700))
+
+    def worth_trying(self, target, p, e, n, budget):
+        """
+        Returns True if target is expected to finish within budget seconds.
+        Without budget everything is worth trying.
+        """
+        return budget is None or self.predict(p, e, n, target) <= budget
+
+    def schedule(self, triples):
+        """
+        Returns triples sorted longest estimated first.
+        """
+        return sorted(triples, key=lambda pen: -self.predict(*pen))
+
+    def save(self, path=COST_MODEL):
+        with open(path, 'w') as fp:
+            json.dump({
+                'coefficients': self.coefficients,
+                'decided': [list(pen) + [d] for pen, d in sorted(self.decided.items())],
+            }, fp, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path=COST_MODEL):
+        with open(path) as fp:
+            data = json.load(fp)
+        return cls(data['coefficients'], dict((tuple(d[:3]), d[3]) for d in data['decided']))
+
+
+_cost_model = None
+
+
+def get_cost_model():
+    """
+    Returns the global cost model, loaded from COST_MODEL if it exists, on first call.
+    """
+    global _cost_model
+    if _cost_model is None:
+        _cost_model = CostModel.load() if os.path.exists(COST_MODEL) else CostModel()
+    return _cost_model
+
+
+def main():
+    import argparse
+    sys.path.insert(0, os.path.abspath(os.path.join(__file__, '../../')))
+    from ff_pcn.instrumentation import load_triples
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['fit'])
+    parser.add_argument('folders', nargs='+', help='Instrumentation folders of recorded runs.')
+    parser.add_argument('--output', default=COST_MODEL)
+    args = parser.parse_args()
+
+    records = []
+    for folder in args.folders:
+        records += load_triples(folder)
+    model = CostModel().fit(records)
+    model.save(args.output)
+    print('fitted %d triples: %s' % (len(records), json.dumps(model.coefficients)))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,14 +7,13 @@ http://www.asahi-net.or.jp/~KC2H-MSM/cn/
 """
 
 import re
-import requests
-from sage.all import (
+from ff_pcn.backend import (
     Integer,
     euler_phi,
-    is_prime,
-    cyclotomic_polynomial,
+    cyclotomic_value,
     prod,
 )
+from ff_pcn.prime_cache import get_prime_cache
 
 
 DATABSE_URL = "http://www.asahi-net.or.jp/~KC2H-MSM/cn/"
@@ -27,6 +26,7 @@ def get_factorization(n, b):
     """
     Returns factorization of Phi_n(b) from database. If not existing None is returned.
     """
+    import requests
     n = Integer(n)
     b = Integer(b)
     phin = euler_phi(n)
@@ -43,9 +43,9 @@ def get_factorization(n, b):
             break
     if fac is None:
         return
-    phi = cyclotomic_polynomial(n)(b)
+    phi = cyclotomic_value(n, b)
     fac += [phi//prod(fac)]
     fac = [p for p in fac if p != 1]
     assert phi == prod(fac)
-    assert all(map(is_prime, fac))
+    assert get_prime_cache().verify(fac)
     return [(p, 1) for p in fac]
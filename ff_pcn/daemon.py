@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+"""
+Module running a long-lived local service, which keeps Sage, the Factorer and
+all caches warm, and a thin client for it.
+
+The service listens on a Unix socket for requests, one JSON object per line
+{"command": ..., "args": [...]}, and answers one JSON object per line
+{"result": ...} or {"error": ...}. Commands:
+  check p e n        - existence check of (p, e, n) including the explicit search, which stops
+                       after SEARCH_TIME seconds with a partial result and is continued by
+                       the long-job queue like in check_triple,
+  criteria p e n     - criteria 1-6 of (p, e, n) as CriterionChecker,
+  query p e n        - result line of (p, e, n) in the database,
+  factorization n b  - factorization of Phi_n(b) from the Factorer,
+  ingest FILE        - reads yafu output FILE into the Factorer,
+  resolve FILE|--all - Database.find_missing_pcns or Database.resolve_all,
+  ping, stop.
+Requests mutating the Factorer or the database (ingest, resolve) are executed
+one at a time, all other requests run concurrently. A request arriving while
+the same request (command and arguments) is running waits for and shares its result.
+
+The client mirrors the existing scripts:
+    python ff_pcn/daemon.py serve [--socket PATH]
+    python ff_pcn/daemon.py pcn_existence_checker START STOP
+    python ff_pcn/daemon.py database FILE|--all
+    python ff_pcn/daemon.py factorer FILE
+    python ff_pcn/daemon.py check|criteria|query P E N
+    python ff_pcn/daemon.py factorization N B
+    python ff_pcn/daemon.py stop
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+SOCKET = os.environ.get('FF_PCN_SOCKET', '/tmp/ff_pcn_%d.sock' % os.getuid())
+"""Path of the Unix socket."""
+
+MAX_TRIPLES = 1000
+"""Number of most recent triple records the instrumentation of the service keeps."""
+
+
+def jsonable(obj):
+    """
+    Returns obj with all values JSON serializable: Integer as int, unknown objects as strings.
+    """
+    if obj is None or isinstance(obj, (bool, float, str)):
+        return obj
+    if isinstance(obj, (list, tuple)):
+        return [jsonable(x) for x in obj]
+    if isinstance(obj, dict):
+        return dict(('%s' % k, jsonable(v)) for k, v in obj.items())
+    try:
+        if int(obj) == obj:
+            return int(obj)
+    except (TypeError, ValueError):
+        pass
+    return '%s' % obj
+
+
+def command_check(p, e, n):
+    from ff_pcn.pcn_existence_checker import SEARCH_TIME, PCNExistenceChecker, submit_long_job
+    checker = PCNExistenceChecker(p, e, p**e, n, search_time=SEARCH_TIME)
+    exists, reason = checker.check_existance(no_explicit_search=False)
+    submit_long_job(checker, reason)
+    return [exists, '%s' % reason]
+
+
+def command_criteria(p, e, n):
+    from ff_pcn.pcn_existence_checker import CriterionChecker
+    return CriterionChecker([]).check_criterions(p, e, n)
+
+
+def command_query(p, e, n):
+    from ff_pcn.database import get_database
+    return get_database().result(p, e, n)
+
+
+def command_factorization(n, b):
+    from ff_pcn.factorer import get_factorer
+    return get_factorer().get((n, b))
+
+
+def command_ingest(fil):
+    from ff_pcn.factorer import get_factorer
+    accepted, rejected = get_factorer().read(fil)
+    return {'accepted': accepted, 'rejected': rejected}
+
+
+def command_resolve(fil):
+    from ff_pcn.database import get_database
+    if fil == '--all':
+        return get_database().resolve_all()
+    return get_database().find_missing_pcns(fil)
+
+
+COMMANDS = {
+    'check': command_check,
+    'criteria': command_criteria,
+    'query': command_query,
+    'factorization': command_factorization,
+    'ingest': command_ingest,
+    'resolve': command_resolve,
+    'ping': lambda: 'pong',
+}
+
+MUTATING = set(['ingest', 'resolve'])
+"""Commands executed one at a time."""
+
+
+def warm_up():
+    """
+    Loads everything a cold command would load: Sage if available, the Factorer and the prime cache.
+    """
+    from ff_pcn.factorer import get_factorer
+    from ff_pcn.prime_cache import get_prime_cache
+    try:
+        from ff_pcn.backend import sage
+        sage()
+    except ImportError:
+        logging.getLogger(__name__).warning('warm_up: Sage not available, criterion 6 fails')
+    get_factorer()
+    get_prime_cache().proofs
+
+
+class Coalescer(object):
+    """
+    Runs functions, exclusive ones one at a time. Concurrent calls with the same key share one execution.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.execution = threading.Lock()
+        self.inflight = dict()
+        self.coalesced = 0
+
+    def run(self, key, func, args=(), exclusive=True):
+        with self.lock:
+            call = self.inflight.get(key)
+            owner = call is None
+            if owner:
+                call = self.inflight[key] = {'done': threading.Event()}
+            else:
+                self.coalesced += 1
+        if owner:
+            try:
+                if exclusive:
+                    with self.execution:
+                        call['result'] = func(*args)
+                else:
+                    call['result'] = func(*args)
+            except Exception as e:
+                logging.getLogger(__name__).exception('Coalescer: %s failed', key)
+                call['error'] = '%s: %s' % (type(e).__name__, e)
+            finally:
+                with self.lock:
+                    del self.inflight[key]
+                call['done'].set()
+        else:
+            call['done'].wait()
+        if 'error' in call:
+            raise RuntimeError(call['error'])
+        return call['result']
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+                command, args = request['command'], request.get('args', [])
+                if command == 'stop':
+                    response = {'result': 'stopping'}
+                    threading.Thread(target=self.server.shutdown).start()
+                elif command not in COMMANDS:
+                    response = {'error': 'unknown command %s' % command}
+                else:
+                    key = (command,) + tuple(args)
+                    result = self.server.coalescer.run(key, COMMANDS[command], args, exclusive=command in MUTATING)
+                    response = {'result': jsonable(result)}
+            except Exception as e:
+                response = {'error': '%s' % e}
+            self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path=SOCKET):
+        if os.path.exists(path):
+            os.remove(path)
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        self.path = path
+        self.coalescer = Coalescer()
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def serve(path=SOCKET, warm=True):
+    from ff_pcn.instrumentation import get_instrumentation
+    get_instrumentation().max_triples = MAX_TRIPLES
+    if warm:
+        warm_up()
+    server = Server(path)
+    logging.getLogger(__name__).info('serving on %s', path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class Client(object):
+
+    def __init__(self, path=SOCKET):
+        self.path = path
+
+    def request(self, command, *args):
+        """
+        Sends one request and returns its result. Raises RuntimeError if the service reports an error.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+            sock.sendall((json.dumps({'command': command, 'args': list(args)}) + '\n').encode('utf-8'))
+            fp = sock.makefile('rb')
+            response = json.loads(fp.readline().decode('utf-8'))
+            fp.close()
+        finally:
+            sock.close()
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=[
+        'serve', 'pcn_existence_checker', 'database', 'factorer',
+        'check', 'criteria', 'query', 'factorization', 'stop', 'ping',
+    ])
+    parser.add_argument('args', nargs='*')
+    parser.add_argument('--socket', default=SOCKET)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.socket)
+        return
+    client = Client(args.socket)
+    if args.command == 'pcn_existence_checker':
+        from ff_pcn.finite_field_theory import pens_to_check
+        for n in range(int(args.args[0]), int(args.args[1])):
+            for p, e, n in pens_to_check(n):
+                print('%s: %s' % ((p, e, n), client.request('criteria', p, e, n)))
+    elif args.command == 'database':
+        print(client.request('resolve', args.args[0]))
+    elif args.command == 'factorer':
+        res = client.request('ingest', args.args[0])
+        print('accepted %d, rejected %d' % (res['accepted'], len(res['rejected'])))
+    else:
+        print(client.request(args.command, *[int(x) for x in args.args]))
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath(os.path.join(__file__, '../../')))
+    logging.basicConfig(level=logging.INFO)
+    main()
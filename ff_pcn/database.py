@@ -12,13 +12,35 @@ except ImportError:
     import sys
     import os
     sys.path.append(os.path.abspath(os.path.join(__file__, '../../')))
+import multiprocessing
 import os
 import re
+import sys
 import logging
 
 
 RESULT_FOLDER = os.path.abspath(os.path.join(__file__, '../../result/'))
 
+re_triple = re.compile(r'^\((\d+), (\d+),? (\d+)\)')
+re_partial = re.compile(r'False partial (\d+)')
+
+
+def resolve_triple(pen, resume=0):
+    """
+    Checks (p, e, n) including the explicit search, resumed at candidate resume.
+    Returns (pen, result line).
+    """
+    from ff_pcn.pcn_existence_checker import PCNExistenceChecker
+    p, e, n = pen
+    result = PCNExistenceChecker(p, e, p**e, n, resume=resume).check_existance(no_explicit_search=False)
+    logging.getLogger(__name__).info(result)
+    return pen, '%s' % result[1]
+
+
+def _resolve(args):
+    resolve, pen, resume = args
+    return resolve(pen, resume)
+
 
 class Database(object):
 
@@ -64,6 +86,113 @@ class Database(object):
         with open(fil, 'w') as fp:
             fp.write('\n'.join(r[2] for r in results))
 
+    def update(self, p, e, n, result):
+        """
+        Replaces the result line of (p, e, n) or adds it if not yet checked.
+        """
+        if self.result(p, e, n) is None:
+            self.add(p, e, n, result)
+        else:
+            self.rewrite(os.path.join(self.result_folder, 'ex_%d.txt' % n), {(p, e, n): result})
+
+    def result(self, p, e, n):
+        """
+        Returns the result line of (p, e, n) or None if not yet checked.
+        """
+        fil = os.path.join(self.result_folder, 'ex_%d.txt' % n)
+        if not os.path.exists(fil):
+            return None
+        with open(fil, 'r') as fp:
+            for line in fp:
+                match = re_triple.match(line)
+                if match and tuple(int(x) for x in match.groups()) == (p, e, n):
+                    return line.rstrip('\n')
+        return None
+
+    def result_files(self):
+        """
+        Returns all ex_<n>.txt files sorted by n.
+        """
+        files = [fil for fil in os.listdir(self.result_folder) if self.re_filename.match(fil)]
+        return [
+            os.path.join(self.result_folder, fil)
+            for fil in sorted(files, key=lambda fil: int(self.re_filename.match(fil).group('n')))
+        ]
+
+    def unresolved(self, files=None):
+        """
+        Returns dict mapping file to the triples (p, e, n) of its unresolved lines,
+        i.e. lines containing False (not existing, deferred or needing factorizations).
+        """
+        ret = dict()
+        for fil in files or self.result_files():
+            with open(fil, 'r') as fp:
+                for line in fp:
+                    match = re_triple.match(line)
+                    if match and 'False' in line:
+                        ret.setdefault(fil, []).append(tuple(int(x) for x in match.groups()))
+        return ret
+
+    def partial(self, files=None):
+        """
+        Returns dict mapping the triples (p, e, n) of lines 'False partial N' to N.
+        """
+        ret = dict()
+        for fil in files or self.result_files():
+            with open(fil, 'r') as fp:
+                for line in fp:
+                    match, partial = re_triple.match(line), re_partial.search(line)
+                    if match and partial:
+                        ret[tuple(int(x) for x in match.groups())] = int(partial.group(1))
+        return ret
+
+    def rewrite(self, fil, results):
+        """
+        Replaces the lines of triples in dict results (p, e, n) -> line in fil at once.
+        """
+        with open(fil, 'r') as fp:
+            content = fp.readlines()
+        for i, line in enumerate(content):
+            match = re_triple.match(line)
+            if match and tuple(int(x) for x in match.groups()) in results:
+                content[i] = '%s\n' % results[tuple(int(x) for x in match.groups())]
+        with open(fil + '.tmp', 'w') as fp:
+            fp.writelines(content)
+        os.rename(fil + '.tmp', fil)
+
+    def resolve_all(self, files=None, processes=None, resolve=resolve_triple):
+        """
+        Re-checks all unresolved triples of files (default all result files) on a pool,
+        longest estimated first. Every file is rewritten once as soon as all its triples are done.
+        Partial searches are resumed at the number of candidates already tested.
+        resolve is called as resolve(pen, resume), see resolve_triple.
+        Returns number of re-checked triples.
+        """
+        from ff_pcn.cost_model import get_cost_model
+        unresolved = self.unresolved(files)
+        file_of = dict((pen, fil) for fil, pens in unresolved.items() for pen in pens)
+        remaining = dict((fil, len(pens)) for fil, pens in unresolved.items())
+        results = dict((fil, dict()) for fil in unresolved)
+        resume = self.partial(list(unresolved))
+        logging.getLogger(__name__).info('resolve_all: %d triples in %d files', len(file_of), len(unresolved))
+        pool = multiprocessing.Pool(processes or multiprocessing.cpu_count())
+        try:
+            tasks = ((resolve, pen, resume.get(pen, 0)) for pen in get_cost_model().schedule(file_of))
+            for pen, line in pool.imap_unordered(_resolve, tasks, chunksize=1):
+                fil = file_of[pen]
+                results[fil][pen] = line
+                remaining[fil] -= 1
+                if remaining[fil] == 0:
+                    self.rewrite(fil, results.pop(fil))
+        finally:
+            pool.terminate()
+            pool.join()
+            # Keep what is done if interrupted
+            for fil, res in results.items():
+                if res:
+                    self.rewrite(fil, res)
+        return len(file_of)
+
     def missing_files(self, m):
         for n in xrange(1, m):
             if not os.path.exists(os.path.join(self.result_folder, 'ex_%d.txt' % n)):
@@ -91,11 +220,24 @@ class Database(object):
             fp.writelines(content[:i] + ['%s\n' % result[1]] + content[i+1:])
 
 
-database = Database()
+_database = None
+
+
+def get_database():
+    """
+    Returns the global result database, which is constructed on first call.
+    """
+    global _database
+    if _database is None:
+        _database = Database()
+    return _database
 
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
-    # database.missing_files(int(sys.argv[1]))
-    # database.check_and_cleanup()
-    database.find_missing_pcns(sys.argv[1])
+    # get_database().missing_files(int(sys.argv[1]))
+    # get_database().check_and_cleanup()
+    if sys.argv[1] == '--all':
+        print('resolved %d triples' % get_database().resolve_all())
+    else:
+        get_database().find_missing_pcns(sys.argv[1])
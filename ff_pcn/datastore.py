@@ -2,55 +2,196 @@
 
 """
 Module abstracting a datastore to hold information persitently.
+
+Every section is a size-bounded LRU cache. Sections can additionally be backed
+by an SQLite file, so that warm caches survive restarts and are shared by
+worker processes. The file is given by the environment variable FF_PCN_DATASTORE.
 """
 
 
+import collections
+import operator
 import os
+import pickle
+import sqlite3
 
 
-class DataStore(object):
+MAX_ENTRIES = 10000
+"""Default maximal number of entries per section held in memory."""
+
+DATASTORE_FILE = os.environ.get('FF_PCN_DATASTORE')
+"""SQLite file backing persistent sections. None disables persistence."""
+
+_MISSING = object()
+
+
+def _normalize(key):
+    """
+    Returns a hashable normal form of key, e.g. Sage Integers become ints.
+    """
+    if isinstance(key, (tuple, list)):
+        return tuple(_normalize(k) for k in key)
+    if isinstance(key, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in key.items()))
+    if isinstance(key, (str, float, bool)) or key is None:
+        return key
+    try:
+        return operator.index(key)
+    except TypeError:
+        return key
+
+
+class SectionStatistics(object):
 
     def __init__(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return 'hits=%d disk_hits=%d misses=%d evictions=%d' % (self.hits, self.disk_hits, self.misses, self.evictions)
+
+
+class DataStore(object):
+
+    def __init__(self, max_entries=MAX_ENTRIES, path=DATASTORE_FILE):
+        """
+        :param max_entries: Default maximal number of entries per section in memory.
+        :param path: SQLite file for persistent sections or None.
+        """
         self.datastore = dict()
+        self.max_entries = max_entries
+        self.section_max_entries = dict()
+        self.persistent = set()
+        self.stats = collections.defaultdict(SectionStatistics)
+        self.path = path
+        self._connection = None
+        self._pid = None
+
+    def configure(self, section, max_entries=None, persistent=False):
+        """
+        Sets maximal number of entries of section and whether it is backed by the SQLite file.
+        """
+        if max_entries is not None:
+            self.section_max_entries[section] = max_entries
+        if persistent:
+            self.persistent.add(section)
+
+    def connection(self):
+        """
+        Returns SQLite connection of the current process or None.
+        """
+        if self.path is None:
+            return None
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS datastore (section TEXT, key TEXT, value BLOB, PRIMARY KEY (section, key))')
+            self._connection.commit()
+            self._pid = os.getpid()
+        return self._connection
+
+    def _section(self, section):
+        if section not in self.datastore:
+            self.datastore[section] = collections.OrderedDict()
+        return self.datastore[section]
+
+    def _put(self, section, key, value):
+        entries = self._section(section)
+        entries.pop(key, None)
+        entries[key] = value
+        max_entries = self.section_max_entries.get(section, self.max_entries)
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+            self.stats[section].evictions += 1
 
     def add(self, section, key, value):
         """
         Add key with value to section.
-        Writes datatore file afterwards.
+        Writes datatore file afterwards if section is persistent.
         """
-        key = str(key)
-        if not section in self.datastore:
-            self.datastore[section] = dict()
-        if len(self.datastore[section].values()) > 1e3:
-            del self.datastore[section]
-            self.datastore[section] = dict()
-        self.datastore[section][key] = value
+        key = _normalize(key)
+        self._put(section, key, value)
+        con = self.connection() if section in self.persistent else None
+        if con is not None:
+            con.execute(
+                'INSERT OR REPLACE INTO datastore VALUES (?, ?, ?)',
+                (section, repr(key), sqlite3.Binary(pickle.dumps(value, protocol=2)))
+            )
+            con.commit()
 
     def get(self, section, key, default=None):
         """
         Exception save getting of key in section.
         """
-        key = str(key)
-        section = self.datastore.get(section, None)
-        if section:
-            return section.get(key, None)
+        key = _normalize(key)
+        entries = self._section(section)
+        if key in entries:
+            value = entries.pop(key)
+            entries[key] = value
+            self.stats[section].hits += 1
+            return value
+        con = self.connection() if section in self.persistent else None
+        if con is not None:
+            row = con.execute(
+                'SELECT value FROM datastore WHERE section = ? AND key = ?',
+                (section, repr(key))
+            ).fetchone()
+            if row is not None:
+                value = pickle.loads(bytes(row[0]))
+                self._put(section, key, value)
+                self.stats[section].disk_hits += 1
+                return value
+        self.stats[section].misses += 1
+        return default
+
+    def report(self):
+        """
+        Returns statistics of all sections as string.
+        """
+        return '\n'.join(
+            '%s: entries=%d %r' % (section, len(self.datastore.get(section, ())), self.stats[section])
+            for section in sorted(self.stats)
+        )
+
+
+_datastore = None
 
 
-datastore = DataStore()
-"""Global datastore."""
+def get_datastore():
+    """
+    Returns the global datastore, which is constructed on first call.
+    """
+    global _datastore
+    if _datastore is None:
+        _datastore = DataStore()
+    return _datastore
 
 
-def store(section):
+def store(section, max_entries=None, persistent=False):
     """
     Decorator to save returned values to datastore.
+
+    :param max_entries: Maximal number of entries of section held in memory.
+    :param persistent: Back section by the SQLite file of the datastore.
     """
     def store_decorator(func):
-        def wrapped_func(*k):
-            val = datastore.get(section, k)
-            if val is not None:
+        configured = []
+
+        def wrapped_func(*k, **kwargs):
+            datastore = get_datastore()
+            if not configured or configured[0] is not datastore:
+                datastore.configure(section, max_entries=max_entries, persistent=persistent)
+                configured[:] = [datastore]
+            key = (k, kwargs) if kwargs else k
+            val = datastore.get(section, key, _MISSING)
+            if val is not _MISSING:
                 return val
-            val = func(*k)
-            datastore.add(section, k, val)
+            val = func(*k, **kwargs)
+            datastore.add(section, key, val)
             return val
+        wrapped_func.__name__ = func.__name__
+        wrapped_func.__doc__ = func.__doc__
+        wrapped_func.uncached = func
         return wrapped_func
     return store_decorator
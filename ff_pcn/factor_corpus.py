@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+
+"""
+Module merging all known factorizations into one corpus.
+
+The corpus is keyed by the factored integer and additionally by (n, b) for
+values Phi_n(b). Primes are interned into one table, a factorization is
+stored as packed array of (prime index, multiplicity), so large primes
+shared by many values are held only once. Importers exist for the three legacy formats:
+  - factor_lib.txt: tab separated `value<TAB>[(p, m), ...]` (python 2 literals)
+  - factors.csv: `value,"[(p, m), ...]"`
+  - cyclotomic_numbers.csv: `"(n, b)","[(p, m), ...]"`
+
+Usage:
+    python ff_pcn/factor_corpus.py merge [output]
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+try:
+    import ff_pcn
+except ImportError:
+    import sys
+    import os
+    sys.path.append(os.path.abspath(os.path.join(__file__, '../../')))
+import array
+import ast
+import csv
+import logging
+import os
+import re
+import sys
+from ff_pcn.backend import cyclotomic_value, prod
+
+
+FACTOR_LIB = os.path.abspath(os.path.join(__file__, '../../factor_lib.txt'))
+FACTORS_CSV = os.path.abspath(os.path.join(__file__, '../factors.csv'))
+CYCLOTOMIC_NUMBERS_CSV = os.path.abspath(os.path.join(__file__, '../cyclotomic_numbers.csv'))
+FACTOR_CORPUS = os.path.abspath(os.path.join(__file__, '../factor_corpus.csv'))
+
+PACKED_TYPECODE = 'I'
+"""Typecode of packed factorizations: unsigned int for prime indices and multiplicities."""
+
+
+def literal(s):
+    """
+    Evaluates a python literal as written by python 2, i.e. with long suffix 'L'.
+    """
+    return ast.literal_eval(re.sub(r'(\d)L\b', r'\1', s))
+
+
+def normalize_factorization(factorization):
+    """
+    Returns factorization as sorted list of (prime, multiplicity) with merged primes.
+    """
+    facs = {}
+    for p, mul in factorization:
+        p = int(p)
+        facs[p] = facs.get(p, 0) + int(mul)
+    return sorted(facs.items())
+
+
+class FactorCorpusConflict(object):
+
+    def __init__(self, key, known, new, source, reason):
+        self.key = key
+        self.known = known
+        self.new = new
+        self.source = source
+        self.reason = reason
+
+    def __repr__(self):
+        return 'Conflict for %s from %s (%s): %s != %s' % (self.key, self.source, self.reason, self.known, self.new)
+
+
+class FactorCorpus(object):
+
+    def __init__(self):
+        self.primes = []
+        """Table of interned primes."""
+        self.prime_index = dict()
+        """Maps prime to its index in primes."""
+        self.packed = dict()
+        """Maps value to its packed factorization."""
+        self.by_nb = dict()
+        """Maps (n, b) to the value Phi_n(b)."""
+        self.conflicts = []
+        self.duplicates = 0
+
+    def __len__(self):
+        return len(self.packed)
+
+    def __contains__(self, value):
+        return value in self.packed
+
+    @property
+    def by_value(self):
+        """
+        Dict mapping value to its factorization. Unpacks the whole corpus, use get for lookups.
+        """
+        return dict((value, self._unpack(packed)) for value, packed in self.packed.items())
+
+    def _intern(self, p):
+        index = self.prime_index.get(p)
+        if index is None:
+            index = self.prime_index[p] = len(self.primes)
+            self.primes.append(p)
+        return index
+
+    def _pack(self, factorization):
+        """
+        Returns normalized factorization as array (index_1, m_1, index_2, m_2, ...).
+        """
+        ret = array.array(PACKED_TYPECODE)
+        for p, m in factorization:
+            ret.extend((self._intern(p), m))
+        return ret
+
+    def _unpack(self, packed):
+        return [(self.primes[packed[i]], packed[i + 1]) for i in range(0, len(packed), 2)]
+
+    def add(self, value, factorization, nb=None, source=None):
+        """
+        Adds factorization of value (and (n, b) if given).
+        Returns False if the entry was rejected because of a conflict.
+        """
+        value = int(value)
+        factorization = normalize_factorization(factorization)
+        if prod(p**m for p, m in factorization) != value:
+            self._conflict(nb or value, None, factorization, source, 'product mismatch')
+            return False
+        if nb is not None:
+            nb = (int(nb[0]), int(nb[1]))
+            if nb in self.by_nb and self.by_nb[nb] != value:
+                self._conflict(nb, self.by_nb[nb], value, source, 'value mismatch')
+                return False
+            self.by_nb[nb] = value
+
+        known = self.packed.get(value)
+        if known is None:
+            self.packed[value] = self._pack(factorization)
+        elif self._unpack(known) == factorization:
+            self.duplicates += 1
+        else:
+            # Both multiply to value, so one contains composite "primes":
+            # keep the finer factorization.
+            self._conflict(value, self._unpack(known), factorization, source, 'different factorization')
+            if 2 * len(factorization) > len(known):
+                self.packed[value] = self._pack(factorization)
+        return True
+
+    def _conflict(self, key, known, new, source, reason):
+        conflict = FactorCorpusConflict(key, known, new, source, reason)
+        logging.getLogger(__name__).warning('%r', conflict)
+        self.conflicts += [conflict]
+
+    def get(self, value=None, nb=None):
+        """
+        Returns factorization of value or of Phi_n(b) for nb = (n, b).
+        None is returned if unknown.
+        """
+        if value is None:
+            value = self.by_nb.get((int(nb[0]), int(nb[1])))
+            if value is None:
+                return None
+        packed = self.packed.get(int(value))
+        if packed is None:
+            return None
+        return self._unpack(packed)
+
+    def discard(self, value):
+        """
+        Removes value and all (n, b) keys of it.
+        """
+        value = int(value)
+        self.packed.pop(value, None)
+        for nb in [nb for nb, v in self.by_nb.items() if v == value]:
+            del self.by_nb[nb]
+
+    def alias(self, nb, value):
+        """
+        Registers (n, b) as key for the known value Phi_n(b).
+        """
+        self.by_nb[(int(nb[0]), int(nb[1]))] = int(value)
+
+    def nbs(self):
+        """
+        Returns sorted list of (n, b, factorization) of all values keyed by (n, b).
+        """
+        return sorted((nb + (self._unpack(self.packed[value]),) for nb, value in self.by_nb.items()))
+
+    def import_factor_lib(self, path=FACTOR_LIB):
+        """
+        Imports tab separated file `value<TAB>factorization`.
+        """
+        with open(path, 'r') as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                value, fac = line.split('\t')
+                self.add(int(value), literal(fac), source=path)
+
+    def import_factors_csv(self, path=FACTORS_CSV):
+        """
+        Imports csv file `value,factorization`.
+        """
+        with open(path, 'r') as fp:
+            for value, fac in csv.reader(fp):
+                self.add(int(value), literal(fac), source=path)
+
+    def import_cyclotomic_numbers_csv(self, path=CYCLOTOMIC_NUMBERS_CSV):
+        """
+        Imports csv file `(n, b),factorization` with factorizations of Phi_n(b).
+        """
+        with open(path, 'r') as fp:
+            for nb, fac in csv.reader(fp):
+                nb = literal(nb)
+                self.add(cyclotomic_value(nb[0], nb[1]), literal(fac), nb=nb, source=path)
+
+    def import_corpus(self, path=FACTOR_CORPUS):
+        """
+        Imports unified csv file `value,[(n, b), ...],factorization`.
+        """
+        with open(path, 'r') as fp:
+            for value, nbs, fac in csv.reader(fp):
+                value = int(value)
+                fac = literal(fac)
+                nbs = literal(nbs)
+                self.add(value, fac, source=path)
+                for nb in nbs:
+                    self.alias(nb, value)
+
+    def import_all(self):
+        """
+        Imports all legacy factorization files.
+        """
+        self.import_cyclotomic_numbers_csv()
+        self.import_factors_csv()
+        self.import_factor_lib()
+
+    def save_cyclotomic_numbers_csv(self, path=CYCLOTOMIC_NUMBERS_CSV):
+        """
+        Writes all factorizations keyed by (n, b) in format of cyclotomic_numbers.csv.
+        """
+        with open(path, 'w') as fp:
+            writer = csv.writer(fp)
+            writer.writerows(((n, b), fac) for n, b, fac in self.nbs())
+
+    def save(self, path=FACTOR_CORPUS):
+        """
+        Writes the unified corpus `value,[(n, b), ...],factorization`.
+        """
+        nbs = dict()
+        for nb, value in self.by_nb.items():
+            nbs.setdefault(value, []).append(nb)
+        with open(path, 'w') as fp:
+            writer = csv.writer(fp)
+            writer.writerows(
+                (value, sorted(nbs.get(value, [])), self._unpack(packed))
+                for value, packed in sorted(self.packed.items())
+            )
+
+    def memory_footprint(self):
+        """
+        Returns dict with approximate sizes in bytes of the prime table, the packed
+        factorizations, the value keys and the (n, b) keys.
+        """
+        return {
+            'primes': sys.getsizeof(self.primes) + sys.getsizeof(self.prime_index) +
+            sum(sys.getsizeof(p) for p in self.primes),
+            'factorizations': sum(sys.getsizeof(packed) for packed in self.packed.values()),
+            'values': sys.getsizeof(self.packed) + sum(sys.getsizeof(value) for value in self.packed),
+            'nbs': sys.getsizeof(self.by_nb) + sum(sys.getsizeof(nb) for nb in self.by_nb),
+        }
+
+    def report(self):
+        """
+        Returns a summary of the corpus as string.
+        """
+        footprint = self.memory_footprint()
+        return '\n'.join([
+            'values: %d' % len(self.packed),
+            'primes: %d' % len(self.primes),
+            'memory: %d bytes (%s)' % (
+                sum(footprint.values()),
+                ', '.join('%s %d' % (k, footprint[k]) for k in sorted(footprint))
+            ),
+            '(n, b) keys: %d' % len(self.by_nb),
+            'duplicates: %d' % self.duplicates,
+            'conflicts: %d' % len(self.conflicts),
+        ] + [repr(c) for c in self.conflicts])
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'merge':
+        sys.exit(__doc__)
+    corpus = FactorCorpus()
+    corpus.import_all()
+    corpus.save(sys.argv[2] if len(sys.argv) > 2 else FACTOR_CORPUS)
+    print(corpus.report())
@@ -13,101 +13,276 @@ except ImportError:
     import os
     sys.path.append(os.path.abspath(os.path.join(__file__, '../../')))
 import logging
+import multiprocessing
 import os
 import sys
 import re
-import csv
-from sage.all import factor, Integer, prod, cyclotomic_polynomial
-from ff_pcn.cyclotomic_numbers_database import get_factorization as get_factorization_from_online_database
+import math
+from ff_pcn.backend import euler_phi, factor, prod, cyclotomic_value
 from ff_pcn.basic_number_theory import cyclotomic_equivalents
+from ff_pcn.algebraic_factorization import algebraic_factors
+from ff_pcn.factoring_ladder import FactoringLadder
+from ff_pcn.factor_corpus import FactorCorpus, CYCLOTOMIC_NUMBERS_CSV, FACTOR_CORPUS
+from ff_pcn.instrumentation import get_instrumentation
+from ff_pcn.prime_cache import get_prime_cache, prove
 
 
-FACTOR_DATABASE = os.path.abspath(os.path.join(__file__, '../cyclotomic_numbers.csv'))
+FACTOR_DATABASE = CYCLOTOMIC_NUMBERS_CSV
+
+
+re_yafu_line = re.compile(r'^\((\d+), (\d+)\) \((\d+)\)((?:/\d+(?:\^\d+)?)+)\s*$')
 
 
 def facprod(fac):
     return prod((p**m for p, m in fac))
 
 
+def is_cyclotomic_value(n, b, num):
+    """
+    Returns True if num = Phi_n(b). Phi_n(b) is only computed if num has about phi(n)*log2(b) bits.
+    """
+    if abs(num.bit_length() - euler_phi(n) * math.log(b, 2)) > 4:
+        return False
+    return cyclotomic_value(n, b) == num
+
+
+def ingest_yafu_line(line):
+    """
+    Parses and verifies a line (n, b) (NUMBER)/FAC1/FAC2^M/... of yafu output.
+    Returns None for empty lines, ('accepted', nb, num, facs, proven) if the factors are primes
+    multiplying to num, else ('rejected', line, reason).
+    nb is None for cofactors found by algebraic splitting, proven is the list of
+    (prime, kind of proof) of factors which were not yet in the prime cache.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    match = re_yafu_line.match(line)
+    if not match:
+        return 'rejected', line, 'malformed'
+    n, b, num = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    facs = [(int(r), int(m or 1)) for r, m in re.findall(r'/(\d+)\^?(\d+)?', match.group(4))]
+    if facprod(facs) != num:
+        return 'rejected', line, 'product mismatch'
+    cache = get_prime_cache()
+    proven = [prove(r) for r, _ in facs if r not in cache]
+    composite = [r for r, proof in proven if proof is None]
+    if composite:
+        return 'rejected', line, 'composite factors %s' % composite
+    # Known to this worker from now on, the parent process persists them
+    cache.add(proven, persistent=False)
+    nb = (n, b) if is_cyclotomic_value(n, b, num) else None
+    return 'accepted', nb, num, cleanup_factorization(facs), proven
+
+
 class Factorer(object):
 
-    def __init__(self):
-        self.database = dict()
+    def __init__(self, ladder=None, frozen=False, database_path=FACTOR_DATABASE, corpus_path=FACTOR_CORPUS):
+        """
+        :param ladder: FactoringLadder used for cofactors before they are queued for yafu.
+        :param frozen: Only use the loaded corpus, i.e. no ladder, no online lookup and nothing is saved.
+        :param database_path: Factorizations keyed by (n, b) in format of cyclotomic_numbers.csv.
+        :param corpus_path: Unified corpus holding also the cofactors keyed by value only.
+        """
+        self.corpus = FactorCorpus()
+        self.database_path = database_path
+        self.corpus_path = corpus_path
+        self.ladder = ladder or FactoringLadder()
+        self.frozen = frozen
         self.load()
         self.queue = []
 
     def add(self, nb, num, factorization):
-        self.database[nb] = factorization
+        self.corpus.add(num, factorization, nb=nb)
         self.save()
 
     def get(self, nb):
-        num = cyclotomic_polynomial(nb[0])(nb[1])
+        """
+        Returns factorization of Phi_n(b) for nb = (n, b) or None if unknown.
+        Lookups go from cheap to expensive: corpus, algebraic splitting with known cofactors,
+        online database, factoring ladder. Missing cofactors are appended to the queue.
+        """
+        instrumentation = get_instrumentation()
+        num = cyclotomic_value(nb[0], nb[1])
         if num < 1e10:
+            instrumentation.count('factorer.small')
             return list(factor(num))
 
         equivalents = cyclotomic_equivalents(*nb)
 
-        # Lookup local database
-        for mb in equivalents:
-            if mb in self.database:
-                if nb != mb:
-                    self.database[nb] = self.database[mb]
-                    del self.database[mb]
-                return self.database[nb]
+        # Lookup local corpus, equivalents share the value
+        fac = self.verified(num)
+        if fac is not None:
+            instrumentation.count('factorer.corpus')
+            self.corpus.alias(nb, num)
+            return fac
+
+        # Split algebraically and lookup the cofactors
+        with instrumentation.timer('factorer.algebraic'):
+            fac, cofactors = algebraic_factors(*nb)
+            missing = []
+            for m, c, cofactor in cofactors:
+                cofac = self.get_cofactor(m, cofactor, ladder=False)
+                if cofac is None:
+                    missing += [(m, c, cofactor)]
+                else:
+                    fac += cofac
+        if not missing:
+            instrumentation.count('factorer.algebraic')
+            fac = cleanup_factorization(fac)
+            self.add(nb, num, fac)
+            return fac
 
         # Lookup online database
-        for mb in equivalents:
-            fac = get_factorization_from_online_database(*mb)
-            logging.getLogger(__name__).critical('Factorer.get: online lookup: %s %s', mb, fac)
-            if fac is not None:
+        if not self.frozen:
+            from ff_pcn.cyclotomic_numbers_database import get_factorization as get_factorization_from_online_database
+            for mb in equivalents:
+                with instrumentation.timer('factorer.online'):
+                    online = get_factorization_from_online_database(*mb)
+                logging.getLogger(__name__).critical('Factorer.get: online lookup: %s %s', mb, online)
+                if online is not None:
+                    instrumentation.count('factorer.online')
+                    self.add(nb, num, online)
+                    return online
+
+            # Factoring ladder on the cofactors still missing, only unsplit parts remain
+            with instrumentation.timer('factorer.ladder'):
+                remaining = []
+                for m, c, cofactor in missing:
+                    cofac, unsplit = self.split_cofactor(m, cofactor)
+                    fac += cofac
+                    remaining += [(m, c, u) for u in unsplit]
+            if not remaining:
+                instrumentation.count('factorer.ladder')
+                fac = cleanup_factorization(fac)
                 self.add(nb, num, fac)
                 return fac
+            if remaining != missing:
+                self.save()
+            missing = remaining
 
-        logging.getLogger(__name__).critical('Factorer.get: Factorization needed : %s %d', nb, num)
+        logging.getLogger(__name__).critical('Factorer.get: Factorization needed : %s %d, cofactors %s', nb, num, missing)
+        instrumentation.count('factorer.queued')
+        self.queue += missing
+        return None
+
+    def get_cofactor(self, m, num, ladder=True):
+        """
+        Returns factorization of a cofactor num of Phi_m(b) found by algebraic
+        splitting or None. Unknown cofactors are tried by the factoring ladder if ladder is True,
+        its results are added to the corpus and saved by the caller.
+        """
+        if num < 1e10:
+            return list(factor(num))
+        fac = self.verified(num)
+        if fac is None and ladder and not self.frozen:
+            fac, unsplit = self.split_cofactor(m, num)
+            if unsplit:
+                return None
+        return fac
+
+    def split_cofactor(self, m, num):
+        """
+        Splits a cofactor num of Phi_m(b) by the factoring ladder, parts known to the corpus are not split again.
+        Returns (factorization, unsplit) as FactoringLadder.factor_partial. Completely split
+        cofactors are added to the corpus.
+        """
+        fac, unsplit = self.ladder.factor_partial(num, m, known=self.verified)
+        if not unsplit:
+            self.corpus.add(num, fac, source='ladder')
+        return fac, unsplit
+
+    def verified(self, value):
+        """
+        Returns factorization of value from the corpus if all factors are primes, else None.
+        Factorizations with composite factors are dropped from the corpus, so value is factored again.
+        """
+        fac = self.corpus.get(value=value)
+        if fac is None or get_prime_cache().verify(fac):
+            return fac
+        logging.getLogger(__name__).warning('Factorer: dropped factorization of %d with composite factors %s', value, fac)
+        get_instrumentation().count('factorer.composite')
+        self.corpus.discard(value)
         return None
 
     def save(self):
-        with open(FACTOR_DATABASE, 'w') as fp:
-            writer = csv.writer(fp)
-            writer.writerows(sorted(self.database.items()))
+        if self.frozen:
+            return
+        self.corpus.save_cyclotomic_numbers_csv(self.database_path)
+        self.corpus.save(self.corpus_path)
 
     def load(self):
-        with open(FACTOR_DATABASE, 'r') as fp:
-            reader = csv.reader(fp)
-            for nb, fac in reader:
-                try:
-                    nb = eval(nb)
-                    fac = eval(fac)
-                    num = cyclotomic_polynomial(nb[0])(nb[1])
-                    assert num == facprod(fac)
-                    self.database[nb] = fac
-                except SyntaxError:
-                    logging.critical('Unable to eval: %s %s', nb, fac)
-                    raise
-        logging.getLogger(__name__).debug('Factorer.load: Loaded %s', self.database)
-
-    def read(self, yafu_out_fil):
-        """
-        Read yafu output file. Line format: (NUMBER)/FAC1/FAC2/...
-        """
-        for line in open(yafu_out_fil).readlines():
-            match = re.search(r'^\((\d+), (\d+)\) \((\d+)', line)
-            if not match:
-                continue
-            n = int(match.group(1))
-            b = int(match.group(2))
-            num = int(match.group(3))
-            facs = [(Integer(r), Integer(m or 1)) for r, m in re.findall(r'/(\d+)\^?(\d+)?', line)]
-
-            num2 = facprod(facs)
-            assert num == num2, '%d != %d = prod(%s)' % (num, num2, facs)
-
-            facs = cleanup_factorization(facs)
-            self.add((n, b), num, facs)
+        """
+        Loads factorizations of all legacy files and of the saved corpus.
+        """
+        self.corpus.import_cyclotomic_numbers_csv(self.database_path)
+        self.corpus.import_factors_csv()
+        self.corpus.import_factor_lib()
+        if os.path.exists(self.corpus_path):
+            self.corpus.import_corpus(self.corpus_path)
+        logging.getLogger(__name__).debug('Factorer.load: Loaded %s', self.corpus.report())
+
+    def validate(self, processes=None):
+        """
+        Proves all primes of the corpus once through the prime cache.
+        Returns list of values whose factorization contains a composite, get drops these on lookup.
+        """
+        is_prime = get_prime_cache().prove_all(self.corpus.primes, processes=processes)
+        return sorted(
+            value for value in self.corpus.packed
+            if not all(is_prime[r] for r, _ in self.corpus.get(value=value))
+        )
+
+    def read(self, yafu_out_fil, processes=None, chunksize=256):
+        """
+        Read yafu output file. Line format: (n, b) (NUMBER)/FAC1/FAC2/...
+        Lines are parsed and verified on a pool while the file is streamed,
+        rejected lines are logged and skipped. Accepted factorizations are saved once.
+        Returns (number of accepted lines, list of (line, reason) of rejected lines).
+        """
+        instrumentation = get_instrumentation()
+        prime_cache = get_prime_cache()
+        # Load the cache before forking, workers trust known primes
+        prime_cache.proofs
+        accepted = 0
+        rejected = []
+        proven = []
+        pool = multiprocessing.Pool(processes or multiprocessing.cpu_count())
+        try:
+            with open(yafu_out_fil) as fp:
+                for res in pool.imap(ingest_yafu_line, fp, chunksize=chunksize):
+                    if res is None:
+                        continue
+                    if res[0] == 'accepted':
+                        _, nb, num, facs, new_primes = res
+                        proven += new_primes
+                        if self.corpus.add(num, facs, nb=nb, source=yafu_out_fil):
+                            accepted += 1
+                            continue
+                        res = 'rejected', '%s (%d)' % (nb, num), 'conflict'
+                    logging.getLogger(__name__).warning('Factorer.read: rejected %s: %s', res[2], res[1])
+                    rejected += [res[1:]]
+        finally:
+            pool.terminate()
+            pool.join()
+        prime_cache.add(proven)
+        instrumentation.count('factorer.read.accepted', accepted)
+        instrumentation.count('factorer.read.rejected', len(rejected))
         self.save()
+        return accepted, rejected
+
+
+_factorer = None
 
 
-factorer = Factorer()
+def get_factorer():
+    """
+    Returns the global factorer, which is loaded on first call.
+    """
+    global _factorer
+    if _factorer is None:
+        _factorer = Factorer()
+    return _factorer
 
 
 def cleanup_factorization(factorization):
@@ -124,4 +299,6 @@ def cleanup_factorization(factorization):
 
 
 if __name__ == '__main__':
-    factorer.read(sys.argv[1])
+    logging.basicConfig(level=logging.INFO)
+    accepted, rejected = get_factorer().read(sys.argv[1])
+    print('accepted %d, rejected %d' % (accepted, len(rejected)))
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+
+"""
+Module factoring mid-size numbers in-process by a ladder of tiers:
+  1. trial division by primes = 1 mod m (and the primes dividing m),
+     i.e. the only possible prime factors of Phi_m(b),
+  2. Pollard's rho method,
+  3. elliptic curve method (stage 1, Montgomery curves).
+
+Every tier has a time budget per number. Composites no tier can split within
+its budget are left to yafu, the prime factors split off before are kept.
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import logging
+import random
+import time
+from ff_pcn.instrumentation import get_instrumentation
+from ff_pcn.pure_number_theory import (
+    gcd,
+    iroot,
+    is_prime,
+    pollard_rho,
+    prime_divisors,
+    primes,
+)
+
+
+class FactoringTier(object):
+    """
+    Base of the tiers. A tier implements find(num, m, deadline), which returns a
+    non-trivial factor of the composite num or None if none is found until deadline.
+    """
+
+    name = None
+
+    def __init__(self, budget):
+        """
+        :param budget: Time budget in seconds per number.
+        """
+        self.budget = budget
+
+
+class TrialDivisionTier(FactoringTier):
+
+    name = 'trial'
+
+    def __init__(self, budget=0.1, bound=10**6):
+        super(TrialDivisionTier, self).__init__(budget)
+        self.bound = bound
+        self._primes = None
+        self._candidates = dict()
+
+    def candidates(self, m):
+        """
+        Returns primes dividing m and primes = 1 mod m up to bound.
+        """
+        if m not in self._candidates:
+            if self._primes is None:
+                self._primes = list(primes(self.bound))
+            if m > 1:
+                self._candidates[m] = prime_divisors(m) + [p for p in self._primes if p % m == 1]
+            else:
+                self._candidates[m] = self._primes
+        return self._candidates[m]
+
+    def find(self, num, m, deadline):
+        for i, p in enumerate(self.candidates(m)):
+            if num % p == 0 and p != num:
+                return p
+            if i % 1024 == 0 and time.time() > deadline:
+                return None
+        return None
+
+
+class RhoTier(FactoringTier):
+
+    name = 'rho'
+
+    def __init__(self, budget=0.5, chunk=20000):
+        super(RhoTier, self).__init__(budget)
+        self.chunk = chunk
+
+    def find(self, num, m, deadline):
+        seed = 0
+        while time.time() < deadline:
+            d = pollard_rho(num, max_iterations=self.chunk, seed=seed)
+            if d is not None and d != num:
+                return d
+            seed += 1
+        return None
+
+
+def _ecm_curve(n, B1, sigma, deadline):
+    """
+    Runs stage 1 of ECM with Suyama parametrization sigma.
+    Returns gcd found (possibly 1 or n).
+    """
+    u = (sigma * sigma - 5) % n
+    v = 4 * sigma % n
+    X = pow(u, 3, n)
+    Z = pow(v, 3, n)
+    den = 16 * X * v % n
+    g = gcd(den, n)
+    if g != 1:
+        return g
+    a24 = pow(v - u, 3, n) * (3 * u + v) * _inverse(den, n) % n
+
+    def xdbl(X, Z):
+        t1 = (X + Z) * (X + Z) % n
+        t2 = (X - Z) * (X - Z) % n
+        t3 = t1 - t2
+        return t1 * t2 % n, t3 * (t2 + a24 * t3) % n
+
+    def xadd(X1, Z1, X2, Z2, Xd, Zd):
+        a = (X1 - Z1) * (X2 + Z2)
+        b = (X1 + Z1) * (X2 - Z2)
+        return Zd * (a + b) * (a + b) % n, Xd * (a - b) * (a - b) % n
+
+    def ladder(k, X, Z):
+        X1, Z1 = X, Z
+        X2, Z2 = xdbl(X, Z)
+        for bit in bin(k)[3:]:
+            if bit == '1':
+                X1, Z1 = xadd(X2, Z2, X1, Z1, X, Z)
+                X2, Z2 = xdbl(X2, Z2)
+            else:
+                X2, Z2 = xadd(X1, Z1, X2, Z2, X, Z)
+                X1, Z1 = xdbl(X1, Z1)
+        return X1, Z1
+
+    for i, p in enumerate(primes(B1 + 1)):
+        pe = p
+        while pe * p <= B1:
+            pe *= p
+        X, Z = ladder(pe, X, Z)
+        if i % 64 == 0 and time.time() > deadline:
+            break
+    return gcd(Z, n)
+
+
+def _inverse(a, n):
+    """
+    Returns the inverse of a mod n for gcd(a, n) = 1.
+    """
+    x0, x1, r0, r1 = 1, 0, a % n, n
+    while r1:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q * r1
+        x0, x1 = x1, x0 - q * x1
+    return x0 % n
+
+
+class EcmTier(FactoringTier):
+
+    name = 'ecm'
+
+    def __init__(self, budget=2.0, B1=2000, curves=200, seed=None):
+        super(EcmTier, self).__init__(budget)
+        self.B1 = B1
+        self.curves = curves
+        self.random = random.Random(seed)
+
+    def find(self, num, m, deadline):
+        for _ in range(self.curves):
+            if time.time() > deadline:
+                return None
+            g = _ecm_curve(num, self.B1, self.random.randrange(6, 2**32), deadline)
+            if 1 < g < num:
+                return g
+        return None
+
+
+def default_tiers():
+    """
+    Returns the default factoring ladder.
+    """
+    return [TrialDivisionTier(), RhoTier(), EcmTier()]
+
+
+class TierStatistics(object):
+
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.time = 0.0
+
+    def __repr__(self):
+        return 'attempts=%d successes=%d time=%.3fs' % (self.attempts, self.successes, self.time)
+
+
+class FactoringLadder(object):
+
+    def __init__(self, tiers=None):
+        self.tiers = tiers if tiers is not None else default_tiers()
+        self.stats = dict((tier.name, TierStatistics()) for tier in self.tiers)
+        self.factored = 0
+        self.escalated = 0
+
+    def _perfect_power(self, num):
+        for k in range(2, num.bit_length() + 1):
+            r = iroot(num, k)
+            if r < 2:
+                break
+            if r**k == num:
+                return r, k
+        return None
+
+    def factor(self, num, m=1):
+        """
+        Returns the factorization of num, whose prime factors are mostly 1 mod m,
+        as sorted list of (prime, multiplicity), or None if every tier failed.
+        """
+        facs, unsplit = self.factor_partial(num, m)
+        return None if unsplit else facs
+
+    def factor_partial(self, num, m=1, known=None):
+        """
+        Returns (factorization, unsplit) with num = prod(factorization) * prod(unsplit),
+        factorization a sorted list of (prime, multiplicity) and unsplit the sorted list of
+        composites no tier could split.
+
+        :param known: Function returning the factorization of a composite or None,
+            called before the tiers are tried.
+        """
+        num = int(num)
+        facs = dict()
+
+        def push(c, todo):
+            fac = known(c) if known is not None and c > 1 and not is_prime(c) else None
+            if fac is None:
+                todo.append(c)
+                return
+            for p, mul in fac:
+                facs[p] = facs.get(p, 0) + mul
+
+        todo = []
+        push(num, todo)
+        for tier in self.tiers:
+            stats = self.stats[tier.name]
+            left = []
+            while todo:
+                c = todo.pop()
+                if c == 1:
+                    continue
+                if is_prime(c):
+                    facs[c] = facs.get(c, 0) + 1
+                    continue
+                power = self._perfect_power(c)
+                if power is not None:
+                    todo += [power[0]] * power[1]
+                    continue
+                stats.attempts += 1
+                start = time.time()
+                with get_instrumentation().timer('ladder.%s' % tier.name):
+                    d = tier.find(c, m, start + tier.budget)
+                stats.time += time.time() - start
+                if d is None:
+                    left += [c]
+                    continue
+                stats.successes += 1
+                push(d, todo)
+                push(c // d, todo)
+            todo = left
+            if not todo:
+                break
+        if todo:
+            self.escalated += 1
+            logging.getLogger(__name__).info('FactoringLadder.factor: escalate %d (m=%d), cofactors %s', num, m, todo)
+        else:
+            self.factored += 1
+        return sorted(facs.items()), sorted(todo)
+
+    def report(self):
+        """
+        Returns statistics of the ladder as string.
+        """
+        return '\n'.join(
+            ['factored: %d, escalated: %d' % (self.factored, self.escalated)] +
+            ['%s: %r' % (tier.name, self.stats[tier.name]) for tier in self.tiers]
+        )
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+"""
+Module caching finite fields and the data derived from them.
+
+All triples (p, e, n) with equal m = e*n live in the same field GF(p^m). A
+FieldContext holds the field for one modulus together with its subfields,
+the extensions G = GF(p^(e*d)) of the subfields, their embeddings into the
+field, the cofactors used by the normality test and the Frobenius maps.
+Everything is built lazily on first use. FieldCache keeps the most recently
+used contexts keyed by (p, m, modulus).
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import collections
+from ff_pcn.backend import sage
+
+
+FIELD_CACHE_SIZE = 64
+"""Maximal number of field contexts kept per process."""
+
+
+def modulus_key(modulus):
+    """
+    Returns hashable key of a polynomial modulus, None for the default modulus.
+    """
+    if modulus is None:
+        return None
+    return tuple(int(c) for c in modulus.list())
+
+
+class FieldContext(object):
+
+    def __init__(self, p, m, modulus=None):
+        """
+        :param p: Characteristic.
+        :param m: Degree of the field over GF(p).
+        :param modulus: Irreducible polynomial of degree m over GF(p) or None for the default.
+        """
+        GF = sage().GF
+        self.p = p
+        self.m = m
+        self.modulus = modulus
+        if modulus is None:
+            self.E = GF(p**m, name='a')
+        else:
+            self.E = GF(p**m, name='a', modulus=modulus)
+        self._subfields = None
+        self._extensions = dict()
+        self._cofactors = dict()
+        self._frobenius = dict()
+
+    def subfield(self, e):
+        """
+        Returns the subfield F = GF(p^e) of E.
+        """
+        if self._subfields is None:
+            self._subfields = dict((fld.order(), fld) for fld, _ in self.E.subfields())
+        return self._subfields[self.p**e]
+
+    def extension(self, e, d):
+        """
+        Returns (G, h) with G = GF(p^e).extension(d) and h an embedding of G into E.
+        """
+        if (e, d) not in self._extensions:
+            G = self.subfield(e).extension(d)
+            self._extensions[(e, d)] = (G, sage().Hom(G, self.E)[0])
+        return self._extensions[(e, d)]
+
+    def cofactors(self, e, d):
+        """
+        Returns the cofactors (x^(n/d) - 1)/g for all irreducible factors g
+        over G = GF(p^(e*d)), n = m/e, mapped to E[x].
+        """
+        if (e, d) not in self._cofactors:
+            G, h = self.extension(e, d)
+            x = sage().PolynomialRing(G, 'x').gen()
+            basepol = x**(self.m//e//d) - 1
+            cofacs = [basepol.quo_rem(g)[0] for g, mul in list(basepol.factor())]
+            self._cofactors[(e, d)] = [g.map_coefficients(h) for g in cofacs]
+        return self._cofactors[(e, d)]
+
+    def frobenius(self, k):
+        """
+        Returns the Frobenius map x -> x^(p^k) of E.
+        """
+        if k not in self._frobenius:
+            self._frobenius[k] = self.E.frobenius_endomorphism(k)
+        return self._frobenius[k]
+
+
+class FieldCache(object):
+
+    def __init__(self, max_entries=FIELD_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.contexts = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def context(self, p, m, modulus=None):
+        """
+        Returns the FieldContext of GF(p^m) with modulus, evicting the least recently used one if full.
+        """
+        key = (int(p), int(m), modulus_key(modulus))
+        ctx = self.contexts.pop(key, None)
+        if ctx is None:
+            self.misses += 1
+            ctx = FieldContext(p, m, modulus)
+            if len(self.contexts) >= self.max_entries:
+                self.contexts.popitem(last=False)
+        else:
+            self.hits += 1
+        self.contexts[key] = ctx
+        return ctx
+
+    def field(self, p, m, modulus=None):
+        return self.context(p, m, modulus).E
+
+    def clear(self):
+        self.contexts.clear()
+
+    def __repr__(self):
+        return 'FieldCache(entries=%d, hits=%d, misses=%d)' % (len(self.contexts), self.hits, self.misses)
+
+
+_field_cache = None
+
+
+def get_field_cache():
+    """
+    Returns the global field cache, which is constructed on first call.
+    """
+    global _field_cache
+    if _field_cache is None:
+        _field_cache = FieldCache()
+    return _field_cache
@@ -9,32 +9,52 @@ __author__ = "Stefan Hackenberg"
 
 import itertools
 import logging
-from sage.all import (
-    GF,
-    Hom,
+import math
+import time
+from ff_pcn.backend import (
     Integer,
-    PolynomialRing,
     gcd,
-    prod,
-    sqrt,
+    log,
+    sage,
 )
 from ff_pcn.basic_number_theory import (
     regular,
     factor_with_euler_phi,
     euler_phi,
 )
+from ff_pcn.field_cache import get_field_cache
+from ff_pcn.instrumentation import get_instrumentation, timed
 from ff_pcn.finite_field_theory import (
     essential_divisors,
+    log_lower_euler_phi,
     lower_euler_phi,
-    omega_d,
+    omega_theta,
     primitive_element,
     is_primitive,
-    theta_d,
     u_qn,
     completely_normal,
 )
 
 
+class SearchResult(object):
+
+    def __init__(self, polynom, complete, candidates, last):
+        """
+        :param polynom: Polynom with pcn root or None.
+        :param complete: True if the search found polynom or tested all candidates.
+        :param candidates: Number of candidates tested, i.e. where a partial search resumes.
+        :param last: Last candidate tested or None.
+        """
+        self.polynom = polynom
+        self.complete = complete
+        self.candidates = candidates
+        self.last = last
+
+    def __repr__(self):
+        return 'SearchResult(%s, %s, candidates=%d, last=%s)' % (
+            self.polynom, 'complete' if self.complete else 'partial', self.candidates, self.last)
+
+
 class FiniteFieldExtension(object):
 
     def __init__(self, p, e, n):
@@ -76,34 +96,69 @@ class FiniteFieldExtension(object):
         """
         Returns lexicographic smallest polynom in F[x] of degree n with pcn root.
         """
+        return self.search_pcn_polynom().polynom
+
+    def search_pcn_polynom(self, time_limit=None, max_candidates=None, start=0):
+        """
+        Searches the lexicographic smallest polynom in F[x] of degree n with pcn root.
+        Returns a SearchResult, which is partial if the search stopped after time_limit seconds
+        or max_candidates candidates. A partial search is resumed by start=result.candidates.
+
+        :param start: Number of candidates tested by previous searches.
+        """
         def polynom_candidates(fx, deg):
             for f in fx.polynomials(max_degree=deg-2):
                 for a in fx.base_ring():
                     if a != 0:
                         yield fx.gen()**deg + a * fx.gen()**(deg-1) + f
+        GF, PolynomialRing = sage().GF, sage().PolynomialRing
+        instrumentation = get_instrumentation()
+        self.factor()
         fx = PolynomialRing(GF(self.p, 'a'), 'x')
-        logging.getLogger(__name__).debug('pcn_polynom')
-        for f in polynom_candidates(fx, self.e*self.n):
+        logging.getLogger(__name__).debug('pcn_polynom: start at candidate %d', start)
+        deadline = time.time() + time_limit if time_limit is not None else None
+        candidates = start
+        last = None
+        for f in itertools.islice(polynom_candidates(fx, self.e*self.n), start, None):
+            if (max_candidates is not None and candidates - start >= max_candidates) or \
+                    (deadline is not None and time.time() > deadline):
+                logging.getLogger(__name__).info('pcn_polynom: stopped after %d candidates at %s', candidates, last)
+                return SearchResult(None, False, candidates, last)
             logging.getLogger(__name__).debug('pcn_polynom: test f = %s', f)
-            if not f.is_irreducible():
-                continue
-            y = GF(self.q**self.n, name='a', modulus=f).gen()
-            if is_primitive(y, self.factorization) and completely_normal(self.p, self.e, self.n, f):
-                return f
+            instrumentation.count('pcn_polynom.candidates')
+            candidates += 1
+            last = f
+            with instrumentation.timer('pcn_polynom.irreducible'):
+                if not f.is_irreducible():
+                    continue
+            y = get_field_cache().field(self.p, self.e*self.n, f).gen()
+            with instrumentation.timer('pcn_polynom.primitive'):
+                if not is_primitive(y, self.factorization):
+                    continue
+            with instrumentation.timer('pcn_polynom.completely_normal'):
+                if completely_normal(self.p, self.e, self.n, f):
+                    return SearchResult(f, True, candidates, last)
+        return SearchResult(None, True, candidates, last)
+
+    def omega_theta(self):
+        """
+        Returns dict mapping d | n to (Omega_d, Theta_d, log(Theta_d)).
+        """
+        return omega_theta(self.p, self.e, self.n)
 
     def omega_d(self, d):
         """
         Returns Omega_d := sum_(t|(n/d)') phi(t)/ord_t(q^d).
         """
-        assert Integer(d).divides(self.n)
-        return omega_d(d, self.p, self.e, self.n)
+        assert self.n % d == 0
+        return self.omega_theta()[d][0]
 
     def theta_d(self, d):
         """
         Returns Theta_d := Phi_(q^d)(x^(n/d)' - 1) / q^(d*(n/d)').
         """
-        assert Integer(d).divides(self.n)
-        return theta_d(d, self.p, self.e, self.n)
+        assert self.n % d == 0
+        return self.omega_theta()[d][1]
 
     def u_qn(self):
         """
@@ -115,7 +170,13 @@ class FiniteFieldExtension(object):
         """
         Returns L_(p**e,n). Equation 4.2.
         """
-        return lower_euler_phi(self.qn - 1).n(10)
+        return lower_euler_phi(self.qn - 1)
+
+    def log_l_qn(self):
+        """
+        Returns log(L_(p**e,n)).
+        """
+        return log_lower_euler_phi(self.qn - 1)
 
     def essential_divisors(self):
         """
@@ -126,6 +187,7 @@ class FiniteFieldExtension(object):
     def regular(self):
         return regular(self.p, self.e, self.n)
 
+    @timed('factor')
     def factor(self, use_factorer=True):
         """
         Returns factorization of q^n - 1.
@@ -135,61 +197,74 @@ class FiniteFieldExtension(object):
         self.factorization = factor_with_euler_phi(self.p, self.e*self.n, use_factorer=use_factorer)
         return self.factorization
 
+    def _log_prod_theta_omega(self):
+        """
+        Returns log(prod_d( Theta_d * 2^Omega_d )) over all essential divisors d.
+        """
+        omega_theta = self.omega_theta()
+        return sum(
+            omega_theta[d][2] + math.log(2) * omega_theta[d][0]
+            for d in
+            self.essential_divisors()
+        )
+
+    @timed('criterion_1')
     def pcn_criterion_1(self):
         """
         Returns True, if Criterion 1 applies.
 
         Criterion 1:
         L_qn > U_qn
+
+        Both sides are compared logarithmically.
         """
-        ls = self.l_qn()
-        rs = self.u_qn()
-        logging.getLogger(__name__).debug('pcn_criterion_1: %E > %E', ls, rs)
+        ls = self.log_l_qn()
+        rs = log(self.u_qn())
+        logging.getLogger(__name__).debug('pcn_criterion_1: log %E > log %E', ls, rs)
         return ls > rs
 
+    @timed('criterion_2')
     def pcn_criterion_2(self):
         """
         Returns True, if Criterion 2 applies.
 
         Criterion 2: Equation 5.3
         q^n - U_qn >= 4514.7 * q^(5n/8) 2^sum_d Omega_d
+
+        Both sides are compared logarithmically.
         """
-        qn = self.qn
-        ls = self.qn - self.u_qn()
-        rs = 4514.7 * qn**(5.0/8) * 2**sum(
-            self.omega_d(d)
+        log_qn = log(self.qn)
+        ls = log(self.qn - self.u_qn())
+        omega_theta = self.omega_theta()
+        rs = math.log(4514.7) + 5.0/8 * log_qn + math.log(2) * sum(
+            omega_theta[d][0]
             for d in
             self.essential_divisors()
         )
-        logging.getLogger(__name__).debug('pcn_criterion_2: %E >= %E', ls, rs)
-        assert rs >= 0
+        logging.getLogger(__name__).debug('pcn_criterion_2: log %E >= log %E', ls, rs)
         return ls >= rs
 
+    @timed('criterion_3')
     def pcn_criterion_3(self):
         """
         Returns True, if Criterion 3 applies.
 
         Criterion 3: Equation 5.3 with 5.1
         q^n - U_qn >= 4514.7 * q^(5n/8) prod_d( Theta_d * 2^Omega_d )
+
+        Both sides are compared logarithmically.
         """
-        qn = self.qn
-        ls = self.qn - self.u_qn()
-        rs = 4514.7 * qn**(5.0/8) * prod(
-            self.theta_d(d) * 2 ** self.omega_d(d)
-            for d in
-            self.essential_divisors()
-        )
-        logging.getLogger(__name__).debug('pcn_criterion_3: %E >= %E', ls, rs)
-        assert rs >= 0
+        log_qn = log(self.qn)
+        ls = log(self.qn - self.u_qn())
+        log_prod = self._log_prod_theta_omega()
+        rs = math.log(4514.7) + 5.0/8 * log_qn + log_prod
+        logging.getLogger(__name__).debug('pcn_criterion_3: log %E >= log %E', ls, rs)
         if ls < rs:
-            rs = 4.9 * qn**(3.0/4) * prod(
-                self.theta_d(d) * 2 ** self.omega_d(d)
-                for d in
-                self.essential_divisors()
-            )
-            logging.getLogger(__name__).debug('pcn_criterion_3: %E >= %E', ls, rs)
+            rs = math.log(4.9) + 3.0/4 * log_qn + log_prod
+            logging.getLogger(__name__).debug('pcn_criterion_3: log %E >= log %E', ls, rs)
         return ls >= rs
 
+    @timed('criterion_4')
     def pcn_criterion_4(self):
         """
         Returns True, if Criterion 3 applies.
@@ -201,16 +276,12 @@ class FiniteFieldExtension(object):
         """
         factorization = self.factor()
         omega = len(factorization)
-        ls = self.qn - self.u_qn()
-        rs = sqrt(self.q**self.n).n() * (2.0**omega - 1) * prod(
-            self.theta_d(d) * 2.0 ** self.omega_d(d)
-            for d in
-            self.essential_divisors()
-        )
-        logging.getLogger(__name__).debug('pcn_criterion_4: %E >= %E', ls, rs)
-        assert rs >= 0
+        ls = log(self.qn - self.u_qn())
+        rs = 0.5 * log(self.qn) + log(2**omega - 1) + self._log_prod_theta_omega()
+        logging.getLogger(__name__).debug('pcn_criterion_4: log %E >= log %E', ls, rs)
         return ls >= rs
 
+    @timed('criterion_5')
     def pcn_criterion_5(self):
         """
         Returns True, if Criterion 5 applies.
@@ -222,11 +293,12 @@ class FiniteFieldExtension(object):
         """
         ls = euler_phi(self.factorization)
         rs = self.u_qn()
-        logging.getLogger(__name__).debug('pcn_criterion_5: %E >= %E', ls, rs)
+        logging.getLogger(__name__).debug('pcn_criterion_5: %s >= %s', ls, rs)
         assert ls > 0
         assert rs > 0
         return ls > rs
 
+    @timed('criterion_6')
     def pcn_criterion_6(self):
         """
         Returns smallest PCN polynom, if Criterion 6 applies.
@@ -9,17 +9,14 @@ __author__ = "Stefan Hackenberg"
 
 import logging
 import itertools
-from sage.all import (
-    DiGraph,
-    GF,
-    Hom,
+import math
+from fractions import Fraction
+from ff_pcn.backend import (
     Integer,
-    PolynomialRing,
     divisors,
-    e as euler_const,
-    euler_gamma,
     euler_phi,
     factor,
+    gcd,
     is_prime,
     log,
     moebius,
@@ -28,9 +25,10 @@ from sage.all import (
     prod,
     uniq,
 )
-from ff_pcn.basic_number_theory import largest_divisor, ordn, squarefree, p_free_part, regular
+from ff_pcn.basic_number_theory import largest_divisor, multiplicity, ordn, squarefree, p_free_part, regular
 from ff_pcn.datastore import store
-from ff_pcn.factorer import factorer
+from ff_pcn.field_cache import get_field_cache
+from ff_pcn.instrumentation import timed
 
 
 def decompose(p, e, n):
@@ -38,7 +36,7 @@ def decompose(p, e, n):
     Application of the Decomposition Theorem (Section 19) for x^n-1 over F_p^e.
     """
     pi = largest_divisor(p, n)
-    return decompose_cyclic_module(p, e, 1, n/pi, pi)
+    return decompose_cyclic_module(p, e, 1, n//pi, pi)
 
 
 def decompose_cyclic_module(p, e, k, t, pi):
@@ -46,13 +44,43 @@ def decompose_cyclic_module(p, e, k, t, pi):
     Internal application of the Decomposition Theorem for Phi_k(x^(t*pi)) over F_p^e.
     """
     logging.getLogger(__name__).debug('decompose_cyclic_module (%d, %d, (%d,%d,%d))', p, e, k, t, pi)
-    assert not p.divides(k*t), 'p must not divide kt'
+    assert (k*t) % p != 0, 'p must not divide kt'
+    q = p**e
+    return [(k_, t_, pi) for k_, t_ in _decomposition(q % squarefree(k*t), k, t)]
+
+
+@store('decomposition_split', max_entries=100000)
+def _decomposition_split(q, k, t):
+    """
+    Returns the largest prime power R = r^l || t with r^l not dividing ord_nu(kt)(q),
+    i.e. Phi_k(x^t) splits into Phi_k(x^(t/r)) and Phi_(kR)(x^(t/R)), or None if it does not split.
+    q only matters modulo nu(kt).
+    """
+    o = ordn(squarefree(k*t), q)
+    for r, l in reversed(list(factor(t))):
+        if o % r**l != 0:
+            return r, r**l
+    return None
+
 
-    for r, l in reversed(factor(t)):
-        if not (r**l).divides(ordn(squarefree(k*t), p**e)):
-            R = largest_divisor(r, t)
-            return decompose_cyclic_module(p, e, k, t/r, pi) + decompose_cyclic_module(p, e, k*R, t/R, pi)
-    return [(k, t, pi)]
+@store('decomposition', max_entries=100000)
+def _decomposition(q, k, t):
+    """
+    Returns the decomposition of Phi_k(x^t) over F_q as list of (k, t).
+    q only matters modulo nu(kt), so the key is (q mod nu(kt), k, t).
+    Iterative, the splits of all subproblems are shared.
+    """
+    ret = []
+    stack = [(k, t)]
+    while stack:
+        k, t = stack.pop()
+        split = _decomposition_split(q % squarefree(k*t), k, t)
+        if split is None:
+            ret += [(k, t)]
+            continue
+        r, R = split
+        stack += [(k*R, t//R), (k, t//r)]
+    return ret
 
 
 def module_characters(decomp):
@@ -60,10 +88,47 @@ def module_characters(decomp):
     Returns the module characters of a given decomposition:
     The module character of U_F,Phi_k(x^t) is k*t / nu(k)
     """
-    return uniq(map(lambda l: l[0]*l[1]*l[2] / squarefree(l[0]), decomp))
+    return uniq(map(lambda l: l[0]*l[1]*l[2] // squarefree(l[0]), decomp))
+
+
+@store('decomposition_characters', max_entries=100000)
+def decomposition_characters(p, e, n):
+    """
+    Returns the module characters of the decomposition of x^n-1 over F_p^e.
+    """
+    pi = largest_divisor(p, n)
+    t = n//pi
+    return uniq(k*t_*pi // squarefree(k) for k, t_ in _decomposition(p**e % squarefree(t), 1, t))
+
+
+@store('q_power', max_entries=100000)
+def q_power(q, m):
+    """
+    Returns q^m.
+    """
+    return q**m
+
+
+@store('necklace_sum', max_entries=100000)
+def necklace_sum(q, m):
+    """
+    Returns sum_(a|m) mu(m/a) q^a, i.e. m times the number of monic irreducible
+    polynomials of degree m over GF(q).
+    """
+    return sum(moebius(m//a)*q_power(q, a) for a in divisors(m))
 
 
-# @store('euler_polynomial')
+@store('euler_polynomial_factor', max_entries=100000)
+def euler_polynomial_factor(qd, e):
+    """
+    Returns the factor of phi_(qd)(x^tau - 1) belonging to Phi_e with e | tau, i.e.
+    (qd^ord_e(qd) - 1)^(phi(e)/ord_e(qd)).
+    """
+    o = ordn(e, qd)
+    return (q_power(qd, o) - 1)**(euler_phi(e)//o)
+
+
+@store('euler_polynomial')
 def euler_polynomial(q, d, n):
     """
     Returns phi_(q^d)(x^(n/d)-1) where phi_q is the polynomial analogon for the euler totient function.
@@ -74,16 +139,8 @@ def euler_polynomial(q, d, n):
     """
     p = prime_divisors(q)[0]
     tau = p_free_part(n//d, p)
-
-    qd = q**d
-    divs_tau = divisors(tau)
-    ordne = {e: ordn(e, qd) for e in divs_tau}
-
-    return q**(n//d-tau) * \
-        prod((
-              (qd**ordne[e] - 1)**(euler_phi(e)//ordne[e])
-              for e in divisors(tau)
-          ))
+    qd = q_power(q, d)
+    return q_power(q, n//d-tau) * prod(euler_polynomial_factor(qd, e) for e in divisors(tau))
 
 
 def universal_essential_set(n):
@@ -92,21 +149,29 @@ def universal_essential_set(n):
     """
     n = Integer(n)
     prims = prime_divisors(n)
-    prims_good = filter(lambda r: not any([r.divides(s-1) for s in prims]), prims)
-    prims_good = dict((r,get_multiplicity(r,n)) for r in prims_good)
+    prims_good = filter(lambda r: not any([(s-1) % r == 0 for s in prims]), prims)
+    prims_good = dict((r,multiplicity(r,n)) for r in prims_good)
     divsN = divisors(n)[:-1]
     adjfunc = (lambda i,j:
-               i.divides(j) and (Integer(j/i) in prims_good) and
-               ((get_multiplicity(Integer(j/i),i) == prims_good[Integer(j/i)]-1
-                 and get_multiplicity(Integer(j/i),j) == prims_good[Integer(j/i)])
+               j % i == 0 and (j//i in prims_good) and
+               ((multiplicity(j//i,i) == prims_good[j//i]-1
+                 and multiplicity(j//i,j) == prims_good[j//i])
                 or
-                (get_multiplicity(Integer(j/i),i) == prims_good[Integer(j/i)]-2
-                 and get_multiplicity(Integer(j/i),j) == prims_good[Integer(j/i)]-1)))
-    g = DiGraph([divsN, adjfunc])
-    verts_indegzero = filter(lambda v: g.in_degree(vertices=[v]) == [0], g.vertices())
-    return verts_indegzero
+                (multiplicity(j//i,i) == prims_good[j//i]-2
+                 and multiplicity(j//i,j) == prims_good[j//i]-1)))
+    return _in_degree_zero(divsN, adjfunc)
 
 
+def _in_degree_zero(vertices, adjfunc):
+    """
+    Returns the vertices without incoming edges of the digraph on vertices
+    with an edge i -> j iff adjfunc(i, j).
+    """
+    return [j for j in vertices if not any(adjfunc(i, j) for i in vertices)]
+
+
+@store('essential_divisors', persistent=True)
+@timed('essential_divisors')
 def essential_divisors(p, e, n):
     """
     Returns a list of essential divisors of (p, e, n).
@@ -116,12 +181,11 @@ def essential_divisors(p, e, n):
         return []
     divsN = divisors(n)[:-1]
     adjfunc = (lambda i,j:
-               i.divides(j) and is_prime(Integer(j/i)) and
-               not Integer(j/i).divides(ordn(p_free_part(n/j, p), q**i)))
-    g = DiGraph([divsN, adjfunc])
-    verts_indegzero = filter(lambda v: g.in_degree(vertices=[v]) == [0], g.vertices())
-    divsModChar = list(uniq(itertools.chain(*map(divisors, module_characters(decompose(p, e, n))))))
-    essential_divs = filter(lambda d: d in divsModChar, verts_indegzero)
+               j % i == 0 and is_prime(j//i) and
+               ordn(p_free_part(n//j, p), q**i) % (j//i) != 0)
+    verts_indegzero = _in_degree_zero(divsN, adjfunc)
+    divsModChar = list(uniq(itertools.chain(*map(divisors, decomposition_characters(p, e, n)))))
+    essential_divs = [d for d in verts_indegzero if d in divsModChar]
     logging.getLogger(__name__).debug('essential_divisors (%d, %d, %d) => %s', p, e, n, essential_divs)
     return essential_divs
 
@@ -151,6 +215,8 @@ def is_primitive(y, facs):
     return False
 
 
+@store('u_qn', persistent=True)
+@timed('u_qn')
 def u_qn(p, e, n):
     """
     Returns U_(p**e,n). Proposition 4.4.
@@ -159,10 +225,7 @@ def u_qn(p, e, n):
 
     essential_divs = essential_divisors(p, e, n)
     border = sum(
-        sum(
-            moebius(n//(d*a))*q**(d*a)
-            for a in divisors(n//d)
-        ) - euler_polynomial(q, d, n)
+        necklace_sum(q_power(q, d), n//d) - euler_polynomial(q, d, n)
         for d in essential_divs
     )
     assert border >= 0
@@ -186,16 +249,64 @@ def theta_d(d, p, e, n):
     """
     q = p**e
     n_ = p_free_part(n//d, p)*d
-    ret = euler_polynomial(q, d, n_) / q**(d * p_free_part(n//d, p))
+    ret = Fraction(int(euler_polynomial(q, d, n_)), int(q_power(q, d * p_free_part(n//d, p))))
     assert ret < 1
     return ret
 
 
+@store('omega_theta')
+def omega_theta(p, e, n):
+    """
+    Returns dict mapping every d | n to (Omega_d, Theta_d, log(Theta_d)), see omega_d and theta_d.
+
+    The divisor lattice of n' = p_free_part(n) is walked once: with o_t = ord_t(q)
+    ord_t(q^d) = o_t / gcd(o_t, d) for all d, so orders and phi(t) are shared, and
+    log(Theta_d) = sum_(t|(n/d)') phi(t)/ord_t(q^d) * log(1 - q^(-d*ord_t(q^d))).
+    """
+    q = p**e
+    n_ = p_free_part(n, p)
+    divs_n_ = divisors(n_)
+    phis = dict((t, euler_phi(t)) for t in divs_n_)
+    ords = dict((t, ordn(t, q)) for t in divs_n_)
+    ret = dict()
+    for d in divisors(n):
+        tau = p_free_part(n//d, p)
+        omega = 0
+        numerator = 1
+        log_theta = 0.0
+        for t in divisors(tau):
+            o = ords[t] // gcd(ords[t], d)
+            omega += phis[t] // o
+            numerator *= (q_power(q, d*o) - 1)**(phis[t]//o)
+            log_theta += phis[t] // o * math.log1p(-float(q)**(-d*o))
+        ret[d] = (omega, Fraction(int(numerator), int(q_power(q, d*tau))), log_theta)
+    return ret
+
+
+def log_lower_euler_phi(n):
+    """
+    Returns the logarithm of a lower bound for euler_phi(n):
+    log(n/(e^gamma * log(log(n)) + 3/log(log(n)))).
+    For n < 3 the bound is 0, i.e. -inf is returned.
+    """
+    if n < 3:
+        return float('-inf')
+    loglog = math.log(log(n))
+    return log(n) - math.log(math.exp(_EULER_GAMMA) * loglog + 3/loglog)
+
+
 def lower_euler_phi(n):
     """
     Returns a lower bound for euler_phi(n).
     """
-    return n/(euler_const**euler_gamma * log(log(n)) + 3/log(log(n)))
+    if n < 3:
+        return 0
+    loglog = math.log(log(n))
+    return n / Fraction(math.exp(_EULER_GAMMA) * loglog + 3/loglog)
+
+
+_EULER_GAMMA = 0.57721566490153286061
+"""Euler-Mascheroni constant."""
 
 
 def pens_to_check(n):
@@ -207,7 +318,7 @@ def pens_to_check(n):
     n = Integer(n)
     tocheck = []
     for p in primes(n):
-        for e in xrange(1, n):
+        for e in range(1, n):
             if regular(p, e, n):
                 continue
             if p**e >= p_free_part(n, p):
@@ -216,20 +327,22 @@ def pens_to_check(n):
     return tocheck
 
 
-def _eval_frob(f, y, q):
+def _eval_frob(f, y, q, frob=None):
     """
     Evaluates f(sigma)(y) for sigma: x -> x^q.
+    If given, frob is used as sigma.
     """
     ret = 0
     last_pot = 0
     for pot, coeff in enumerate(f):
-        y **= q**(pot - last_pot)
+        for _ in range(pot - last_pot):
+            y = frob(y) if frob is not None else y**q
         last_pot = pot
         ret += coeff * y
     return ret
 
 
-def _normal(q, d, y, cofactors):
+def _normal(q, d, y, cofactors, frob=None):
     """
     Returns True if y in E is normal over G = GF(q^d).
 
@@ -239,8 +352,9 @@ def _normal(q, d, y, cofactors):
     with sigma: x -> x^q.
     """
     for cofac in cofactors[d]:
-        logging.getLogger(__name__).debug('normal: test cofac: (%s)(x->x^%d)(y) = %s', cofac, q**d, _eval_frob(cofac, y, q**d))
-        if not _eval_frob(cofac, y, q**d):
+        value = _eval_frob(cofac, y, q**d, frob)
+        logging.getLogger(__name__).debug('normal: test cofac: (%s)(x->x^%d)(y) = %s', cofac, q**d, value)
+        if not value:
             return False
     return True
 
@@ -248,21 +362,14 @@ def _normal(q, d, y, cofactors):
 def completely_normal(p, e, n, f):
     """
     Returns True if f in F[x] is completely normal.
+    Fields, embeddings and cofactors are taken from the field cache.
     """
     q = p**e
     essential_divs = essential_divisors(p, e, n)
-    E = GF(q**n, modulus=f, name='a')
-    F = [fld for fld in E.subfields() if fld[0].order() == q][0][0]
-    logging.getLogger(__name__).debug('completely_normal: F = %s, E = %s, f = %s', F, E, f)
-    cofactors = {}
-    for d in essential_divs:
-        G = F.extension(d)
-        Gx = PolynomialRing(G, 'x')
-        h = Hom(G, E)[0]
-        basepol = Gx.gen()**(n//d)-1
-        cofacs = [basepol.quo_rem(f)[0] for f, mul in list(basepol.factor())]
-        cofacs = [f.map_coefficients(h) for f in cofacs]
-        cofactors[d] = cofacs
+    ctx = get_field_cache().context(p, e*n, f)
+    logging.getLogger(__name__).debug('completely_normal: E = %s, f = %s', ctx.E, f)
+    cofactors = dict((d, ctx.cofactors(e, d)) for d in essential_divs)
     logging.getLogger(__name__).debug('completely_normal: cofactors = %s', cofactors)
 
-    return all(_normal(q, d, E.gen(), cofactors) for d in essential_divs)
+    y = ctx.E.gen()
+    return all(_normal(q, d, y, cofactors, ctx.frobenius(e*d)) for d in essential_divs)
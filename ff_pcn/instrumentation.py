@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+
+"""
+Module instrumenting the existence checks with timers and counters.
+
+Timers and counters are aggregated per process (worker). If a triple (p, e, n)
+is active, they are additionally recorded for this triple. Every worker saves
+its measurements with Instrumentation.save, merge_reports aggregates all
+workers of a run into report.json and triples.csv. Pool workers save when
+they exit (save_at_exit) and in between every SAVE_INTERVAL triples.
+
+Setting the environment variable FF_PCN_PROFILE=p,e,n runs cProfile while
+this triple is checked and writes profile_p_e_n.prof.
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import collections
+import contextlib
+import csv
+import glob
+import json
+import multiprocessing.util
+import os
+import time
+
+
+PROFILE_TRIPLE = os.environ.get('FF_PCN_PROFILE')
+"""Triple p,e,n to profile with cProfile or None."""
+
+SAVE_INTERVAL = 100
+"""Number of triples after which a worker saves its measurements by checkpoint."""
+
+
+class StageStatistics(object):
+
+    def __init__(self, count=0, time=0.0, max_time=0.0):
+        self.count = count
+        self.time = time
+        self.max_time = max_time
+
+    def add(self, elapsed):
+        self.count += 1
+        self.time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def merge(self, other):
+        self.count += other.count
+        self.time += other.time
+        self.max_time = max(self.max_time, other.max_time)
+
+    def as_dict(self):
+        return {'count': self.count, 'time': self.time, 'max_time': self.max_time}
+
+    def __repr__(self):
+        return 'count=%d time=%.3fs max_time=%.3fs' % (self.count, self.time, self.max_time)
+
+
+class Instrumentation(object):
+
+    def __init__(self, profile=None, profile_folder='.', max_triples=None):
+        """
+        :param profile: Triple (p, e, n) to run cProfile for or None.
+        :param profile_folder: Folder for profile_p_e_n.prof.
+        :param max_triples: Number of most recent triple records kept, None for all.
+        """
+        self.pid = os.getpid()
+        self.stages = collections.defaultdict(StageStatistics)
+        self.counters = collections.defaultdict(int)
+        self.triples = []
+        """Records of all checked triples."""
+        self.max_triples = max_triples
+        self.profile = tuple(profile) if profile else None
+        self.profile_folder = profile_folder
+        self._triple = None
+        self._unsaved = 0
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        """
+        Context measuring the time spent in stage.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            self.stages[stage].add(elapsed)
+            if self._triple is not None:
+                stages = self._triple['stages']
+                stages[stage] = stages.get(stage, 0.0) + elapsed
+
+    def count(self, counter, k=1):
+        self.counters[counter] += k
+        if self._triple is not None:
+            counters = self._triple['counters']
+            counters[counter] = counters.get(counter, 0) + k
+
+    def annotate(self, key, value):
+        """
+        Sets key of the record of the active triple.
+        """
+        if self._triple is not None:
+            self._triple[key] = value
+
+    @contextlib.contextmanager
+    def triple(self, p, e, n):
+        """
+        Context recording all measurements for the triple (p, e, n).
+        """
+        outer = self._triple
+        record = {'p': int(p), 'e': int(e), 'n': int(n), 'stages': dict(), 'counters': dict()}
+        self._triple = record
+        profiler = None
+        if self.profile == (int(p), int(e), int(n)):
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.time()
+        try:
+            yield record
+        finally:
+            record['time'] = time.time() - start
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.profile_folder, 'profile_%d_%d_%d.prof' % (p, e, n)))
+            self.triples.append(record)
+            self._unsaved += 1
+            if self.max_triples is not None and len(self.triples) > self.max_triples:
+                del self.triples[:-self.max_triples]
+            self._triple = outer
+
+    def as_dict(self):
+        return {
+            'pid': self.pid,
+            'stages': dict((stage, stats.as_dict()) for stage, stats in self.stages.items()),
+            'counters': dict(self.counters),
+            'triples': self.triples,
+        }
+
+    def save(self, folder):
+        """
+        Writes measurements of this worker to folder/worker_<pid>.json.
+        """
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        with open(os.path.join(folder, 'worker_%d.json' % self.pid), 'w') as fp:
+            json.dump(self.as_dict(), fp)
+        self._unsaved = 0
+
+    def checkpoint(self, folder, interval=SAVE_INTERVAL):
+        """
+        Saves to folder if at least interval triples were recorded since the last save.
+        """
+        if self._unsaved >= interval:
+            self.save(folder)
+
+    def report(self):
+        """
+        Returns statistics of all stages and counters as string.
+        """
+        return '\n'.join(
+            ['%s: %r' % (stage, self.stages[stage]) for stage in sorted(self.stages)] +
+            ['%s: %d' % (counter, self.counters[counter]) for counter in sorted(self.counters)]
+        )
+
+
+def load_triples(folder):
+    """
+    Returns records of all triples saved by workers in folder.
+    """
+    ret = []
+    for fil in sorted(glob.glob(os.path.join(folder, 'worker_*.json'))):
+        with open(fil) as fp:
+            ret += json.load(fp)['triples']
+    return ret
+
+
+def merge_reports(folder):
+    """
+    Aggregates all worker files of folder into report.json (per worker and
+    total) and triples.csv (one line per triple with times per stage).
+    """
+    workers = []
+    for fil in sorted(glob.glob(os.path.join(folder, 'worker_*.json'))):
+        with open(fil) as fp:
+            workers += [json.load(fp)]
+
+    total = collections.defaultdict(StageStatistics)
+    counters = collections.defaultdict(int)
+    triples = []
+    for worker in workers:
+        for stage, stats in worker['stages'].items():
+            total[stage].merge(StageStatistics(**stats))
+        for counter, k in worker['counters'].items():
+            counters[counter] += k
+        triples += worker['triples']
+
+    report = {
+        'workers': dict((worker['pid'], {'stages': worker['stages'], 'counters': worker['counters'],
+                                         'triples': len(worker['triples'])})
+                        for worker in workers),
+        'total': {
+            'stages': dict((stage, stats.as_dict()) for stage, stats in total.items()),
+            'counters': dict(counters),
+            'triples': len(triples),
+        },
+    }
+    with open(os.path.join(folder, 'report.json'), 'w') as fp:
+        json.dump(report, fp, indent=2, sort_keys=True)
+
+    stages = sorted(set(stage for t in triples for stage in t['stages']))
+    with open(os.path.join(folder, 'triples.csv'), 'w') as fp:
+        writer = csv.writer(fp)
+        writer.writerow(['p', 'e', 'n', 'time', 'decided_by'] + stages)
+        for t in sorted(triples, key=lambda t: (t['n'], t['p'], t['e'])):
+            writer.writerow(
+                [t['p'], t['e'], t['n'], '%.6f' % t['time'], t.get('decided_by', '')] +
+                ['%.6f' % t['stages'][stage] if stage in t['stages'] else '' for stage in stages]
+            )
+    return report
+
+
+_instrumentation = None
+
+
+def get_instrumentation():
+    """
+    Returns the instrumentation of the current process, which is constructed on first call.
+    Forked workers get their own.
+    """
+    global _instrumentation
+    if _instrumentation is None or _instrumentation.pid != os.getpid():
+        profile = tuple(int(x) for x in PROFILE_TRIPLE.split(',')) if PROFILE_TRIPLE else None
+        _instrumentation = Instrumentation(profile=profile)
+    return _instrumentation
+
+
+def _save(folder):
+    get_instrumentation().save(folder)
+
+
+def save_at_exit(folder):
+    """
+    Saves the measurements of the current process to folder when it exits, e.g. registered
+    in the initializer of a pool, whose workers exit after Pool.close and Pool.join.
+    """
+    multiprocessing.util.Finalize(None, _save, args=(folder,), exitpriority=10)
+
+
+def timed(stage):
+    """
+    Decorator measuring the time spent in the decorated function as stage.
+    """
+    def timed_decorator(func):
+        def wrapped_func(*k, **kwargs):
+            with get_instrumentation().timer(stage):
+                return func(*k, **kwargs)
+        wrapped_func.__name__ = func.__name__
+        wrapped_func.__doc__ = func.__doc__
+        return wrapped_func
+    return timed_decorator
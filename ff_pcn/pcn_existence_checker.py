@@ -12,20 +12,47 @@ except ImportError:
     import sys
     import os
     sys.path.append(os.path.abspath(os.path.join(__file__, '../../')))
+import functools
 import logging
 import multiprocessing
-from sage.all import Integer, euler_gamma, log, PolynomialRing, divisors, factor, primes, ZZ, prod, euler_phi, uniq
-from ff_pcn import ExistanceReasonRegular, ExistanceReasonPrimitivesMoreEqualNotNormalsApprox, ExistanceReasonPrimitivesMoreEqualNotNormals, ExistanceReasonNeedFactorization, ExistanceReasonFoundOne, ExistanceReasonNotExisting, MissingFactorsException, ExistanceReasonProposition53
+import os
+import tempfile
+from ff_pcn.backend import Integer, divisors, factor, primes, prod, euler_phi, uniq
+from ff_pcn import ExistanceReasonRegular, ExistanceReasonPrimitivesMoreEqualNotNormalsApprox, ExistanceReasonPrimitivesMoreEqualNotNormals, ExistanceReasonNeedFactorization, ExistanceReasonFoundOne, ExistanceReasonNotExisting, MissingFactorsException, ExistanceReasonProposition53, ExistanceReasonSearchPartial, ExistanceReasonSearchDeferred
 from ff_pcn.basic_number_theory import is_regular, factor_with_euler_phi, p_free_part
 from ff_pcn.finite_field_extension import FiniteFieldExtension
-from ff_pcn.database import database
-from ff_pcn.factorer import factorer
+from ff_pcn.database import get_database
+from ff_pcn.factorer import get_factorer
 from ff_pcn.finite_field_theory import pens_to_check
+from ff_pcn.cost_model import get_cost_model
+from ff_pcn.instrumentation import get_instrumentation, merge_reports, save_at_exit
+from ff_pcn.power_factorizations import get_power_factorization_store
+from ff_pcn.shared_tables import attach_shared_tables, build_shared_tables, detach_shared_tables
 
 
-def check_p_n(pn):
-    p, n = pn
-    for e in xrange(1,n):
+SEARCH_BUDGET = 3600
+"""Seconds an explicit search of a triple is estimated to take at most, to be tried during a sweep."""
+
+SEARCH_TIME = 600
+"""Seconds an explicit search runs during a sweep before it is moved to the long-job queue."""
+
+LONG_JOB_QUEUE = os.path.abspath(os.path.join(__file__, '../../result/long_jobs'))
+"""Queue folder (see ff_pcn.sweep_coordinator) of searches stopped by SEARCH_TIME."""
+
+
+def instrumentation_folder(name):
+    """
+    Returns folder for the instrumentation reports of run name next to the results.
+    """
+    return os.path.join(get_database().result_folder, 'instrumentation', name)
+
+
+def triples_to_check(p, n):
+    """
+    Returns the non regular triples (p, e, n) checked by check_p_n.
+    """
+    ret = []
+    for e in range(1,n):
         q = p**e
         if q >= p_free_part(n, p):
             continue
@@ -33,17 +60,99 @@ def check_p_n(pn):
             break
         if is_regular(p, e, 1, n, 1):
             continue
-        checker = PCNExistenceChecker(p, e, q, n)
+        ret += [(p, e, n)]
+    return ret
+
+
+def submit_long_job(checker, reason, long_job_queue=LONG_JOB_QUEUE):
+    """
+    Submits the explicit search of checker to long_job_queue if it was deferred (from the start)
+    or stopped by search_time (resuming after the candidates already tried).
+    Returns True if a job was submitted.
+    """
+    if isinstance(reason, ExistanceReasonSearchDeferred):
+        start = 0
+    elif checker.search is not None and not checker.search.complete:
+        start = checker.search.candidates
+    else:
+        return False
+    from ff_pcn.sweep_coordinator import SweepQueue
+    return SweepQueue(long_job_queue).submit('search', (checker.p, checker.e, checker.n, start))
+
+
+def check_triple(pen, budget=SEARCH_BUDGET, report_folder=None, database=None,
+                 search_time=SEARCH_TIME, long_job_queue=LONG_JOB_QUEUE):
+    """
+    Checks (p, e, n) and adds the result to database (default the global one).
+    The explicit search is only tried if it is estimated to finish within budget seconds.
+    A search running longer than search_time seconds is stopped. Deferred and stopped
+    searches are submitted to long_job_queue to be run by dedicated workers.
+    Measurements are saved to report_folder every SAVE_INTERVAL triples, see ff_pcn.instrumentation.
+    """
+    p, e, n = pen
+    with get_instrumentation().triple(p, e, n):
+        checker = PCNExistenceChecker(p, e, p**e, n, budget=budget, search_time=search_time)
         res = checker.check_existance()
-        logging.getLogger(__name__).info('check_until_n of (%d, %d, %d) => %s', p, e, n, res)
-        database.add(p, e, n, res[1])
-        del res
-        del checker
+    logging.getLogger(__name__).info('check_until_n of (%d, %d, %d) => %s', p, e, n, res)
+    (database or get_database()).add(p, e, n, res[1])
+    if long_job_queue:
+        submit_long_job(checker, res[1], long_job_queue)
+    if report_folder:
+        get_instrumentation().checkpoint(report_folder)
+    return res[0]
+
+
+def check_p_n(pn, budget=SEARCH_BUDGET, report_folder=None, database=None, long_job_queue=LONG_JOB_QUEUE):
+    p, n = pn
+    for pen in triples_to_check(p, n):
+        check_triple(pen, budget=budget, report_folder=report_folder, database=database, long_job_queue=long_job_queue)
+
+
+def build_shared_tables_for_n(n, path, triples=None):
+    """
+    Builds the shared tables for checking triples (default all non regular triples of n),
+    including the factorizations of Phi_d(p) with d | e*n already known to the power
+    factorization store or the factor corpus. Nothing is factored or looked up online here.
+    """
+    if triples is None:
+        triples = [pen for p in primes(n) for pen in triples_to_check(p, n)]
+    store = get_power_factorization_store()
+    cyclotomic = dict()
+    for p, e, _ in triples:
+        for d in divisors(e*n):
+            fac = store.known_cyclotomic_factorization(d, p)
+            if fac is not None:
+                cyclotomic[(d, p)] = fac
+    build_shared_tables(path, order_bound=n, cyclotomic=cyclotomic.items())
 
 
-def check_n_multiprocessing(n):
-    pool = multiprocessing.Pool(multiprocessing.cpu_count())
-    pool.map(check_p_n, ((p,n) for p in primes(n)))
+def _init_worker(path, report_folder):
+    attach_shared_tables(path)
+    save_at_exit(report_folder)
+
+
+def check_n_multiprocessing(n, budget=SEARCH_BUDGET):
+    """
+    Checks all triples of n on a pool of workers, longest estimated first.
+    The tables are built once before forking, workers attach to them zero-copy.
+    """
+    fd, path = tempfile.mkstemp(suffix='.tables')
+    os.close(fd)
+    report_folder = instrumentation_folder('n_%d' % n)
+    try:
+        triples = get_cost_model().schedule([pen for p in primes(n) for pen in triples_to_check(p, n)])
+        build_shared_tables_for_n(n, path, triples)
+        attach_shared_tables(path)
+        pool = multiprocessing.Pool(multiprocessing.cpu_count(), initializer=_init_worker, initargs=(path, report_folder))
+        worker = functools.partial(check_triple, budget=budget, report_folder=report_folder)
+        for _ in pool.imap_unordered(worker, triples, chunksize=1):
+            pass
+        pool.close()
+        pool.join()
+    finally:
+        detach_shared_tables()
+        os.remove(path)
+    merge_reports(report_folder)
 
 
 def check_n(n):
@@ -57,7 +166,7 @@ def qs_to_check(n):
     """
     qs = []
     for p in primes(n):
-        for e in xrange(1,n):
+        for e in range(1,n):
             q = p**e
             if q > n:
                 break
@@ -65,6 +174,102 @@ def qs_to_check(n):
     return qs
 
 
+class PCNExistenceChecker(object):
+
+    def __init__(self, p, e, q, n, budget=SEARCH_BUDGET, search_time=None, search_candidates=None, resume=0):
+        """
+        :param budget: Seconds the explicit search may be estimated to take. None for no limit.
+        :param search_time: Seconds after which the explicit search stops with a partial result. None for no limit.
+        :param search_candidates: Number of candidates after which the explicit search stops. None for no limit.
+        :param resume: Number of candidates tested by a previous partial search.
+        """
+        assert q == p**e
+        self.p = p
+        self.e = e
+        self.q = q
+        self.n = n
+        self.budget = budget
+        self.search_time = search_time
+        self.search_candidates = search_candidates
+        self.resume = resume
+        self.missing_factors = []
+        self.search = None
+        """SearchResult of the explicit search if run."""
+
+    def check_existance(self, no_explicit_search=None):
+        """
+        Returns (exists, reason) by applying the criteria in order of their cost.
+        exists is None if the existence is not decided.
+
+        :param no_explicit_search: True to never, False to always search explicitly.
+            None searches if the cost model estimates the search to finish within budget.
+        """
+        return (
+            self.check_cheap() or
+            self.check_with_factorization() or
+            self.check_explicit_search(no_explicit_search)
+        )
+
+    def _decide(self, criteria):
+        for i, criterion, reason in criteria:
+            if criterion():
+                get_instrumentation().annotate('decided_by', i)
+                return True, reason(self)
+        return None
+
+    def check_cheap(self):
+        """
+        Returns (True, reason) if (p, e, n) is regular or one of the criteria 1-3 applies, else None.
+        """
+        ff = FiniteFieldExtension(self.p, self.e, self.n)
+        return self._decide([
+            (0, ff.regular, ExistanceReasonRegular),
+            (1, ff.pcn_criterion_1, ExistanceReasonPrimitivesMoreEqualNotNormalsApprox),
+            (2, ff.pcn_criterion_2, ExistanceReasonPrimitivesMoreEqualNotNormals),
+            (3, ff.pcn_criterion_3, ExistanceReasonPrimitivesMoreEqualNotNormals),
+        ])
+
+    def check_with_factorization(self):
+        """
+        Returns (True, reason) if one of the criteria 4-5 applies,
+        (None, reason) if the factorization of q^n - 1 is missing, else None.
+        """
+        ff = FiniteFieldExtension(self.p, self.e, self.n)
+        try:
+            return self._decide([
+                (4, ff.pcn_criterion_4, ExistanceReasonPrimitivesMoreEqualNotNormals),
+                (5, ff.pcn_criterion_5, ExistanceReasonPrimitivesMoreEqualNotNormals),
+            ])
+        except MissingFactorsException as e:
+            self.missing_factors = e.missing_factors
+            get_instrumentation().annotate('decided_by', None)
+            return None, ExistanceReasonNeedFactorization(self)
+
+    def check_explicit_search(self, no_explicit_search=None):
+        """
+        Returns (exists, reason) by an explicit search, see check_existance.
+        """
+        instrumentation = get_instrumentation()
+        p, e, n = self.p, self.e, self.n
+        if no_explicit_search is None:
+            no_explicit_search = not get_cost_model().worth_trying('criterion_6', p, e, n, self.budget)
+        if no_explicit_search:
+            instrumentation.annotate('decided_by', None)
+            instrumentation.count('explicit_search.deferred')
+            return None, ExistanceReasonSearchDeferred(self)
+        with instrumentation.timer('criterion_6'):
+            self.search = FiniteFieldExtension(p, e, n).search_pcn_polynom(
+                time_limit=self.search_time, max_candidates=self.search_candidates, start=self.resume)
+        if not self.search.complete:
+            instrumentation.annotate('decided_by', None)
+            instrumentation.count('explicit_search.partial')
+            return None, ExistanceReasonSearchPartial(self)
+        instrumentation.annotate('decided_by', 6)
+        if self.search.polynom is None:
+            return False, ExistanceReasonNotExisting(self)
+        return True, ExistanceReasonFoundOne(self, self.search.polynom)
+
+
 class CriterionChecker(object):
 
     def __init__(self, pens):
@@ -72,6 +277,16 @@ class CriterionChecker(object):
             self.check_criterions(p, e, n)
 
     def check_criterions(self, p, e, n):
+        with get_instrumentation().triple(p, e, n):
+            crits = self._check_criterions(p, e, n)
+            decided_by = [i for i, crit in enumerate(crits, 1) if crit]
+            get_instrumentation().annotate('decided_by', decided_by[0] if decided_by else None)
+        logging.info('check_criterions %s: %s', (p, e, n), crits)
+        if not any(crits):
+            logging.critical('check_criterions %s: None True', (p, e, n))
+        return crits
+
+    def _check_criterions(self, p, e, n):
         ff = FiniteFieldExtension(p, e, n)
         crits = [
             ff.pcn_criterion_1(),
@@ -93,20 +308,22 @@ class CriterionChecker(object):
             crits += [
                 ff.pcn_criterion_6(),
             ]
-        logging.info('check_criterions %s: %s', (p, e, n), crits)
-        if not any(crits):
-            logging.critical('check_criterions %s: None True', (p, e, n))
+        return crits
 
 if __name__ == '__main__':
     import sys
-    # from ff_pcn.datastore import datastore
+    # from ff_pcn.datastore import get_datastore
     logging.basicConfig(level=logging.INFO)
     # PCNExistenceChecker.check_range(int(sys.argv[1]), int(sys.argv[2]))
     # PCNExistenceChecker.check_to(int(sys.argv[1]))
-    for n in xrange(int(sys.argv[1]), int(sys.argv[2])):
+    for n in range(int(sys.argv[1]), int(sys.argv[2])):
         pens = pens_to_check(n)
         CriterionChecker(pens)
+    report_folder = instrumentation_folder('criterions_%s_%s' % (sys.argv[1], sys.argv[2]))
+    get_instrumentation().save(report_folder)
+    merge_reports(report_folder)
+    logging.info('instrumentation:\n%s', get_instrumentation().report())
 
-    queue = ['%d %d %d %d' % (euler_phi(d), d, p, phi) for d, p, phi in sorted(uniq(factorer.queue), key=lambda (d, p, phi): euler_phi(d))]
+    queue = ['%d %d %d %d' % (euler_phi(d), d, p, phi) for d, p, phi in sorted(uniq(get_factorer().queue), key=lambda dpphi: euler_phi(dpphi[0]))]
     if len(queue):
         logging.critical('factorizations needed: \n%s', '\n'.join(queue))
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+"""
+Module checking triples (p, e, n) in a streaming pipeline of stages:
+  planning   - triples of the range, see triples_to_check,
+  cheap      - regularity and criteria 1-3 on many workers,
+  factoring  - criteria 4-5, cofactors left by the Factorer are appended to a yafu batch,
+  search     - explicit search on dedicated workers, searches deferred or stopped after
+               search_time are submitted to the long-job queue like in check_triple.
+Stages are connected by bounded queues, so a slow stage throttles the stages
+before it instead of piling up work. Results are written to the database as
+soon as they arrive. A triple raising in a stage is logged and skipped, the
+worker goes on with the next triple.
+
+Usage:
+    python ff_pcn/pipeline.py START STOP [--cheap N] [--factoring N] [--search N]
+"""
+
+__author__ = "Stefan Hackenberg"
+
+try:
+    import ff_pcn
+except ImportError:
+    import sys
+    import os
+    sys.path.append(os.path.abspath(os.path.join(__file__, '../../')))
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+from ff_pcn.backend import primes
+from ff_pcn.database import get_database
+from ff_pcn.instrumentation import get_instrumentation
+from ff_pcn.pcn_existence_checker import LONG_JOB_QUEUE, SEARCH_BUDGET, SEARCH_TIME, PCNExistenceChecker, \
+    submit_long_job, triples_to_check
+
+
+MAXSIZE = 64
+"""Maximal number of triples waiting in front of a stage."""
+
+YAFU_BATCH = os.path.abspath(os.path.join(__file__, '../../result/yafu_batch.txt'))
+"""Missing factorizations in the format of yafu.factor_batch_with_yafu."""
+
+
+def take_factorer_queue():
+    """
+    Returns and clears the cofactors (m, b, cofactor) queued for yafu by the Factorer of this process.
+    """
+    from ff_pcn import factorer
+    if factorer._factorer is None:
+        return []
+    queue, factorer._factorer.queue = factorer._factorer.queue, []
+    return queue
+
+
+def cheap_stage(checker):
+    return checker.check_cheap()
+
+
+def factoring_stage(checker):
+    return checker.check_with_factorization()
+
+
+def search_stage(checker):
+    return checker.check_explicit_search()
+
+
+STAGES = [('cheap', cheap_stage), ('factoring', factoring_stage), ('search', search_stage)]
+
+
+def _stage_worker(stage, inqueue, outqueue, results, budget, search_time, long_job_queue):
+    """
+    Runs stage on the triples of inqueue until None is received.
+    Results are put to results as (pen, result, cofactors, error), an exception
+    of a single triple is reported with result None instead of ending the worker.
+    """
+    while True:
+        pen = inqueue.get()
+        if pen is None:
+            return
+        p, e, n = pen
+        try:
+            checker = PCNExistenceChecker(p, e, p**e, n, budget=budget, search_time=search_time)
+            with get_instrumentation().triple(p, e, n):
+                res = stage(checker)
+            if res is not None and long_job_queue:
+                submit_long_job(checker, res[1], long_job_queue)
+        except Exception as ex:
+            logging.getLogger(__name__).exception('Pipeline: %s failed', pen)
+            results.put((pen, None, take_factorer_queue(), '%s: %s' % (type(ex).__name__, ex)))
+            continue
+        if res is None and outqueue is not None:
+            outqueue.put(pen)
+        else:
+            results.put((pen, '%s' % res[1], take_factorer_queue(), None))
+
+
+class Pipeline(object):
+
+    def __init__(self, cheap=None, factoring=1, search=1, maxsize=MAXSIZE, budget=SEARCH_BUDGET,
+                 database=None, yafu_batch=YAFU_BATCH, search_time=SEARCH_TIME, long_job_queue=LONG_JOB_QUEUE):
+        """
+        :param cheap: Number of workers for criteria 1-3, default number of cpus.
+        :param factoring: Number of workers for criteria 4-5.
+        :param search: Number of workers for the explicit search.
+        :param budget: Budget of the explicit search, see PCNExistenceChecker.
+        :param yafu_batch: File the cofactors left by the Factorer are appended to.
+        :param search_time: Seconds after which the explicit search stops, see check_triple.
+        :param long_job_queue: Queue folder deferred and stopped searches are submitted to, None to drop them.
+        """
+        self.workers = [cheap or multiprocessing.cpu_count(), factoring, search]
+        self.maxsize = maxsize
+        self.budget = budget
+        self.database = database
+        self.yafu_batch = yafu_batch
+        self.search_time = search_time
+        self.long_job_queue = long_job_queue
+        self.queued_cofactors = set()
+        self.failed = dict()
+        """Triples raising in a stage with their error, filled by run."""
+
+    def _feed(self, triples, queues, procs):
+        """
+        Puts triples into the first queue and shuts the stages down one after another.
+        """
+        for pen in triples:
+            queues[0].put(pen)
+        for queue, stage_procs in zip(queues, procs):
+            for _ in stage_procs:
+                queue.put(None)
+            for proc in stage_procs:
+                proc.join()
+        self._results.put(None)
+
+    def _queue_for_yafu(self, cofactors):
+        new = [mbc for mbc in cofactors if tuple(mbc) not in self.queued_cofactors]
+        if not new:
+            return
+        self.queued_cofactors.update(tuple(mbc) for mbc in new)
+        with open(self.yafu_batch, 'a') as fp:
+            for m, b, cofactor in new:
+                fp.write('%d %d %d\n' % (m, b, cofactor))
+
+    def run(self, triples):
+        """
+        Checks all triples and writes the results to the database as they complete.
+        Triples raising an exception are collected in failed.
+        Returns number of written results.
+        """
+        database = self.database or get_database()
+        queues = [multiprocessing.Queue(self.maxsize) for _ in STAGES]
+        self._results = multiprocessing.Queue()
+        procs = []
+        for i, ((name, stage), workers) in enumerate(zip(STAGES, self.workers)):
+            outqueue = queues[i + 1] if i + 1 < len(queues) else None
+            args = (stage, queues[i], outqueue, self._results, self.budget, self.search_time, self.long_job_queue)
+            procs += [[multiprocessing.Process(target=_stage_worker, args=args) for _ in range(workers)]]
+        for stage_procs in procs:
+            for proc in stage_procs:
+                proc.start()
+        feeder = threading.Thread(target=self._feed, args=(triples, queues, procs))
+        feeder.daemon = True
+        feeder.start()
+
+        ret = 0
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            (p, e, n), result, cofactors, error = item
+            self._queue_for_yafu(cofactors)
+            if result is None:
+                self.failed[(p, e, n)] = error
+                continue
+            database.add(p, e, n, result)
+            logging.getLogger(__name__).info('Pipeline: %s', result)
+            ret += 1
+        feeder.join()
+        return ret
+
+
+def plan(start, stop):
+    """
+    Yields all triples checked for n in [start, stop).
+    """
+    for n in range(start, stop):
+        for p in primes(n):
+            for pen in triples_to_check(p, n):
+                yield pen
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('start', type=int)
+    parser.add_argument('stop', type=int)
+    parser.add_argument('--cheap', type=int, default=None)
+    parser.add_argument('--factoring', type=int, default=1)
+    parser.add_argument('--search', type=int, default=1)
+    parser.add_argument('--maxsize', type=int, default=MAXSIZE)
+    args = parser.parse_args()
+    pipeline = Pipeline(cheap=args.cheap, factoring=args.factoring, search=args.search, maxsize=args.maxsize)
+    print('checked %d triples' % pipeline.run(plan(args.start, args.stop)))
+    for pen, error in sorted(pipeline.failed.items()):
+        print('failed %s: %s' % (pen, error))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
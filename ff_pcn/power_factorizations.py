@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+"""
+Module caching factorizations of p^m - 1.
+
+The factorization of p^m - 1 = prod_(d|m) Phi_d(p) is assembled from cached
+factorizations of Phi_d(p), so the same p^m - 1 is never refactored for another
+split m = e*n or in another run. Both levels are kept in memory and in an
+SQLite file, which is shared by all worker processes.
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import logging
+import os
+import sqlite3
+from ff_pcn import MissingFactorsException
+from ff_pcn.backend import cyclotomic_value, divisors, prod
+from ff_pcn.shared_tables import get_shared_tables
+
+
+POWER_FACTORIZATION_DATABASE = os.path.abspath(os.path.join(__file__, '../../result/power_factorizations.sqlite'))
+
+
+def _dumps(factorization):
+    return ' '.join('%d^%d' % (p, m) for p, m in factorization)
+
+
+def _loads(s):
+    return [tuple(int(x) for x in pm.split('^')) for pm in s.split()]
+
+
+class PowerFactorizationStore(object):
+
+    def __init__(self, path=POWER_FACTORIZATION_DATABASE):
+        """
+        :param path: SQLite file shared by workers. None keeps the store in memory only.
+        """
+        self.path = path
+        self.cyclotomic = dict()
+        """Maps (d, p) to factorization of Phi_d(p)."""
+        self.power = dict()
+        """Maps (p, m) to factorization of p^m - 1."""
+        self._connection = None
+        self._pid = None
+
+    def connection(self):
+        """
+        Returns SQLite connection of the current process or None.
+        """
+        if self.path is None:
+            return None
+        if self._pid != os.getpid():
+            if not os.path.exists(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS cyclotomic (d INTEGER, p INTEGER, factorization TEXT, PRIMARY KEY (d, p))')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS power (p INTEGER, m INTEGER, factorization TEXT, PRIMARY KEY (p, m))')
+            self._connection.commit()
+            self._pid = os.getpid()
+        return self._connection
+
+    def _lookup(self, table, cache, key):
+        if key in cache:
+            return cache[key]
+        con = self.connection()
+        if con is None:
+            return None
+        cols = ('d', 'p') if table == 'cyclotomic' else ('p', 'm')
+        row = con.execute(
+            'SELECT factorization FROM %s WHERE %s = ? AND %s = ?' % (table, cols[0], cols[1]),
+            tuple(int(k) for k in key)
+        ).fetchone()
+        if row is None:
+            return None
+        cache[key] = _loads(row[0])
+        return cache[key]
+
+    def _store(self, table, cache, key, factorization):
+        cache[key] = factorization
+        con = self.connection()
+        if con is not None:
+            con.execute(
+                'INSERT OR REPLACE INTO %s VALUES (?, ?, ?)' % table,
+                tuple(int(k) for k in key) + (_dumps(factorization),)
+            )
+            con.commit()
+
+    def cyclotomic_factorization(self, d, p, use_factorer=True):
+        """
+        Returns factorization of Phi_d(p) or None if unknown.
+        New factorizations are verified once before they are cached.
+        """
+        key = (int(d), int(p))
+        tables = get_shared_tables()
+        if tables is not None:
+            fac = tables.cyclotomic_factorization(*key)
+            if fac is not None:
+                return fac
+        fac = self._lookup('cyclotomic', self.cyclotomic, key)
+        if fac is not None:
+            return fac
+        phi = cyclotomic_value(d, p)
+        if phi == 1:
+            fac = []
+        elif use_factorer:
+            from ff_pcn.factorer import get_factorer
+            fac = get_factorer().get(key)
+        else:
+            from ff_pcn.backend import factor
+            fac = list(factor(phi))
+        if fac is None:
+            return None
+        fac = sorted((int(q), int(k)) for q, k in fac)
+        assert prod(q**k for q, k in fac) == phi
+        self._store('cyclotomic', self.cyclotomic, key, fac)
+        return fac
+
+    def known_cyclotomic_factorization(self, d, p):
+        """
+        Returns factorization of Phi_d(p) if it is in the store, small or in the factor corpus, else None.
+        Unlike cyclotomic_factorization nothing is split, looked up online or queued for yafu.
+        """
+        key = (int(d), int(p))
+        fac = self._lookup('cyclotomic', self.cyclotomic, key)
+        if fac is not None:
+            return fac
+        phi = cyclotomic_value(d, p)
+        if phi < 1e10:
+            from ff_pcn.backend import factor
+            fac = list(factor(phi)) if phi > 1 else []
+        else:
+            from ff_pcn.factorer import get_factorer
+            fac = get_factorer().verified(phi)
+        if fac is None:
+            return None
+        fac = sorted((int(q), int(k)) for q, k in fac)
+        self._store('cyclotomic', self.cyclotomic, key, fac)
+        return fac
+
+    def factor(self, p, m, use_factorer=True):
+        """
+        Returns factorization of p^m - 1 as sorted list of (prime, multiplicity).
+        Raises MissingFactorsException if some Phi_d(p) is not factored.
+        """
+        key = (int(p), int(m))
+        fac = self._lookup('power', self.power, key)
+        if fac is not None:
+            return fac
+        ret = dict()
+        missing_factors = []
+        for d in divisors(m):
+            facs = self.cyclotomic_factorization(d, p, use_factorer=use_factorer)
+            if facs is None:
+                missing_factors += [(d, p, cyclotomic_value(d, p))]
+                continue
+            for q, k in facs:
+                ret[q] = ret.get(q, 0) + k
+        if missing_factors:
+            raise MissingFactorsException(missing_factors)
+        fac = sorted(ret.items())
+        self._store('power', self.power, key, fac)
+        logging.getLogger(__name__).debug('PowerFactorizationStore.factor: %d^%d-1 = %s', p, m, fac)
+        return fac
+
+
+_store = None
+
+
+def get_power_factorization_store():
+    """
+    Returns the global store of factorizations of p^m - 1, which is constructed on first call.
+    """
+    global _store
+    if _store is None:
+        _store = PowerFactorizationStore()
+    return _store
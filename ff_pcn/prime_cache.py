@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+"""
+Module caching primes which have been proven once.
+
+Every prime is stored with the kind of its proof:
+  deterministic - deterministic Miller-Rabin test (n < 3.3 * 10^24),
+  bpsw          - Baillie-PSW probable prime test of the pure backend,
+  sage          - primality proof of Sage.
+The cache is kept in memory and in an SQLite file, which is shared by all
+worker processes. Numbers not yet in the cache are proven in parallel and
+afterwards trusted from the cache.
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import logging
+import multiprocessing
+import os
+import sqlite3
+
+
+PRIME_CACHE = os.path.abspath(os.path.join(__file__, '../../result/prime_cache.sqlite'))
+
+DETERMINISTIC_BOUND = 3317044064679887385961981
+"""Bound of the deterministic Miller-Rabin test of ff_pcn.pure_number_theory."""
+
+PARALLEL_THRESHOLD = 64
+"""Minimal number of unknown numbers proven on a pool."""
+
+
+def prove(n):
+    """
+    Returns (n, kind of proof) if n is prime, else (n, None).
+    """
+    from ff_pcn.backend import BACKEND, is_prime
+    if not is_prime(n):
+        return n, None
+    if BACKEND == 'sage':
+        return n, 'sage'
+    return n, 'deterministic' if n < DETERMINISTIC_BOUND else 'bpsw'
+
+
+class PrimeCache(object):
+
+    def __init__(self, path=PRIME_CACHE):
+        """
+        :param path: SQLite file shared by workers. None keeps the cache in memory only.
+        """
+        self.path = path
+        self._proofs = None
+        self._connection = None
+        self._pid = None
+
+    def connection(self):
+        """
+        Returns SQLite connection of the current process or None.
+        """
+        if self.path is None:
+            return None
+        if self._pid != os.getpid():
+            if not os.path.exists(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS primes (prime TEXT PRIMARY KEY, proof TEXT)')
+            self._connection.commit()
+            self._pid = os.getpid()
+        return self._connection
+
+    @property
+    def proofs(self):
+        """
+        Dict mapping proven primes to the kind of proof, loaded on first use.
+        """
+        if self._proofs is None:
+            self._proofs = dict()
+            con = self.connection()
+            if con is not None:
+                self._proofs.update((int(p), proof) for p, proof in con.execute('SELECT prime, proof FROM primes'))
+        return self._proofs
+
+    def __len__(self):
+        return len(self.proofs)
+
+    def __contains__(self, p):
+        return int(p) in self.proofs
+
+    def proof(self, p):
+        """
+        Returns the kind of proof of p or None if p is not known to be prime.
+        """
+        return self.proofs.get(int(p))
+
+    def add(self, proven, persistent=True):
+        """
+        Adds list of (prime, kind of proof) in one transaction.
+        Workers use persistent=False and report their primes to the parent process.
+        """
+        proven = [(int(p), proof) for p, proof in proven if int(p) not in self.proofs]
+        if not proven:
+            return
+        self.proofs.update(proven)
+        con = self.connection() if persistent else None
+        if con is not None:
+            con.executemany('INSERT OR REPLACE INTO primes VALUES (?, ?)', [('%d' % p, proof) for p, proof in proven])
+            con.commit()
+
+    def prove_all(self, numbers, processes=None):
+        """
+        Returns dict mapping numbers to True if prime. Numbers not in the cache
+        are proven, on a pool if there are many, and new primes are added to the cache.
+        """
+        numbers = set(int(n) for n in numbers)
+        ret = dict((n, True) for n in numbers if n in self.proofs)
+        unknown = sorted(numbers - set(ret))
+        if len(unknown) >= PARALLEL_THRESHOLD and processes != 1:
+            pool = multiprocessing.Pool(processes or multiprocessing.cpu_count())
+            try:
+                results = pool.map(prove, unknown, chunksize=16)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            results = [prove(n) for n in unknown]
+        self.add((n, proof) for n, proof in results if proof is not None)
+        for n, proof in results:
+            ret[n] = proof is not None
+            if proof is None:
+                logging.getLogger(__name__).warning('PrimeCache: %d is not prime', n)
+        return ret
+
+    def is_prime(self, n):
+        return self.prove_all([n])[int(n)]
+
+    def verify(self, factorization, processes=None):
+        """
+        Returns True if all factors of factorization (list of primes or of (prime, multiplicity)) are prime.
+        """
+        primes = [f[0] if isinstance(f, tuple) else f for f in factorization]
+        return all(self.prove_all(primes, processes=processes).values())
+
+
+_prime_cache = None
+
+
+def get_prime_cache():
+    """
+    Returns the global prime cache, which is constructed on first call.
+    """
+    global _prime_cache
+    if _prime_cache is None:
+        _prime_cache = PrimeCache()
+    return _prime_cache
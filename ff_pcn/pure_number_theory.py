@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+
+"""
+Module coding the integer primitives needed by criteria 1-5 in pure python.
+
+gmpy2 is used for primality testing and modular arithmetic if available.
+Nothing in here imports Sage.
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import itertools
+import math
+import random
+from fractions import Fraction
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+
+Integer = int
+"""Integer type of the pure backend."""
+
+_SMALL_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+
+_TRIAL_DIVISION_BOUND = 1000
+
+
+def gcd(a, b):
+    """
+    Returns the non-negative greatest common divisor of a and b.
+    """
+    a, b = abs(a), abs(b)
+    while b:
+        a, b = b, a % b
+    return a
+
+
+def lcm(a, b):
+    """
+    Returns the least common multiple of a and b.
+    """
+    if a == 0 or b == 0:
+        return 0
+    return abs(a * b) // gcd(a, b)
+
+
+def prod(iterable, start=1):
+    """
+    Returns the product of all elements of iterable.
+    """
+    ret = start
+    for x in iterable:
+        ret *= x
+    return ret
+
+
+def uniq(iterable):
+    """
+    Returns the sorted list of distinct elements of iterable.
+    """
+    return sorted(set(iterable))
+
+
+def isqrt(n):
+    """
+    Returns floor(sqrt(n)) for n >= 0.
+    """
+    if n < 0:
+        raise ValueError('isqrt of negative number')
+    if n == 0:
+        return 0
+    x = 1 << ((n.bit_length() + 1) // 2)
+    while True:
+        y = (x + n // x) // 2
+        if y >= x:
+            return x
+        x = y
+
+
+def iroot(n, k):
+    """
+    Returns floor(n^(1/k)) for n >= 0 and k >= 1.
+    """
+    if n < 2 or k == 1:
+        return n
+    x = 1 << ((n.bit_length() + k - 1) // k)
+    while True:
+        y = ((k - 1) * x + n // x**(k - 1)) // k
+        if y >= x:
+            return x
+        x = y
+
+
+def _miller_rabin(n, a):
+    """
+    Strong probable prime test of odd n > 2 to base a.
+    """
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    x = pow(a, d, n)
+    if x == 1 or x == n - 1:
+        return True
+    for _ in range(s - 1):
+        x = x * x % n
+        if x == n - 1:
+            return True
+    return False
+
+
+def _jacobi(a, n):
+    """
+    Returns the Jacobi symbol (a/n) for odd n > 0.
+    """
+    a %= n
+    ret = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                ret = -ret
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            ret = -ret
+        a %= n
+    return ret if n == 1 else 0
+
+
+def _strong_lucas(n):
+    """
+    Strong Lucas probable prime test of odd n with Selfridge parameters.
+    """
+    r = isqrt(n)
+    if r * r == n:
+        return False
+    D = 5
+    while _jacobi(D, n) != -1:
+        D = -D - 2 if D > 0 else -D + 2
+    P, Q = 1, (1 - D) // 4
+    d = n + 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    def half(x):
+        return (x + n) // 2 if x % 2 else x // 2
+
+    U, V, Qk = 1, P, Q % n
+    for bit in bin(d)[3:]:
+        U, V = U * V % n, (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if bit == '1':
+            U, V = half(P * U + V) % n, half(D * U + P * V) % n
+            Qk = Qk * Q % n
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if V == 0:
+            return True
+    return False
+
+
+def is_prime(n):
+    """
+    Returns True if n is prime.
+
+    Deterministic for n < 3.3 * 10^24, above a Baillie-PSW test is used
+    (no counterexample is known).
+    """
+    n = int(n)
+    if n < 2:
+        return False
+    for p in _SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    if gmpy2 is not None:
+        return bool(gmpy2.is_bpsw_prp(n))
+    if n < 3317044064679887385961981:
+        return all(_miller_rabin(n, a) for a in _SMALL_PRIMES)
+    return _miller_rabin(n, 2) and _strong_lucas(n)
+
+
+def pollard_rho(n, max_iterations=None, seed=None):
+    """
+    Returns a non-trivial factor of the composite n by Brent's variant of
+    Pollard's rho method or None if max_iterations are exceeded.
+    """
+    if n % 2 == 0:
+        return 2
+    rnd = random.Random(seed)
+    iterations = 0
+    while True:
+        y, c, m = rnd.randrange(1, n), rnd.randrange(1, n), 128
+        g, r, q = 1, 1, 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = gcd(q, n)
+                k += m
+            r *= 2
+            iterations += r
+            if max_iterations is not None and iterations > max_iterations:
+                return None
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+
+def _factor_into(n, ret):
+    """
+    Adds the prime factors of n > 1 without small factors to ret.
+    """
+    if is_prime(n):
+        ret[n] = ret.get(n, 0) + 1
+        return
+    r = isqrt(n)
+    if r * r == n:
+        _factor_into(r, ret)
+        _factor_into(r, ret)
+        return
+    d = pollard_rho(n)
+    _factor_into(d, ret)
+    _factor_into(n // d, ret)
+
+
+def factor(n):
+    """
+    Returns the factorization of |n| > 0 as sorted list of (prime, multiplicity).
+    """
+    n = abs(int(n))
+    if n == 0:
+        raise ValueError('factorization of 0 not defined')
+    ret = {}
+    for p in itertools.chain([2, 3], range(5, _TRIAL_DIVISION_BOUND, 2)):
+        if p * p > n:
+            break
+        while n % p == 0:
+            ret[p] = ret.get(p, 0) + 1
+            n //= p
+    if n > 1:
+        _factor_into(n, ret)
+    return sorted(ret.items())
+
+
+def prime_divisors(n):
+    """
+    Returns the sorted list of primes dividing n.
+    """
+    return [p for p, _ in factor(n)]
+
+
+def divisors(n):
+    """
+    Returns the sorted list of positive divisors of n.
+    """
+    divs = [1]
+    for p, m in factor(n):
+        divs = [d * p**k for d in divs for k in range(m + 1)]
+    return sorted(divs)
+
+
+def moebius(n):
+    """
+    Returns the Moebius function mu(n).
+    """
+    facs = factor(n)
+    if any(m > 1 for _, m in facs):
+        return 0
+    return -1 if len(facs) % 2 else 1
+
+
+def euler_phi(n):
+    """
+    Returns Euler's totient function of n, 0 for n < 1 as Sage.
+    """
+    if n < 1:
+        return 0
+    if n == 1:
+        return 1
+    return prod(p**(m-1) * (p-1) for p, m in factor(n))
+
+
+def primes(start, stop=None):
+    """
+    Iterates over all primes in [start, stop) or [2, start) if stop is omitted.
+    """
+    if stop is None:
+        start, stop = 2, start
+    start = max(int(start), 2)
+    stop = int(stop)
+    if stop <= start:
+        return iter([])
+    sieve = bytearray([1]) * stop
+    sieve[0:2] = b'\x00\x00'
+    for p in range(2, isqrt(stop - 1) + 1):
+        if sieve[p]:
+            sieve[p*p::p] = bytearray(len(range(p*p, stop, p)))
+    return (p for p in range(start, stop) if sieve[p])
+
+
+def cyclotomic_value(n, b):
+    """
+    Returns Phi_n(b) for integers n > 0 and b >= 0 by using
+    Phi_n(b) = prod_(d|n) (b^(n/d) - 1)^mu(d).
+    """
+    n = int(n)
+    b = int(b)
+    if b == 0:
+        return -1 if n == 1 else 1
+    if b == 1:
+        if n == 1:
+            return 0
+        facs = factor(n)
+        return facs[0][0] if len(facs) == 1 else 1
+    if b < 0:
+        raise ValueError('negative base not supported')
+    num = 1
+    den = 1
+    for d in divisors(n):
+        mu = moebius(d)
+        if mu == 1:
+            num *= b**(n//d) - 1
+        elif mu == -1:
+            den *= b**(n//d) - 1
+    return num // den
+
+
+def log(x):
+    """
+    Returns the natural logarithm of x also for integers and fractions
+    exceeding the range of floats. For x <= 0 -inf is returned, so that
+    comparisons of logarithms keep their meaning.
+    """
+    if isinstance(x, Fraction):
+        if x <= 0:
+            return float('-inf')
+        return log(x.numerator) - log(x.denominator)
+    if isinstance(x, float):
+        return math.log(x) if x > 0 else float('-inf')
+    x = int(x)
+    if x <= 0:
+        return float('-inf')
+    return math.log(x)
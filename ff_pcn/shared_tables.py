@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+"""
+Module holding precomputed read-only number theoretic tables in a
+memory-mapped file, which is shared zero-copy by all worker processes:
+  - smallest prime factor sieve of small integers,
+  - multiplicative orders ord_m(r) for all m up to a bound and all units r mod m,
+  - factorizations of cyclotomic numbers Phi_d(p).
+
+The tables are built once by the parent process with build_shared_tables,
+afterwards every process attaches to the file with attach_shared_tables.
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import mmap
+import struct
+from ff_pcn.pure_number_theory import gcd, lcm
+
+
+MAGIC = b'FFPCNTB1'
+
+_HEADER = struct.Struct('<8sQQQQQQ')
+"""magic, sieve bound, order bound, number of cyclotomic entries and offsets of order table, cyclotomic index and blob."""
+
+_INDEX_ENTRY = struct.Struct('<QQQQ')
+"""d, p, offset and length of factorization of Phi_d(p) in blob."""
+
+_UINT = struct.Struct('<I')
+
+
+def _pack_uints(values):
+    return struct.pack('<%dI' % len(values), *values)
+
+
+def _sieve(bound):
+    """
+    Returns list of smallest prime factors of 0, ..., bound.
+    """
+    spf = list(range(bound + 1))
+    i = 2
+    while i * i <= bound:
+        if spf[i] == i:
+            for j in range(i * i, bound + 1, i):
+                if spf[j] == j:
+                    spf[j] = i
+        i += 1
+    return spf
+
+
+def _factor_with_sieve(spf, n):
+    ret = []
+    while n > 1:
+        p = spf[n]
+        m = 0
+        while n % p == 0:
+            n //= p
+            m += 1
+        ret += [(p, m)]
+    return ret
+
+
+def _carmichael_lambda(facs):
+    ret = 1
+    for p, m in facs:
+        if p == 2 and m >= 3:
+            ret = lcm(ret, 2**(m - 2))
+        else:
+            ret = lcm(ret, p**(m - 1) * (p - 1))
+    return ret
+
+
+def _order_row(spf, m):
+    """
+    Returns list of ord_m(r) for r = 0, ..., m-1 and 0 for non-units.
+    """
+    if m == 1:
+        return [1]
+    lam = _carmichael_lambda(_factor_with_sieve(spf, m))
+    lam_primes = [p for p, _ in _factor_with_sieve(spf, lam)]
+    row = [0] * m
+    for r in range(1, m):
+        if gcd(r, m) != 1:
+            continue
+        order = lam
+        for f in lam_primes:
+            while order % f == 0 and pow(r, order // f, m) == 1:
+                order //= f
+        row[r] = order
+    return row
+
+
+def build_shared_tables(path, sieve_bound=10**6, order_bound=200, cyclotomic=()):
+    """
+    Writes the tables to path.
+
+    :param cyclotomic: Iterable of ((d, p), factorization of Phi_d(p)).
+    """
+    spf = _sieve(max(sieve_bound, order_bound, 2))
+    cyclotomic = sorted((int(d), int(p), ' '.join('%d^%d' % (q, k) for q, k in fac).encode('ascii'))
+                        for (d, p), fac in cyclotomic)
+    order_offset = _HEADER.size + 4 * (len(spf))
+    index_offset = order_offset + 4 * (order_bound * (order_bound + 1) // 2)
+    blob_offset = index_offset + _INDEX_ENTRY.size * len(cyclotomic)
+    with open(path, 'wb') as fil:
+        fil.write(_HEADER.pack(MAGIC, len(spf) - 1, order_bound, len(cyclotomic),
+                               order_offset, index_offset, blob_offset))
+        fil.write(_pack_uints(spf))
+        for m in range(1, order_bound + 1):
+            fil.write(_pack_uints(_order_row(spf, m)))
+        offset = 0
+        for d, p, fac in cyclotomic:
+            fil.write(_INDEX_ENTRY.pack(d, p, offset, len(fac)))
+            offset += len(fac)
+        for _, _, fac in cyclotomic:
+            fil.write(fac)
+
+
+class SharedTables(object):
+
+    def __init__(self, path):
+        """
+        Maps the tables written by build_shared_tables read-only.
+        """
+        self.path = path
+        with open(path, 'rb') as fil:
+            self.mm = mmap.mmap(fil.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.sieve_bound, self.order_bound, self.cyclotomic_entries,
+         self._order_offset, self._index_offset, self._blob_offset) = _HEADER.unpack_from(self.mm, 0)
+        assert magic == MAGIC, path
+
+    def _uint(self, offset):
+        return _UINT.unpack_from(self.mm, offset)[0]
+
+    def smallest_prime_factor(self, n):
+        return self._uint(_HEADER.size + 4 * n)
+
+    def factor(self, n):
+        """
+        Returns factorization of 1 < n <= sieve_bound as sorted list of (prime, multiplicity).
+        """
+        ret = []
+        while n > 1:
+            p = self.smallest_prime_factor(n)
+            m = 0
+            while n % p == 0:
+                n //= p
+                m += 1
+            ret += [(p, m)]
+        return ret
+
+    def ordn(self, m, q):
+        """
+        Returns ord_m(q) for m <= order_bound or None if gcd(m, q) != 1.
+        """
+        order = self._uint(self._order_offset + 4 * (m * (m - 1) // 2 + q % m))
+        return order if order else None
+
+    def cyclotomic_factorization(self, d, p):
+        """
+        Returns factorization of Phi_d(p) or None if not contained.
+        """
+        key = (d, p)
+        lo, hi = 0, self.cyclotomic_entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = _INDEX_ENTRY.unpack_from(self.mm, self._index_offset + _INDEX_ENTRY.size * mid)
+            if entry[:2] < key:
+                lo = mid + 1
+            elif entry[:2] > key:
+                hi = mid
+            else:
+                start = self._blob_offset + entry[2]
+                s = self.mm[start:start + entry[3]].decode('ascii')
+                return [tuple(int(x) for x in qk.split('^')) for qk in s.split()]
+        return None
+
+    def close(self):
+        self.mm.close()
+
+
+_tables = None
+
+
+def attach_shared_tables(path):
+    """
+    Attaches the current process to the tables in path.
+    Used as initializer of worker pools.
+    """
+    global _tables
+    if _tables is not None and _tables.path == path:
+        return _tables
+    _tables = SharedTables(path)
+    return _tables
+
+
+def detach_shared_tables():
+    global _tables
+    if _tables is not None:
+        _tables.close()
+    _tables = None
+
+
+def get_shared_tables():
+    """
+    Returns the attached tables or None.
+    """
+    return _tables
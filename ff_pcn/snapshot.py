@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+
+"""
+Module exporting results and factorizations into a columnar binary snapshot,
+which is loaded by memory mapping instead of parsing csv files.
+
+Tables:
+  pcns           - final/range/pcns_<p>.csv: p, e, n, criterion, poly, factorization,
+  criterions     - final/criterions_*.csv: p, e, n, criterion, poly,
+  factorizations - factorization corpus: value, factorization.
+criterion is the deciding criterion 1-6 or 0 if unknown.
+
+Layout of the file:
+  MAGIC, length of header (uint64), JSON header, columns, blob.
+The header holds rows, offset and dtype of every column. Fixed width columns
+are little endian and 8 byte aligned, so they are NumPy views on the mapped
+file. Strings (polynomials, factorizations, values) are stored in one blob,
+a string column consists of the columns <name>_offset and <name>_length.
+
+Usage:
+    python ff_pcn/snapshot.py export [--output FILE]
+    python ff_pcn/snapshot.py info [FILE]
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import argparse
+import array
+import csv
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+
+
+SNAPSHOT = os.path.abspath(os.path.join(__file__, '../../result/snapshot.ffs'))
+
+FINAL_FOLDER = os.path.abspath(os.path.join(__file__, '../../final'))
+
+MAGIC = b'FFPCNSS1'
+
+_LENGTH = struct.Struct('<Q')
+
+DTYPES = {'u8': 'Q', 'u4': 'I', 'i1': 'b'}
+"""NumPy dtypes of columns and their array typecodes."""
+
+TABLES = [
+    ('pcns', [('p', 'u8'), ('e', 'u4'), ('n', 'u4'), ('criterion', 'i1'), ('poly', 'str'), ('factorization', 'str')]),
+    ('criterions', [('p', 'u8'), ('e', 'u4'), ('n', 'u4'), ('criterion', 'i1'), ('poly', 'str')]),
+    ('factorizations', [('value', 'str'), ('factorization', 'str')]),
+]
+
+
+def deciding_criterion(crits):
+    """
+    Returns the deciding criterion of the columns C1, ..., C6 of criterions_*.csv.
+    """
+    for i, c in enumerate(crits[:5]):
+        if c == 'True':
+            return i + 1
+    if len(crits) > 5 and crits[5] not in ('', 'None', 'False'):
+        return 6
+    return 0
+
+
+def read_pcns(folder=os.path.join(FINAL_FOLDER, 'range')):
+    files = sorted(glob.glob(os.path.join(folder, 'pcns_*.csv')), key=lambda fil: int(os.path.basename(fil)[5:-4]))
+    for fil in files:
+        with open(fil) as fp:
+            for row in csv.DictReader(fp):
+                yield int(row['p']), 1, int(row['n']), 0, row['poly'], row['factorization']
+
+
+def read_criterions(folder=FINAL_FOLDER):
+    for fil in sorted(glob.glob(os.path.join(folder, 'criterions_*.csv'))):
+        with open(fil) as fp:
+            for row in list(csv.reader(fp, skipinitialspace=True))[1:]:
+                crits = row[3:]
+                poly = crits[5] if deciding_criterion(crits) == 6 else ''
+                yield int(row[0]), int(row[1]), int(row[2]), deciding_criterion(crits), poly
+
+
+def read_factorizations(corpus=None):
+    if corpus is None:
+        from ff_pcn.factor_corpus import FactorCorpus
+        corpus = FactorCorpus()
+        corpus.import_all()
+    for value in sorted(corpus.packed):
+        yield '%d' % value, ' * '.join(
+            '%d^%d' % (r, m) if m > 1 else '%d' % r for r, m in corpus.get(value=value)
+        )
+
+
+def _pad(n):
+    return (8 - n % 8) % 8
+
+
+def write_snapshot(path, tables):
+    """
+    Writes snapshot of dict tables mapping table name of TABLES to iterable of rows.
+    Returns the header.
+    """
+    columns = []
+    blob = bytearray()
+    header = {'tables': dict()}
+    for name, spec in TABLES:
+        arrays = []
+        for column, dtype in spec:
+            if dtype == 'str':
+                arrays += [(column + '_offset', 'u8', array.array('Q')), (column + '_length', 'u4', array.array('I'))]
+            else:
+                arrays += [(column, dtype, array.array(DTYPES[dtype]))]
+        rows = 0
+        for row in tables.get(name, ()):
+            i = 0
+            for value, (column, dtype) in zip(row, spec):
+                if dtype == 'str':
+                    data = value.encode('utf-8')
+                    arrays[i][2].append(len(blob))
+                    arrays[i + 1][2].append(len(data))
+                    blob += data
+                    i += 2
+                else:
+                    arrays[i][2].append(value)
+                    i += 1
+            rows += 1
+        header['tables'][name] = {'rows': rows, 'columns': dict(), 'strings': [c for c, d in spec if d == 'str']}
+        columns += [(name, column, dtype, values) for column, dtype, values in arrays]
+
+    def encoded_header():
+        data = json.dumps(header, sort_keys=True).encode('utf-8')
+        return data + b' ' * _pad(len(MAGIC) + _LENGTH.size + len(data))
+
+    # Offsets depend on the length of the header, which depends on the offsets: iterate until stable.
+    length = -1
+    data = encoded_header()
+    while len(data) != length:
+        length = len(data)
+        offset = len(MAGIC) + _LENGTH.size + length
+        for name, column, dtype, values in columns:
+            header['tables'][name]['columns'][column] = {'dtype': '<' + dtype, 'offset': offset}
+            offset += len(values) * values.itemsize
+            offset += _pad(offset)
+        header['blob'] = {'offset': offset, 'length': len(blob)}
+        data = encoded_header()
+
+    with open(path + '.tmp', 'wb') as fp:
+        fp.write(MAGIC + _LENGTH.pack(len(data)) + data)
+        for name, column, dtype, values in columns:
+            if sys.byteorder == 'big':
+                values.byteswap()
+            raw = values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+            fp.write(raw + b'\0' * _pad(len(raw)))
+        fp.write(bytes(blob))
+    os.rename(path + '.tmp', path)
+    return header
+
+
+def export(path=SNAPSHOT, final_folder=FINAL_FOLDER, corpus=None):
+    """
+    Exports final/range, final/criterions_*.csv and the factorization corpus into a snapshot.
+    """
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    return write_snapshot(path, {
+        'pcns': read_pcns(os.path.join(final_folder, 'range')),
+        'criterions': read_criterions(final_folder),
+        'factorizations': read_factorizations(corpus),
+    })
+
+
+class Snapshot(object):
+
+    def __init__(self, path=SNAPSHOT):
+        self.path = path
+        with open(path, 'rb') as fp:
+            self.mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError('%s is no snapshot' % path)
+        length = _LENGTH.unpack_from(self.mm, len(MAGIC))[0]
+        start = len(MAGIC) + _LENGTH.size
+        self.header = json.loads(self.mm[start:start + length].decode('utf-8'))
+        self._columns = dict()
+        self._index = dict()
+
+    def tables(self):
+        return sorted(self.header['tables'])
+
+    def rows(self, table):
+        return self.header['tables'][table]['rows']
+
+    def column(self, table, name):
+        """
+        Returns column name of table as NumPy view on the mapped file,
+        or as array if NumPy is not available.
+        """
+        key = (table, name)
+        if key not in self._columns:
+            info = self.header['tables'][table]['columns'][name]
+            rows = self.rows(table)
+            try:
+                import numpy
+                self._columns[key] = numpy.frombuffer(self.mm, dtype=info['dtype'], count=rows, offset=info['offset'])
+            except ImportError:
+                values = array.array(DTYPES[info['dtype'][1:]])
+                raw = self.mm[info['offset']:info['offset'] + rows * values.itemsize]
+                if hasattr(values, 'frombytes'):
+                    values.frombytes(raw)
+                else:
+                    values.fromstring(raw)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                self._columns[key] = values
+        return self._columns[key]
+
+    def string(self, table, name, i):
+        """
+        Returns string column name of row i.
+        """
+        offset = self.header['blob']['offset'] + int(self.column(table, name + '_offset')[i])
+        return self.mm[offset:offset + int(self.column(table, name + '_length')[i])].decode('utf-8')
+
+    def row(self, table, i):
+        """
+        Returns row i of table as dict.
+        """
+        info = self.header['tables'][table]
+        ret = dict(
+            (name, int(self.column(table, name)[i]))
+            for name in info['columns']
+            if not any(name in (s + '_offset', s + '_length') for s in info['strings'])
+        )
+        ret.update((name, self.string(table, name, i)) for name in info['strings'])
+        return ret
+
+    def iterrows(self, table):
+        for i in range(self.rows(table)):
+            yield self.row(table, i)
+
+    def find(self, table, p, e, n):
+        """
+        Returns row of (p, e, n) in table pcns or criterions or None.
+        """
+        if table not in self._index:
+            ps, es, ns = self.column(table, 'p'), self.column(table, 'e'), self.column(table, 'n')
+            self._index[table] = dict(((int(ps[i]), int(es[i]), int(ns[i])), i) for i in range(self.rows(table)))
+        i = self._index[table].get((p, e, n))
+        return None if i is None else self.row(table, i)
+
+    def factorization(self, value):
+        """
+        Returns factorization of value as list of (prime, multiplicity) or None.
+        """
+        if 'factorizations' not in self._index:
+            self._index['factorizations'] = dict(
+                (self.string('factorizations', 'value', i), i) for i in range(self.rows('factorizations'))
+            )
+        i = self._index['factorizations'].get('%d' % value)
+        if i is None:
+            return None
+        from ff_pcn.verify_range import parse_factorization
+        return parse_factorization(self.string('factorizations', 'factorization', i))
+
+    def close(self):
+        self._columns = dict()
+        self.mm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['export', 'info'])
+    parser.add_argument('path', nargs='?', default=SNAPSHOT)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+    if args.command == 'export':
+        header = export(args.output or args.path)
+    else:
+        header = Snapshot(args.path).header
+    for table in sorted(header['tables']):
+        print('%s: %d rows' % (table, header['tables'][table]['rows']))
+    print('blob: %d bytes' % header['blob']['length'])
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath(os.path.join(__file__, '../../')))
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+
+"""
+Module distributing sweeps over several worker nodes by a queue on a shared filesystem.
+
+A queue folder holds one JSON file per work unit in one of the states
+  pending/  - waiting for a worker,
+  leased/   - leased by a worker, the lease expires LEASE_TIME seconds after
+              the last modification, which the worker renews while running,
+  done/     - result reported, waiting to be collected,
+  collected/ - result written to the database,
+  failed/   - running the unit raised, the error is recorded and the unit is not run again.
+All transitions are atomic renames (or links), so any number of workers on
+any number of nodes can share the queue. Expired leases are moved back to
+pending, results reported late for an already finished unit are discarded.
+
+Work units are
+  existence (p, n) - check_p_n, the results are the lines of ex_<n>.txt,
+  criteria (p, e, n) - CriterionChecker, the results are the criteria,
+  search (p, e, n, start) - explicit search resumed at candidate start, the
+                  result replaces the line of (p, e, n) in ex_<n>.txt.
+Deferred and stopped searches are submitted by check_triple to the long-job queue
+(pcn_existence_checker.LONG_JOB_QUEUE), which is served by dedicated workers.
+
+Usage:
+    python ff_pcn/sweep_coordinator.py submit QUEUE START STOP [--kind existence|criteria]
+    python ff_pcn/sweep_coordinator.py worker QUEUE
+    python ff_pcn/sweep_coordinator.py collect QUEUE
+    python ff_pcn/sweep_coordinator.py status QUEUE
+    python ff_pcn/sweep_coordinator.py local QUEUE START STOP [--workers N]
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import argparse
+import errno
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+
+LEASE_TIME = 600
+"""Seconds a lease is valid without renewal."""
+
+STATES = ['pending', 'leased', 'done', 'collected', 'failed']
+
+
+class ResultCollector(object):
+    """
+    Database stand-in collecting the results of a work unit.
+    """
+
+    def __init__(self):
+        self.results = []
+
+    def add(self, p, e, n, result):
+        self.results += [[int(p), int(e), int(n), '%s' % result]]
+
+
+def unit_name(kind, args):
+    return '%s_%s' % (kind, '_'.join('%d' % a for a in args))
+
+
+def run_unit(unit):
+    """
+    Runs a work unit and returns its JSON serializable results.
+    """
+    from ff_pcn.pcn_existence_checker import CriterionChecker, check_p_n
+    if unit['kind'] == 'existence':
+        collector = ResultCollector()
+        check_p_n(tuple(unit['args']), database=collector)
+        return collector.results
+    if unit['kind'] == 'criteria':
+        crits = CriterionChecker([]).check_criterions(*unit['args'])
+        return [c if c is None or isinstance(c, bool) else '%s' % c for c in crits]
+    if unit['kind'] == 'search':
+        from ff_pcn.pcn_existence_checker import PCNExistenceChecker
+        p, e, n, start = unit['args']
+        collector = ResultCollector()
+        checker = PCNExistenceChecker(p, e, p**e, n, budget=None, resume=start)
+        collector.add(p, e, n, checker.check_existance(no_explicit_search=False)[1])
+        return collector.results
+    raise ValueError('unknown kind %s' % unit['kind'])
+
+
+class SweepQueue(object):
+
+    def __init__(self, folder, lease_time=LEASE_TIME):
+        self.folder = folder
+        self.lease_time = lease_time
+        for state in STATES:
+            path = os.path.join(folder, state)
+            if not os.path.exists(path):
+                try:
+                    os.makedirs(path)
+                except OSError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
+
+    def path(self, state, name):
+        return os.path.join(self.folder, state, name + '.json')
+
+    def names(self, state):
+        return sorted(fil[:-5] for fil in os.listdir(os.path.join(self.folder, state)) if fil.endswith('.json'))
+
+    def state(self, name):
+        """
+        Returns the most advanced state of unit name or None.
+        """
+        for state in reversed(STATES):
+            if os.path.exists(self.path(state, name)):
+                return state
+        return None
+
+    def submit(self, kind, args):
+        """
+        Adds a work unit unless it is already known. Returns True if added.
+        """
+        name = unit_name(kind, args)
+        if self.state(name) is not None:
+            return False
+        tmp = self.path('pending', name) + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump({'name': name, 'kind': kind, 'args': list(args)}, fp)
+        os.rename(tmp, self.path('pending', name))
+        return True
+
+    def lease(self):
+        """
+        Leases the next pending unit. Returns the unit or None if nothing is pending.
+        """
+        for attempt in range(2):
+            for name in self.names('pending'):
+                leased = self.path('leased', name)
+                try:
+                    os.rename(self.path('pending', name), leased)
+                    os.utime(leased, None)
+                    with open(leased) as fp:
+                        return json.load(fp)
+                except (OSError, IOError, ValueError):
+                    # Leased or reclaimed by someone else in between
+                    continue
+            if not self.reclaim():
+                break
+        return None
+
+    def renew(self, name):
+        """
+        Renews the lease of name. Returns False if the lease was lost.
+        """
+        try:
+            os.utime(self.path('leased', name), None)
+            return True
+        except OSError:
+            return False
+
+    def reclaim(self):
+        """
+        Moves expired leases back to pending. Returns the number of reclaimed units.
+        """
+        now = time.time()
+        ret = 0
+        for name in self.names('leased'):
+            leased = self.path('leased', name)
+            try:
+                if os.path.getmtime(leased) + self.lease_time > now:
+                    continue
+                os.rename(leased, self.path('pending', name))
+            except OSError:
+                continue
+            logging.getLogger(__name__).warning('SweepQueue.reclaim: %s', name)
+            ret += 1
+        return ret
+
+    def complete(self, unit, results, worker=None):
+        """
+        Reports results of unit. Returns False if the unit was already done,
+        i.e. the results are a late duplicate and discarded.
+        """
+        name = unit['name']
+        done = self.path('done', name)
+        tmp = '%s.%s.tmp' % (done, worker or os.getpid())
+        with open(tmp, 'w') as fp:
+            json.dump(dict(unit, results=results, worker=worker), fp)
+        added = False
+        if not os.path.exists(self.path('collected', name)):
+            try:
+                os.link(tmp, done)
+                added = True
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        if not added:
+            logging.getLogger(__name__).info('SweepQueue.complete: discard duplicate %s of %s', name, worker)
+        os.remove(tmp)
+        for state in ('leased', 'pending'):
+            try:
+                os.remove(self.path(state, name))
+            except OSError:
+                pass
+        return added
+
+    def fail(self, unit, error, worker=None):
+        """
+        Moves unit to failed with error, unless it was completed in the meantime.
+        """
+        name = unit['name']
+        if self.state(name) in ('done', 'collected'):
+            return
+        tmp = '%s.%s.tmp' % (self.path('failed', name), worker or os.getpid())
+        with open(tmp, 'w') as fp:
+            json.dump(dict(unit, error=error, worker=worker), fp)
+        os.rename(tmp, self.path('failed', name))
+        for state in ('leased', 'pending'):
+            try:
+                os.remove(self.path(state, name))
+            except OSError:
+                pass
+
+    def collect(self, database=None):
+        """
+        Writes results of all done units to database and marks them collected.
+        Existence results are added line by line, search results replace the line of their triple,
+        criteria results are appended to criterions.csv.
+        Returns number of collected units.
+        """
+        if database is None:
+            from ff_pcn.database import get_database
+            database = get_database()
+        if not os.path.exists(database.result_folder):
+            os.makedirs(database.result_folder)
+        ret = 0
+        for name in self.names('done'):
+            with open(self.path('done', name)) as fp:
+                unit = json.load(fp)
+            if unit['kind'] == 'existence':
+                for p, e, n, result in unit['results']:
+                    database.add(p, e, n, result)
+            elif unit['kind'] == 'search':
+                for p, e, n, result in unit['results']:
+                    database.update(p, e, n, result)
+            else:
+                with open(os.path.join(database.result_folder, 'criterions.csv'), 'a') as fp:
+                    fp.write(', '.join('%s' % x for x in list(unit['args']) + unit['results']) + '\n')
+            os.rename(self.path('done', name), self.path('collected', name))
+            ret += 1
+        return ret
+
+    def status(self):
+        return dict((state, len(self.names(state))) for state in STATES)
+
+    def finished(self):
+        status = self.status()
+        return status['pending'] == 0 and status['leased'] == 0
+
+
+class _Heartbeat(threading.Thread):
+
+    def __init__(self, queue, unit_name):
+        super(_Heartbeat, self).__init__()
+        self.daemon = True
+        self.queue = queue
+        self.unit_name = unit_name
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.queue.lease_time / 3.0):
+            if not self.queue.renew(self.unit_name):
+                logging.getLogger(__name__).warning('Heartbeat: lease of %s lost', self.unit_name)
+                return
+
+
+def run_worker(folder, lease_time=LEASE_TIME, poll=10, run_unit=run_unit):
+    """
+    Leases and runs units of the queue in folder until it is finished.
+    Units raising an exception are moved to failed and the worker continues.
+    Returns number of units run successfully.
+    """
+    queue = SweepQueue(folder, lease_time=lease_time)
+    worker = '%s:%d' % (socket.gethostname(), os.getpid())
+    ret = 0
+    while True:
+        unit = queue.lease()
+        if unit is None:
+            if queue.finished():
+                return ret
+            time.sleep(poll)
+            continue
+        heartbeat = _Heartbeat(queue, unit['name'])
+        heartbeat.start()
+        try:
+            results = run_unit(unit)
+        except Exception as e:
+            logging.getLogger(__name__).exception('run_worker: %s failed', unit['name'])
+            queue.fail(unit, '%s: %s' % (type(e).__name__, e), worker=worker)
+            continue
+        finally:
+            heartbeat.stopped.set()
+        queue.complete(unit, results, worker=worker)
+        ret += 1
+
+
+def submit_range(folder, start, stop, kind='existence'):
+    """
+    Submits all units of n in [start, stop). Returns number of new units.
+    """
+    from ff_pcn.backend import primes
+    from ff_pcn.finite_field_theory import pens_to_check
+    queue = SweepQueue(folder)
+    ret = 0
+    for n in range(start, stop):
+        if kind == 'existence':
+            units = [(p, n) for p in primes(n)]
+        else:
+            units = [(p, e, n) for p, e, n in pens_to_check(n)]
+        ret += sum(queue.submit(kind, args) for args in units)
+    return ret
+
+
+def run_local(folder, start, stop, workers=None, kind='existence', lease_time=LEASE_TIME, poll=10):
+    """
+    Local stand-in for a cluster: submits the range, runs workers as processes
+    and collects the results while they arrive.
+    """
+    submit_range(folder, start, stop, kind=kind)
+    queue = SweepQueue(folder, lease_time=lease_time)
+    procs = [
+        multiprocessing.Process(target=run_worker, args=(folder, lease_time, poll))
+        for _ in range(workers or multiprocessing.cpu_count())
+    ]
+    for proc in procs:
+        proc.start()
+    while any(proc.is_alive() for proc in procs):
+        queue.collect()
+        time.sleep(poll)
+    for proc in procs:
+        proc.join()
+    queue.collect()
+    return queue.status()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['submit', 'worker', 'collect', 'status', 'local'])
+    parser.add_argument('queue')
+    parser.add_argument('start', type=int, nargs='?')
+    parser.add_argument('stop', type=int, nargs='?')
+    parser.add_argument('--kind', choices=['existence', 'criteria'], default='existence')
+    parser.add_argument('--lease-time', type=int, default=LEASE_TIME)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'submit':
+        print('submitted %d units' % submit_range(args.queue, args.start, args.stop, kind=args.kind))
+    elif args.command == 'worker':
+        print('ran %d units' % run_worker(args.queue, lease_time=args.lease_time))
+    elif args.command == 'collect':
+        print('collected %d units' % SweepQueue(args.queue).collect())
+    elif args.command == 'status':
+        print(json.dumps(SweepQueue(args.queue).status()))
+    else:
+        print(json.dumps(run_local(args.queue, args.start, args.stop, workers=args.workers,
+                                   kind=args.kind, lease_time=args.lease_time)))
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath(os.path.join(__file__, '../../')))
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""
+Test for algebraic_factorization.
+"""
+
+from unittest import TestCase
+from ff_pcn.algebraic_factorization import (
+    algebraic_factors,
+    aurifeuillian_polynomial,
+    aurifeuillian_split,
+    perfect_power,
+    power_split,
+    squarefree_decomposition,
+)
+from ff_pcn.backend import cyclotomic_value, prod
+
+
+class AlgebraicFactorizationTestCase(TestCase):
+
+    def test_perfect_power(self):
+        self.assertEqual(perfect_power(7), (7, 1))
+        self.assertEqual(perfect_power(2**12 * 3**6), (2**2 * 3, 6))
+        self.assertEqual(squarefree_decomposition(2**5 * 3**2 * 5), (10, 12))
+
+    def test_power_split(self):
+        for n in range(1, 30):
+            for c in [2, 3, 10]:
+                for k in [1, 2, 3, 4, 6, 12]:
+                    self.assertEqual(
+                        cyclotomic_value(n, c**k),
+                        prod(cyclotomic_value(m, c) for m in power_split(n, c, k))
+                    )
+
+    def test_aurifeuillian_polynomial(self):
+        # Phi_4(2 y^2) = 4 y^4 + 1 = (2 y^2 - 2 y + 1) (2 y^2 + 2 y + 1)
+        self.assertEqual(aurifeuillian_polynomial(4, 2), [1, -2, 2])
+        # Phi_6(3 y^2) = (3 y^2 - 3 y + 1) (3 y^2 + 3 y + 1)
+        self.assertEqual(aurifeuillian_polynomial(6, 3), [1, -3, 3])
+        self.assertEqual(aurifeuillian_polynomial(5, 5), [1, -5, 15, -25, 25])
+        self.assertEqual(aurifeuillian_polynomial(7, 7), [])
+        self.assertEqual(aurifeuillian_polynomial(12, 3), [])
+        # Rejected before the units mod lcm(2n, D) are enumerated
+        self.assertEqual(aurifeuillian_polynomial(2000, 1999), [])
+
+    def test_aurifeuillian_split(self):
+        # 2^58 + 1 = Phi_4(2^29) = (2^29 - 2^15 + 1) (2^29 + 2^15 + 1)
+        self.assertEqual(aurifeuillian_split(4, 2**29), (2**29 - 2**15 + 1, 2**29 + 2**15 + 1))
+        for n, s in [(5, 5), (14, 7), (20, 10), (13, 13), (21, 21), (30, 15)]:
+            for t in range(1, 4):
+                L, M = aurifeuillian_split(n, s*t*t)
+                self.assertEqual(L*M, cyclotomic_value(n, s*t*t))
+
+    def test_algebraic_factors(self):
+        for n in range(1, 60):
+            for b in [2, 3, 5, 6, 7, 8, 12, 20, 27, 64]:
+                facs, cofactors = algebraic_factors(n, b)
+                self.assertEqual(
+                    cyclotomic_value(n, b),
+                    prod(p**m for p, m in facs) * prod(c for _, _, c in cofactors),
+                    (n, b)
+                )
+                self.assertTrue(all(c > 1 for _, _, c in cofactors))
+        facs, cofactors = algebraic_factors(6, 2)
+        self.assertEqual((facs, cofactors), ([(3, 1)], []))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+
+"""
+Test for benchmark.
+"""
+
+from unittest import TestCase
+from ff_pcn.benchmark import compare, run_benchmark
+
+
+class BenchmarkTestCase(TestCase):
+
+    def test_compare(self):
+        baseline = [
+            {'name': 'a', 'best': 1.0, 'checksum': 'x'},
+            {'name': 'b', 'best': 1.0, 'checksum': 'x'},
+            {'name': 'c', 'best': 1.0, 'checksum': 'x'},
+            {'name': 'd', 'best': 1.0, 'checksum': 'x'},
+        ]
+        results = compare([
+            {'name': 'a', 'best': 1.5, 'checksum': 'x'},
+            {'name': 'b', 'best': 0.5, 'checksum': 'x'},
+            {'name': 'c', 'best': 1.1, 'checksum': 'x'},
+            {'name': 'd', 'best': 1.0, 'checksum': 'y'},
+            {'name': 'e', 'best': 1.0, 'checksum': 'x'},
+            {'name': 'f', 'skipped': 'sage'},
+        ], baseline)
+        self.assertEqual(
+            [r['status'] for r in results],
+            ['regression', 'gain', 'same', 'changed', 'new', 'skipped']
+        )
+
+    def test_run_benchmark(self):
+        first = run_benchmark('essential_divisors', repeat=2)
+        second = run_benchmark('essential_divisors', repeat=1)
+        self.assertEqual(len(first['times']), 2)
+        self.assertEqual(first['checksum'], second['checksum'])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""
+Test for cost_model.
+"""
+
+import math
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn.cost_model import CostModel, features, least_squares
+
+
+class CostModelTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def records(self):
+        """
+        Synthetic records with time = 1ms * 2^(bits of q^n / 10) and a slow explicit search.
+        """
+        ret = []
+        for p in (2, 3, 5, 7):
+            for n in range(10, 40):
+                time = 1e-3 * 2**(n * math.log(p, 2) / 10)
+                record = {'p': p, 'e': 1, 'n': n, 'time': time, 'stages': {}, 'decided_by': 1}
+                if n % 6 == 0:
+                    record['stages']['criterion_6'] = 100 * time
+                    record['decided_by'] = 6
+                ret += [record]
+        return ret
+
+    def test_least_squares(self):
+        xs = [[1.0, x, x*x] for x in range(10)]
+        ys = [2 - 3*x + 0.5*x*x for x in range(10)]
+        for c, expected in zip(least_squares(xs, ys), [2, -3, 0.5]):
+            self.assertAlmostEqual(c, expected, places=4)
+
+    def test_fit(self):
+        model = CostModel().fit(self.records())
+        self.assertEqual(sorted(model.coefficients), ['criterion_6', 'time'])
+        self.assertAlmostEqual(model.predict(3, 1, 25) / (1e-3 * 2**(25 * math.log(3, 2) / 10)), 1, places=1)
+        self.assertGreater(model.predict(3, 1, 25, 'criterion_6'), 10 * model.predict(3, 1, 25))
+        self.assertEqual(model.schedule([(2, 1, 20), (7, 1, 30), (3, 1, 30)]), [(7, 1, 30), (3, 1, 30), (2, 1, 20)])
+        self.assertFalse(model.worth_trying('criterion_6', 7, 1, 39, 1.0))
+        self.assertTrue(model.worth_trying('criterion_6', 2, 1, 12, 1.0))
+        self.assertTrue(model.worth_trying('criterion_6', 7, 1, 39, None))
+
+    def test_neighbour(self):
+        model = CostModel(decided={(2, 1, 10): 1, (2, 1, 12): 6})
+        self.assertIs(model.neighbour(2, 1, 10), False)
+        self.assertEqual(model.neighbour(2, 1, 12), 1)
+        self.assertEqual(model.neighbour(2, 1, 20), 6)
+        self.assertEqual(features(2, 1, 20, 6)[-2:], [0.0, 1.0])
+
+    def test_save_load(self):
+        path = os.path.join(self.tmpdir, 'cost_model.json')
+        model = CostModel().fit(self.records())
+        model.save(path)
+        loaded = CostModel.load(path)
+        self.assertEqual(loaded.decided, model.decided)
+        self.assertAlmostEqual(loaded.predict(5, 1, 33), model.predict(5, 1, 33))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""
+Test for daemon.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from fractions import Fraction
+from unittest import TestCase
+from ff_pcn import daemon
+from ff_pcn.daemon import Client, Server, jsonable
+
+
+class DaemonTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.calls = []
+        daemon.COMMANDS['slow'] = self.slow
+        self.server = Server(os.path.join(self.tmpdir, 'socket'))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.client = Client(self.server.path)
+
+    def tearDown(self):
+        self.client.request('stop')
+        self.thread.join()
+        self.server.server_close()
+        del daemon.COMMANDS['slow']
+        shutil.rmtree(self.tmpdir)
+
+    def slow(self, n, b):
+        self.calls += [(n, b)]
+        time.sleep(0.3)
+        if n == 0:
+            raise ValueError('n must be positive')
+        return [(n, b), Fraction(n, b)]
+
+    def test_jsonable(self):
+        self.assertEqual(jsonable([(2, True), None, Fraction(1, 2), {3: 'a'}]), [[2, True], None, '1/2', {'3': 'a'}])
+
+    def test_requests(self):
+        self.assertEqual(self.client.request('ping'), 'pong')
+        self.assertRaises(RuntimeError, self.client.request, 'unknown')
+        self.assertRaises(RuntimeError, self.client.request, 'slow', 0, 1)
+        self.assertEqual(self.client.request('slow', 7, 10), [[7, 10], '7/10'])
+
+    def test_coalescing(self):
+        results = []
+
+        def request(n, b):
+            results.append(self.client.request('slow', n, b))
+        threads = [threading.Thread(target=request, args=nb) for nb in [(7, 10), (7, 10), (7, 10), (5, 10)]]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(self.calls), [(5, 10), (7, 10)])
+        self.assertEqual(self.server.coalescer.coalesced, 2)
+        self.assertEqual(results.count([[7, 10], '7/10']), 3)
+
+    def test_exclusive(self):
+        results = []
+
+        def request(command, *args):
+            results.append((command, self.client.request(command, *args)))
+        daemon.MUTATING.add('slow')
+        try:
+            threads = [threading.Thread(target=request, args=args) for args in [('slow', 7, 10), ('slow', 5, 10)]]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.02)
+            # Mutating commands are serialized, other commands are not blocked by them
+            request('ping')
+            self.assertEqual(results, [('ping', 'pong')])
+            self.assertEqual(self.calls, [(7, 10)])
+            for thread in threads:
+                thread.join()
+        finally:
+            daemon.MUTATING.discard('slow')
+        self.assertEqual(sorted(self.calls), [(5, 10), (7, 10)])
+
+    def test_concurrent(self):
+        threads = [threading.Thread(target=self.client.request, args=('slow', n, 10)) for n in (3, 5, 7)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(self.calls), [(3, 10), (5, 10), (7, 10)])
+        self.assertLess(time.time() - start, 0.8)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""
+Test for database.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn.database import Database
+
+
+def fake_resolve(pen, resume=0):
+    if resume:
+        return pen, '(%d, %d, %d) => found x after %d' % (pen + (resume,))
+    return pen, '(%d, %d, %d) => found x' % pen
+
+
+class DatabaseTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.database = Database(self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read(self, n):
+        with open(os.path.join(self.tmpdir, 'ex_%d.txt' % n)) as fp:
+            return fp.read().splitlines()
+
+    def test_resolve_all(self):
+        self.database.add(2, 1, 6, '(2, 1, 6) => False')
+        self.database.add(3, 1, 6, '(3, 1, 6) => regular')
+        self.database.add(5, 1, 6, '(5, 1, 6) => False [(6, 5, 2)]')
+        self.database.add(2, 1, 12, '(2, 1, 12) => L > U')
+        self.database.add(2, 2, 20, '(2, 2, 20) => False')
+        self.database.add(3, 1, 20, '(3, 1, 20) => False partial 1000')
+        self.assertEqual(
+            self.database.unresolved(),
+            {os.path.join(self.tmpdir, 'ex_6.txt'): [(2, 1, 6), (5, 1, 6)],
+             os.path.join(self.tmpdir, 'ex_20.txt'): [(2, 2, 20), (3, 1, 20)]}
+        )
+        self.assertEqual(self.database.partial(), {(3, 1, 20): 1000})
+        self.assertEqual(self.database.resolve_all(processes=2, resolve=fake_resolve), 4)
+        self.assertEqual(self.read(6), ['(2, 1, 6) => found x', '(3, 1, 6) => regular', '(5, 1, 6) => found x'])
+        self.assertEqual(self.read(12), ['(2, 1, 12) => L > U'])
+        self.assertEqual(self.read(20), ['(2, 2, 20) => found x', '(3, 1, 20) => found x after 1000'])
+        self.assertEqual(self.database.unresolved(), {})
+
+    def test_result(self):
+        self.database.add(2, 1, 6, '(2, 1, 6) => False')
+        self.database.add(3, 1, 6, '(3, 1, 6) => regular')
+        self.assertEqual(self.database.result(3, 1, 6), '(3, 1, 6) => regular')
+        self.assertIsNone(self.database.result(5, 1, 6))
+        self.assertIsNone(self.database.result(2, 1, 7))
+
+    def test_update(self):
+        self.database.add(2, 1, 6, '(2, 1, 6) => False partial 100')
+        self.database.add(3, 1, 6, '(3, 1, 6) => regular')
+        self.database.update(2, 1, 6, '(2, 1, 6) => found x')
+        self.database.update(5, 1, 6, '(5, 1, 6) => found y')
+        self.assertEqual(self.read(6), ['(2, 1, 6) => found x', '(3, 1, 6) => regular', '(5, 1, 6) => found y'])
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""
+Test for datastore.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn import datastore as datastore_module
+from ff_pcn.datastore import DataStore, store
+
+
+class DataStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'datastore.sqlite')
+        self.global_datastore = datastore_module._datastore
+
+    def tearDown(self):
+        datastore_module._datastore = self.global_datastore
+        shutil.rmtree(self.tmpdir)
+
+    def test_lru_eviction(self):
+        ds = DataStore(max_entries=3, path=None)
+        for i in range(3):
+            ds.add('s', i, i*i)
+        self.assertEqual(ds.get('s', 0), 0)
+        ds.add('s', 3, 9)
+        self.assertIsNone(ds.get('s', 1))
+        self.assertEqual(ds.get('s', 0), 0)
+        self.assertEqual(ds.get('s', 3), 9)
+        self.assertEqual(ds.stats['s'].evictions, 1)
+        self.assertEqual(ds.stats['s'].hits, 3)
+        self.assertEqual(ds.stats['s'].misses, 1)
+
+    def test_persistent(self):
+        ds = DataStore(path=self.path)
+        ds.configure('p', persistent=True)
+        ds.add('p', (2, 3), [1, 2])
+        ds.add('m', (2, 3), [1, 2])
+        other = DataStore(path=self.path)
+        other.configure('p', persistent=True)
+        other.configure('m', persistent=True)
+        self.assertEqual(other.get('p', (2, 3)), [1, 2])
+        self.assertEqual(other.stats['p'].disk_hits, 1)
+        self.assertIsNone(other.get('m', (2, 3)))
+
+    def test_store_decorator(self):
+        datastore_module._datastore = DataStore(path=None)
+        calls = []
+
+        @store('test_section', max_entries=2)
+        def func(a, b=1):
+            calls.append((a, b))
+            return None if a == 0 else a + b
+
+        self.assertIsNone(func(0))
+        self.assertIsNone(func(0))
+        self.assertEqual(func(1, b=2), 3)
+        self.assertEqual(func(1, b=2), 3)
+        self.assertEqual(func(1), 2)
+        self.assertEqual(calls, [(0, 1), (1, 2), (1, 1)])
+        self.assertEqual(datastore_module._datastore.stats['test_section'].evictions, 1)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+Test for factor_corpus.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn.factor_corpus import FactorCorpus
+
+
+class FactorCorpusTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as fp:
+            fp.write(content)
+        return path
+
+    def test_import_all_formats(self):
+        corpus = FactorCorpus()
+        # Phi_7(2) = 127, Phi_12(7) = 2353 = 13 * 181, Phi_5(3) = 121
+        corpus.import_cyclotomic_numbers_csv(self.write('cn.csv', '"(7, 2)","[(127, 1)]"\n"(12, 7)","[(181, 1), (13, 1)]"\n'))
+        corpus.import_factors_csv(self.write('f.csv', '2353,"[(13, 1), (181, 1)]"\n1000,"[(2, 3), (5, 3)]"\n'))
+        corpus.import_factor_lib(self.write('fl.txt', '121\t[(11L, 2)]\n'))
+        self.assertEqual(len(corpus), 4)
+        self.assertEqual(corpus.duplicates, 1)
+        self.assertEqual(corpus.conflicts, [])
+        self.assertEqual(corpus.get(nb=(12, 7)), [(13, 1), (181, 1)])
+        self.assertEqual(corpus.get(value=2353), [(13, 1), (181, 1)])
+        self.assertEqual(corpus.get(value=121), [(11, 2)])
+        self.assertIsNone(corpus.get(nb=(5, 3)))
+        corpus.alias((5, 3), 121)
+        self.assertEqual(corpus.get(nb=(5, 3)), [(11, 2)])
+
+    def test_conflicts(self):
+        corpus = FactorCorpus()
+        self.assertFalse(corpus.add(10, [(2, 1), (3, 1)], source='a'))
+        self.assertTrue(corpus.add(2353, [(2353, 1)], nb=(12, 7), source='a'))
+        self.assertTrue(corpus.add(2353, [(13, 1), (181, 1)], source='b'))
+        self.assertFalse(corpus.add(2354, [(2, 1), (11, 1), (107, 1)], nb=(12, 7)))
+        self.assertEqual(len(corpus.conflicts), 3)
+        self.assertEqual(corpus.get(value=2353), [(13, 1), (181, 1)])
+
+    def test_save_and_import_corpus(self):
+        corpus = FactorCorpus()
+        corpus.add(2353, [(13, 1), (181, 1)], nb=(12, 7))
+        corpus.add(1000, [(2, 3), (5, 3)])
+        path = os.path.join(self.tmpdir, 'corpus.csv')
+        corpus.save(path)
+        loaded = FactorCorpus()
+        loaded.import_corpus(path)
+        self.assertEqual(loaded.by_value, corpus.by_value)
+        self.assertEqual(loaded.by_nb, corpus.by_nb)
+
+    def test_interned_primes(self):
+        corpus = FactorCorpus()
+        corpus.add(2353, [(13, 1), (181, 1)], nb=(12, 7))
+        corpus.add(2 * 13**2, [(2, 1), (13, 2)])
+        self.assertEqual(corpus.primes, [13, 181, 2])
+        self.assertEqual(list(corpus.packed[2 * 13**2]), [2, 1, 0, 2])
+        self.assertEqual(corpus.get(value=2 * 13**2), [(2, 1), (13, 2)])
+        self.assertEqual(corpus.by_value, {2353: [(13, 1), (181, 1)], 338: [(2, 1), (13, 2)]})
+        footprint = corpus.memory_footprint()
+        self.assertEqual(sorted(footprint), ['factorizations', 'nbs', 'primes', 'values'])
+        self.assertTrue(all(size > 0 for size in footprint.values()))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""
+Test for factorer.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+import ff_pcn.factorer
+import ff_pcn.prime_cache
+from ff_pcn.factorer import Factorer, ingest_yafu_line
+from ff_pcn.prime_cache import PrimeCache
+
+
+class FactorerTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.prime_cache = ff_pcn.prime_cache._prime_cache
+        ff_pcn.prime_cache._prime_cache = PrimeCache(path=None)
+
+    def tearDown(self):
+        ff_pcn.prime_cache._prime_cache = self.prime_cache
+        shutil.rmtree(self.tmpdir)
+
+    def test_ingest_yafu_line(self):
+        # Phi_7(10) = 1111111 = 239 * 4649, 2^2 * 3 = 12 is no value of Phi_9(3)
+        self.assertIsNone(ingest_yafu_line('\n'))
+        self.assertEqual(ingest_yafu_line('(7, 10) (1111111)/239/4649\n'),
+                         ('accepted', (7, 10), 1111111, [(239, 1), (4649, 1)],
+                          [(239, 'deterministic'), (4649, 'deterministic')]))
+        # Known primes are trusted
+        self.assertEqual(ingest_yafu_line('(7, 10) (1111111)/239/4649\n')[4], [])
+        self.assertEqual(ingest_yafu_line('(9, 3) (12)/2^2/3')[1:4], (None, 12, [(2, 2), (3, 1)]))
+        self.assertEqual(ingest_yafu_line('(7, 10) (1111111)/239/4648')[2], 'product mismatch')
+        self.assertEqual(ingest_yafu_line('(7, 10) (1111111)/1111111')[2], 'composite factors [1111111]')
+        self.assertEqual(ingest_yafu_line('(7, 10) (1111111)/239/46')[2], 'product mismatch')
+        self.assertEqual(ingest_yafu_line('(7, 10) (1111111)/239/'), ('rejected', '(7, 10) (1111111)/239/', 'malformed'))
+
+    def test_read(self):
+        path = os.path.join(self.tmpdir, 'out')
+        with open(path, 'w') as fp:
+            fp.write('(7, 10) (1111111)/239/4649\n\n'
+                     'garbage\n'
+                     '(9, 3) (12)/2^2/3\n'
+                     '(5, 10) (11111)/41/272\n')
+        factorer = Factorer(frozen=True)
+        accepted, rejected = factorer.read(path, processes=2, chunksize=1)
+        self.assertEqual(accepted, 2)
+        self.assertEqual([reason for _, reason in rejected], ['malformed', 'product mismatch'])
+        self.assertEqual(factorer.corpus.get(nb=(7, 10)), [(239, 1), (4649, 1)])
+        self.assertEqual(factorer.corpus.get(value=12), [(2, 2), (3, 1)])
+        self.assertEqual(ff_pcn.prime_cache.get_prime_cache().proof(4649), 'deterministic')
+        self.assertIn(2, ff_pcn.prime_cache.get_prime_cache())
+
+    def test_save_value_keyed(self):
+        database_path = os.path.join(self.tmpdir, 'cyclotomic_numbers.csv')
+        corpus_path = os.path.join(self.tmpdir, 'factor_corpus.csv')
+        shutil.copy(ff_pcn.factorer.FACTOR_DATABASE, database_path)
+        factorer = Factorer(database_path=database_path, corpus_path=corpus_path)
+        # Cofactors of algebraic splitting and the ladder are keyed by value only
+        factorer.corpus.add(239 * 4649 * 909091, [(239, 1), (4649, 1), (909091, 1)], source='ladder')
+        factorer.save()
+        loaded = Factorer(frozen=True, database_path=database_path, corpus_path=corpus_path)
+        self.assertEqual(loaded.corpus.get(value=239 * 4649 * 909091), [(239, 1), (4649, 1), (909091, 1)])
+
+    def test_verified(self):
+        factorer = Factorer(frozen=True, corpus_path=os.path.join(self.tmpdir, 'factor_corpus.csv'))
+        # 10^11 + 1 = 11^2 * 23 * 4093 * 8779 is listed as prime
+        factorer.corpus.add(10**11 + 1, [(10**11 + 1, 1)])
+        factorer.corpus.alias((2, 10**11), 10**11 + 1)
+        self.assertIsNone(factorer.get_cofactor(2, 10**11 + 1))
+        self.assertNotIn(10**11 + 1, factorer.corpus)
+        self.assertIsNone(factorer.corpus.get(nb=(2, 10**11)))
+        factorer.corpus.add(10**11 + 3, [(10**11 + 3, 1)])
+        self.assertEqual(factorer.get_cofactor(1, 10**11 + 3), [(10**11 + 3, 1)])
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""
+Test for factoring_ladder.
+"""
+
+from unittest import TestCase
+from ff_pcn.backend import cyclotomic_value, prod
+from ff_pcn.factoring_ladder import (
+    EcmTier,
+    FactoringLadder,
+    RhoTier,
+    TrialDivisionTier,
+)
+
+
+P12 = 100000000003
+P20 = 10000000000000000051
+
+
+class FactoringLadderTestCase(TestCase):
+
+    def test_trial_division(self):
+        ladder = FactoringLadder([TrialDivisionTier()])
+        # Phi_67(3) = 221101 * 441019876741 * 475384700124973, 221101 = 1 mod 67
+        self.assertIsNone(ladder.factor(cyclotomic_value(67, 3), 67))
+        self.assertEqual(ladder.stats['trial'].successes, 1)
+        self.assertEqual(ladder.factor(cyclotomic_value(97, 2), 97), [(11447, 1), (13842607235828485645766393, 1)])
+
+    def test_rho(self):
+        ladder = FactoringLadder([RhoTier(budget=10)])
+        self.assertEqual(ladder.factor(1000000007 * P12), [(1000000007, 1), (P12, 1)])
+        self.assertEqual(ladder.factor(1000000007**3), [(1000000007, 3)])
+
+    def test_ecm(self):
+        ladder = FactoringLadder([EcmTier(budget=30, seed=1)])
+        self.assertEqual(ladder.factor(P12 * P20), [(P12, 1), (P20, 1)])
+
+    def test_escalation(self):
+        ladder = FactoringLadder([TrialDivisionTier(bound=1000), RhoTier(budget=0.01)])
+        self.assertIsNone(ladder.factor(P20 * (2**61 - 1)))
+        self.assertEqual(ladder.escalated, 1)
+        num = 3 * 7 * 1013 * 1000000007
+        self.assertEqual(prod(p**m for p, m in ladder.factor(num)), num)
+        self.assertEqual(ladder.factored, 1)
+
+    def test_partial(self):
+        ladder = FactoringLadder([TrialDivisionTier(bound=2000), RhoTier(budget=0.01)])
+        hard = P20 * (2**61 - 1)
+        self.assertEqual(ladder.factor_partial(1013 * hard), ([(1013, 1)], [hard]))
+        known = {hard: [(P20, 1), (2**61 - 1, 1)]}.get
+        self.assertEqual(ladder.factor_partial(1013 * hard, known=known), ([(1013, 1), (2**61 - 1, 1), (P20, 1)], []))
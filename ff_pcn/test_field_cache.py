@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+"""
+Test for field_cache.
+"""
+
+from unittest import TestCase, skipIf
+from ff_pcn.field_cache import FieldCache, modulus_key
+from ff_pcn.finite_field_theory import completely_normal
+try:
+    from sage.all import GF, PolynomialRing
+except ImportError:
+    GF = PolynomialRing = None
+
+
+@skipIf(GF is None, 'Sage not available')
+class FieldCacheTestCase(TestCase):
+
+    def test_context(self):
+        cache = FieldCache(max_entries=2)
+        x = PolynomialRing(GF(2), 'x').gen()
+        f = x**4 + x + 1
+        ctx = cache.context(2, 4, f)
+        self.assertEqual(ctx.E.order(), 16)
+        self.assertEqual(ctx.E.modulus(), f)
+        self.assertIs(cache.context(2, 4, f), ctx)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(ctx.subfield(2).order(), 4)
+        G, h = ctx.extension(1, 2)
+        self.assertEqual(G.order(), 4)
+        self.assertIs(h.codomain(), ctx.E)
+        self.assertEqual(ctx.frobenius(1)(ctx.E.gen()), ctx.E.gen()**2)
+
+    def test_eviction(self):
+        cache = FieldCache(max_entries=2)
+        x = PolynomialRing(GF(2), 'x').gen()
+        cache.context(2, 4, x**4 + x + 1)
+        cache.context(2, 4, x**4 + x**3 + 1)
+        cache.context(2, 4, x**4 + x + 1)
+        cache.context(2, 3, x**3 + x + 1)
+        self.assertEqual(len(cache.contexts), 2)
+        self.assertNotIn((2, 4, modulus_key(x**4 + x**3 + 1)), cache.contexts)
+        self.assertIn((2, 4, modulus_key(x**4 + x + 1)), cache.contexts)
+
+    def test_completely_normal(self):
+        x = PolynomialRing(GF(2), 'x').gen()
+        self.assertTrue(completely_normal(2, 1, 4, x**4 + x**3 + 1))
+        self.assertFalse(completely_normal(2, 1, 4, x**4 + x + 1))
@@ -7,11 +7,18 @@ Test for basic_number_theory.
 from unittest import TestCase
 from ff_pcn.finite_field_theory import (
     decompose,
+    decomposition_characters,
+    module_characters,
+    omega_d,
+    omega_theta,
+    theta_d,
     euler_polynomial,
+    euler_polynomial_factor,
+    necklace_sum,
     u_qn,
     lower_euler_phi,
 )
-from sage.all import (
+from ff_pcn.backend import (
     Integer,
     euler_phi,
     primes,
@@ -30,9 +37,37 @@ class FiniteFieldTheoryTestCase(TestCase):
             [(1, 1, 1), (2, 1, 1), (4, 1, 1), (3, 2, 1), (12, 1, 1), (9, 2, 1), (36, 1, 1), (7, 6, 1), (28, 3, 1), (63, 2, 1), (252, 1, 1)]
         )
 
+    def test_decomposition_characters(self):
+        for p, e, n in [(3, 1, 20), (5, 1, 252), (2, 2, 90), (7, 1, 98)]:
+            self.assertEqual(
+                decomposition_characters(Integer(p), Integer(e), Integer(n)),
+                module_characters(decompose(Integer(p), Integer(e), Integer(n)))
+            )
+
     def test_euler_polynomial(self):
         self.assertEqual(euler_polynomial(Integer(2), Integer(1), Integer(6)), 24)
 
+    def test_necklace_sum(self):
+        # 2 irreducible polynomials of degree 3 over GF(2), 3 of degree 2 over GF(3)
+        self.assertEqual(necklace_sum(Integer(2), Integer(3)), 3*2)
+        self.assertEqual(necklace_sum(Integer(3), Integer(2)), 2*3)
+        self.assertEqual(necklace_sum(Integer(4), Integer(1)), 4)
+
+    def test_euler_polynomial_factor(self):
+        # phi_2(x^3 - 1) = (2 - 1) * (2^2 - 1)
+        self.assertEqual(euler_polynomial_factor(Integer(2), Integer(1)), 1)
+        self.assertEqual(euler_polynomial_factor(Integer(2), Integer(3)), 3)
+        self.assertEqual(euler_polynomial(Integer(2), Integer(1), Integer(3)), 3)
+
+    def test_omega_theta(self):
+        import math
+        for p, e, n in [(2, 1, 12), (3, 2, 40), (5, 1, 36), (7, 1, 98)]:
+            lattice = omega_theta(Integer(p), Integer(e), Integer(n))
+            for d, (omega, theta, log_theta) in lattice.items():
+                self.assertEqual(omega, omega_d(d, p, e, n))
+                self.assertEqual(theta, theta_d(d, p, e, n))
+                self.assertAlmostEqual(log_theta, math.log(theta))
+
     def test_u_qn(self):
         self.assertGreaterEqual(
             12,
@@ -41,8 +76,8 @@ class FiniteFieldTheoryTestCase(TestCase):
 
     def test_lower_euler_phi(self):
         for p in primes(50):
-            for e in xrange(5):
-                for n in xrange(5):
+            for e in range(5):
+                for n in range(5):
                     self.assertGreaterEqual(
                         euler_phi(p**(e*n)-1),
                         lower_euler_phi(p**(e*n)-1)
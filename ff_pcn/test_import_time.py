@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""
+Test for import time and import side effects of ff_pcn.
+"""
+
+import os
+import re
+import subprocess
+import sys
+from unittest import TestCase
+
+
+IMPORT_TIME_BUDGET = {
+    'ff_pcn': 0.05,
+    'ff_pcn.yafu': 0.25,
+    'ff_pcn.database': 0.25,
+    'ff_pcn.factorer': 0.25,
+    'ff_pcn.finite_field_extension': 0.25,
+    'ff_pcn.pcn_existence_checker': 0.25,
+}
+"""Budget of cumulative import time in seconds measured by python -X importtime."""
+
+HEAVY_MODULES = ['sage', 'sage.all', 'requests']
+
+
+def import_time(module):
+    """
+    Returns cumulative import time in seconds of module in a fresh interpreter
+    and the list of heavy modules loaded by importing it.
+    """
+    code = 'import sys, %s; print(",".join(m for m in %r if m in sys.modules))' % (module, HEAVY_MODULES)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.abspath(os.path.join(__file__, '../../'))
+    proc = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+    )
+    out, err = proc.communicate()
+    assert proc.returncode == 0, err
+    match = re.search(r'\|\s*(\d+)\s*\|\s*%s\s*$' % re.escape(module), err.decode(), re.MULTILINE)
+    return int(match.group(1)) * 1e-6, [m for m in out.decode().strip().split(',') if m]
+
+
+class ImportTimeTestCase(TestCase):
+
+    def test_import_time_budget(self):
+        for module, budget in sorted(IMPORT_TIME_BUDGET.items()):
+            seconds, heavy = import_time(module)
+            self.assertLess(seconds, budget, module)
+            self.assertEqual(heavy, [], module)
+
+    def test_no_import_side_effects(self):
+        code = '\n'.join([
+            'import sys',
+            'path = list(sys.path)',
+            'import ff_pcn.pcn_existence_checker, ff_pcn.factorer, ff_pcn.database, ff_pcn.datastore',
+            'assert sys.path == path',
+            'assert ff_pcn.factorer._factorer is None',
+            'assert ff_pcn.database._database is None',
+            'assert ff_pcn.datastore._datastore is None',
+        ])
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.abspath(os.path.join(__file__, '../../'))
+        subprocess.check_call([sys.executable, '-c', code], env=env)
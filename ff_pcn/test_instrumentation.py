@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""
+Test for instrumentation.
+"""
+
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn.instrumentation import Instrumentation, get_instrumentation, load_triples, merge_reports, save_at_exit
+
+
+def _record(n):
+    with get_instrumentation().triple(2, 1, n):
+        pass
+
+
+class InstrumentationTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_triple(self):
+        instrumentation = Instrumentation()
+        with instrumentation.timer('outside'):
+            pass
+        with instrumentation.triple(2, 1, 6):
+            with instrumentation.timer('criterion_1'):
+                instrumentation.count('candidates', 3)
+            with instrumentation.timer('criterion_1'):
+                pass
+            instrumentation.annotate('decided_by', 1)
+        instrumentation.annotate('decided_by', 2)
+        self.assertEqual(instrumentation.stages['criterion_1'].count, 2)
+        self.assertEqual(instrumentation.counters['candidates'], 3)
+        record, = instrumentation.triples
+        self.assertEqual((record['p'], record['e'], record['n'], record['decided_by']), (2, 1, 6, 1))
+        self.assertEqual(list(record['stages']), ['criterion_1'])
+        self.assertEqual(record['counters'], {'candidates': 3})
+
+    def test_max_triples(self):
+        instrumentation = Instrumentation(max_triples=2)
+        for n in (4, 5, 6):
+            with instrumentation.triple(2, 1, n):
+                pass
+        self.assertEqual([record['n'] for record in instrumentation.triples], [5, 6])
+
+    def test_profile(self):
+        instrumentation = Instrumentation(profile=(3, 1, 4), profile_folder=self.tmpdir)
+        with instrumentation.triple(2, 1, 4):
+            pass
+        with instrumentation.triple(3, 1, 4):
+            sum(range(1000))
+        self.assertEqual(os.listdir(self.tmpdir), ['profile_3_1_4.prof'])
+
+    def test_merge_reports(self):
+        for pid, triples in [(1, [(2, 1, 6), (3, 1, 6)]), (2, [(5, 1, 6)])]:
+            instrumentation = Instrumentation()
+            instrumentation.pid = pid
+            for p, e, n in triples:
+                with instrumentation.triple(p, e, n):
+                    with instrumentation.timer('u_qn'):
+                        pass
+            instrumentation.save(self.tmpdir)
+        report = merge_reports(self.tmpdir)
+        self.assertEqual(report['total']['stages']['u_qn']['count'], 3)
+        self.assertEqual(sorted(report['workers']), [1, 2])
+        with open(os.path.join(self.tmpdir, 'report.json')) as fp:
+            self.assertEqual(json.load(fp)['total']['triples'], 3)
+        with open(os.path.join(self.tmpdir, 'triples.csv')) as fp:
+            rows = list(csv.DictReader(fp))
+        self.assertEqual([(r['p'], r['n']) for r in rows], [('2', '6'), ('3', '6'), ('5', '6')])
+
+    def test_checkpoint(self):
+        instrumentation = Instrumentation()
+        for n in range(3):
+            with instrumentation.triple(2, 1, n + 4):
+                pass
+            instrumentation.checkpoint(self.tmpdir, interval=2)
+        with open(os.path.join(self.tmpdir, 'worker_%d.json' % instrumentation.pid)) as fp:
+            self.assertEqual(len(json.load(fp)['triples']), 2)
+
+    def test_save_at_exit(self):
+        pool = multiprocessing.Pool(2, initializer=save_at_exit, initargs=(self.tmpdir,))
+        pool.map(_record, range(4, 12), chunksize=1)
+        pool.close()
+        pool.join()
+        self.assertEqual(sorted(t['n'] for t in load_triples(self.tmpdir)), list(range(4, 12)))
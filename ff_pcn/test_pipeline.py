@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""
+Test for pipeline.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn import factorer, power_factorizations, prime_cache
+from ff_pcn import pipeline as pipeline_module
+from ff_pcn.pcn_existence_checker import check_p_n
+from ff_pcn.pipeline import Pipeline, plan, take_factorer_queue
+from ff_pcn.sweep_coordinator import ResultCollector, SweepQueue
+
+
+def _failing_stage(checker):
+    if checker.p == 3:
+        raise ValueError('broken triple')
+    return True, 'checked'
+
+
+class PipelineTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = power_factorizations._store
+        power_factorizations._store = power_factorizations.PowerFactorizationStore(path=None)
+        self.prime_cache = prime_cache._prime_cache
+        prime_cache._prime_cache = prime_cache.PrimeCache(path=None)
+
+    def tearDown(self):
+        power_factorizations._store = self.store
+        prime_cache._prime_cache = self.prime_cache
+        shutil.rmtree(self.tmpdir)
+
+    def test_run(self):
+        triples = list(plan(20, 36))
+        expected = ResultCollector()
+        long_jobs = os.path.join(self.tmpdir, 'long_jobs')
+        for p, e, n in triples:
+            if e == 1:
+                check_p_n((p, n), budget=0, database=expected, long_job_queue=long_jobs)
+        collector = ResultCollector()
+        pipeline_jobs = os.path.join(self.tmpdir, 'pipeline_jobs')
+        pipeline = Pipeline(cheap=2, maxsize=2, budget=0, database=collector,
+                            yafu_batch=os.path.join(self.tmpdir, 'batch'), long_job_queue=pipeline_jobs)
+        self.assertEqual(pipeline.run(iter(triples)), len(triples))
+        self.assertEqual(sorted(collector.results), sorted(expected.results))
+        self.assertEqual(pipeline.failed, {})
+        # Deferred searches are submitted to the long-job queue of the pipeline like by check_triple
+        deferred = [r for r in expected.results if r[3].endswith('False deferred')]
+        self.assertTrue(deferred)
+        self.assertEqual(SweepQueue(pipeline_jobs).status()['pending'], len(deferred))
+        self.assertEqual(sorted(os.listdir(os.path.join(pipeline_jobs, 'pending'))),
+                         sorted(os.listdir(os.path.join(long_jobs, 'pending'))))
+
+    def test_run_failing_triple(self):
+        triples = [(2, 1, 22), (3, 1, 22), (5, 1, 22)]
+        collector = ResultCollector()
+        pipeline = Pipeline(cheap=1, factoring=0, search=0, maxsize=1, database=collector,
+                            yafu_batch=os.path.join(self.tmpdir, 'batch'), long_job_queue=None)
+        stages = pipeline_module.STAGES
+        pipeline_module.STAGES = [('cheap', _failing_stage)]
+        try:
+            self.assertEqual(pipeline.run(iter(triples)), 2)
+        finally:
+            pipeline_module.STAGES = stages
+        self.assertEqual(sorted(r[:3] for r in collector.results), [[2, 1, 22], [5, 1, 22]])
+        self.assertEqual(pipeline.failed, {(3, 1, 22): 'ValueError: broken triple'})
+
+    def test_take_factorer_queue(self):
+        global_factorer = factorer._factorer
+        factorer._factorer = factorer.Factorer(frozen=True)
+        try:
+            # Phi_20(2 * 101^2) splits into two Aurifeuillian cofactors
+            self.assertIsNone(factorer._factorer.get((20, 20402)))
+            self.assertEqual(take_factorer_queue(), [(20, 20402, 34310029616421001), (20, 20402, 174980981208847841)])
+            self.assertEqual(take_factorer_queue(), [])
+        finally:
+            factorer._factorer = global_factorer
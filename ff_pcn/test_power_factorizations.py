@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""
+Test for power_factorizations.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn import factorer, prime_cache
+from ff_pcn.backend import factor, primes
+from ff_pcn.power_factorizations import PowerFactorizationStore
+
+
+class PowerFactorizationStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'store.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_factor(self):
+        store = PowerFactorizationStore(path=None)
+        for p in primes(30):
+            for m in range(1, 13):
+                self.assertEqual(store.factor(p, m, use_factorer=False), list(factor(p**m - 1)))
+        self.assertIn((2, 12), store.power)
+        self.assertIn((12, 2), store.cyclotomic)
+
+    def test_shared_file(self):
+        store = PowerFactorizationStore(path=self.path)
+        fac = store.factor(3, 24, use_factorer=False)
+        other = PowerFactorizationStore(path=self.path)
+        self.assertEqual(other._lookup('power', other.power, (3, 24)), fac)
+        self.assertEqual(other._lookup('cyclotomic', other.cyclotomic, (8, 3)), [(2, 1), (41, 1)])
+        self.assertEqual(other.factor(3, 8, use_factorer=False), list(factor(3**8 - 1)))
+
+    def test_known_cyclotomic_factorization(self):
+        global_factorer, global_prime_cache = factorer._factorer, prime_cache._prime_cache
+        factorer._factorer = factorer.Factorer(frozen=True)
+        prime_cache._prime_cache = prime_cache.PrimeCache(path=None)
+        try:
+            store = PowerFactorizationStore(path=None)
+            self.assertEqual(store.known_cyclotomic_factorization(1, 2), [])
+            self.assertEqual(store.known_cyclotomic_factorization(6, 7), [(43, 1)])
+            self.assertEqual(store.known_cyclotomic_factorization(97, 2), [(11447, 1), (13842607235828485645766393, 1)])
+            # Unknown values are neither split nor queued
+            self.assertIsNone(store.known_cyclotomic_factorization(20, 20402))
+            self.assertEqual(factorer._factorer.queue, [])
+        finally:
+            factorer._factorer, prime_cache._prime_cache = global_factorer, global_prime_cache
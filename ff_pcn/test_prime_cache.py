@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+"""
+Test for prime_cache.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn.prime_cache import PrimeCache, prove
+
+
+class PrimeCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_prove(self):
+        self.assertEqual(prove(4649), (4649, 'deterministic'))
+        self.assertEqual(prove(2**127 - 1), (2**127 - 1, 'bpsw'))
+        self.assertEqual(prove(1111111), (1111111, None))
+
+    def test_persistent(self):
+        path = os.path.join(self.tmpdir, 'primes.sqlite')
+        cache = PrimeCache(path)
+        self.assertEqual(cache.prove_all([239, 4649, 1111111, 2**127 - 1], processes=1),
+                         {239: True, 4649: True, 1111111: False, 2**127 - 1: True})
+        self.assertTrue(cache.verify([(239, 1), (4649, 2)]))
+        self.assertFalse(cache.verify([239, 1111111]))
+
+        loaded = PrimeCache(path)
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(loaded.proof(2**127 - 1), 'bpsw')
+        self.assertIsNone(loaded.proof(1111111))
+
+    def test_parallel(self):
+        cache = PrimeCache(None)
+        numbers = list(range(10**6, 10**6 + 500))
+        is_prime = cache.prove_all(numbers, processes=2)
+        self.assertEqual(sum(is_prime.values()), len(cache))
+        self.assertEqual(sum(is_prime.values()), 39)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""
+Test for pure_number_theory.
+"""
+
+import subprocess
+import sys
+import os
+from fractions import Fraction
+from unittest import TestCase
+from ff_pcn.pure_number_theory import (
+    cyclotomic_value,
+    divisors,
+    euler_phi,
+    factor,
+    is_prime,
+    log,
+    moebius,
+    pollard_rho,
+    prime_divisors,
+    primes,
+)
+
+
+def _is_prime_naive(n):
+    return n > 1 and all(n % d for d in range(2, int(n**0.5) + 1))
+
+
+class PureNumberTheoryTestCase(TestCase):
+
+    def test_is_prime(self):
+        for n in range(-5, 3000):
+            self.assertEqual(is_prime(n), _is_prime_naive(n), n)
+        self.assertTrue(is_prime(2**89 - 1))
+        self.assertFalse(is_prime(2**83 - 1))
+        self.assertFalse(is_prime(3825123056546413051))
+        self.assertTrue(is_prime(4343952637722706853771280086533392805261))
+
+    def test_primes(self):
+        self.assertEqual(list(primes(20)), [2, 3, 5, 7, 11, 13, 17, 19])
+        self.assertEqual(list(primes(10, 30)), [11, 13, 17, 19, 23, 29])
+        self.assertEqual(list(primes(2)), [])
+
+    def test_factor(self):
+        for n in range(1, 3000):
+            facs = factor(n)
+            self.assertTrue(all(is_prime(p) for p, _ in facs))
+            self.assertEqual(n, eval('*'.join(['1'] + ['%d**%d' % f for f in facs])))
+        self.assertEqual(factor(2**64 + 1), [(274177, 1), (67280421310721, 1)])
+        self.assertEqual(factor(1000000007**2 * 998244353), [(998244353, 1), (1000000007, 2)])
+
+    def test_pollard_rho(self):
+        n = 1000003 * 1000033
+        self.assertIn(pollard_rho(n, seed=1), [1000003, 1000033])
+
+    def test_divisors(self):
+        self.assertEqual(divisors(1), [1])
+        self.assertEqual(divisors(12), [1, 2, 3, 4, 6, 12])
+        self.assertEqual(prime_divisors(360), [2, 3, 5])
+
+    def test_moebius_euler_phi(self):
+        self.assertEqual([moebius(n) for n in range(1, 11)], [1, -1, -1, 0, -1, 1, -1, 0, 0, 1])
+        for n in range(1, 300):
+            self.assertEqual(euler_phi(n), len([k for k in range(1, n + 1) if Fraction(k, n).denominator == n]))
+
+    def test_cyclotomic_value(self):
+        self.assertEqual(cyclotomic_value(1, 5), 4)
+        self.assertEqual(cyclotomic_value(6, 2), 3)
+        self.assertEqual(cyclotomic_value(12, 3), 73)
+        self.assertEqual(cyclotomic_value(9, 1), 3)
+        self.assertEqual(cyclotomic_value(6, 1), 1)
+        self.assertEqual(cyclotomic_value(7, 0), 1)
+        for n in range(1, 50):
+            self.assertEqual(
+                2**n - 1,
+                eval('*'.join(str(cyclotomic_value(d, 2)) for d in divisors(n)))
+            )
+
+    def test_log(self):
+        self.assertAlmostEqual(log(10**400), 400 * log(10))
+        self.assertAlmostEqual(log(Fraction(10**400 + 1, 10**401)), -log(10))
+        self.assertEqual(log(0), float('-inf'))
+
+
+class CriteriaWithoutSageTestCase(TestCase):
+
+    def test_criteria_without_sage(self):
+        code = '\n'.join([
+            'import sys',
+            'from ff_pcn import power_factorizations',
+            'power_factorizations._store = power_factorizations.PowerFactorizationStore(path=None)',
+            'from ff_pcn.finite_field_extension import FiniteFieldExtension',
+            'ff = FiniteFieldExtension(3, 2, 10)',
+            'assert not any([ff.pcn_criterion_1(), ff.pcn_criterion_2(), ff.pcn_criterion_3(), ff.pcn_criterion_4()])',
+            'assert ff.pcn_criterion_5()',
+            'assert FiniteFieldExtension(7, 1, 10).pcn_criterion_4()',
+            'assert "sage" not in sys.modules',
+        ])
+        env = dict(os.environ, FF_PCN_BACKEND='pure')
+        env['PYTHONPATH'] = os.path.abspath(os.path.join(__file__, '../../'))
+        subprocess.check_call([sys.executable, '-c', code], env=env)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""
+Test for shared_tables.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn.backend import cyclotomic_value, factor, gcd, primes
+from ff_pcn import basic_number_theory
+from ff_pcn.shared_tables import SharedTables, attach_shared_tables, build_shared_tables, detach_shared_tables, get_shared_tables
+
+
+def _worker_ordn(mq):
+    return get_shared_tables().ordn(*mq)
+
+
+class SharedTablesTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'tables')
+        cyclotomic = [((d, p), list(factor(cyclotomic_value(d, p)))) for p in primes(10) for d in range(2, 20)]
+        build_shared_tables(self.path, sieve_bound=1000, order_bound=60, cyclotomic=cyclotomic)
+        self.tables = SharedTables(self.path)
+
+    def tearDown(self):
+        self.tables.close()
+        detach_shared_tables()
+        shutil.rmtree(self.tmpdir)
+
+    def test_factor(self):
+        for n in range(2, 1001):
+            self.assertEqual(self.tables.factor(n), list(factor(n)))
+
+    def test_ordn(self):
+        for m in range(1, 61):
+            for q in range(1, 3*m):
+                expected = basic_number_theory._ordn.uncached(m, q)
+                self.assertEqual(self.tables.ordn(m, q), expected, (m, q))
+
+    def test_cyclotomic_factorization(self):
+        for p in primes(10):
+            for d in range(2, 20):
+                self.assertEqual(self.tables.cyclotomic_factorization(d, p), list(factor(cyclotomic_value(d, p))))
+        self.assertIsNone(self.tables.cyclotomic_factorization(20, 2))
+        self.assertIsNone(self.tables.cyclotomic_factorization(2, 11))
+
+    def test_attached(self):
+        attach_shared_tables(self.path)
+        self.assertEqual(basic_number_theory.ordn(49, 2), 21)
+        self.assertEqual(basic_number_theory.squarefree(360), 30)
+        pool = multiprocessing.Pool(2, initializer=attach_shared_tables, initargs=(self.path,))
+        mqs = [(m, q) for m in range(1, 61) for q in range(2, 10) if gcd(m, q) == 1]
+        self.assertEqual(pool.map(_worker_ordn, mqs), [self.tables.ordn(m, q) for m, q in mqs])
+        pool.close()
+        pool.join()
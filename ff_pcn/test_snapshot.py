@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+"""
+Test for snapshot.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn.factor_corpus import FactorCorpus
+from ff_pcn.snapshot import Snapshot, deciding_criterion, export
+
+
+class SnapshotTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmpdir, 'range'))
+        with open(os.path.join(self.tmpdir, 'range', 'pcns_2.csv'), 'w') as fp:
+            fp.write('p,n,poly,factorization\n2,2,x^2 + x + 1,3\n2,4,x^4 + x^3 + 1,3 * 5\n')
+        with open(os.path.join(self.tmpdir, 'criterions_1_6.csv'), 'w') as fp:
+            fp.write('p, e, n, C1, C2, C3, C4, C5, C6\n'
+                     '2, 1, 6, False, False, False, False, False, x^6 + x^5 + x^4 + x + 1\n'
+                     '2, 2, 6, False, True, True,,,\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_deciding_criterion(self):
+        self.assertEqual(deciding_criterion(['False', 'True', 'True', '', '', '']), 2)
+        self.assertEqual(deciding_criterion(['False'] * 5 + ['x^6 + x + 1']), 6)
+        self.assertEqual(deciding_criterion(['False'] * 5 + ['']), 0)
+
+    def test_export_and_read(self):
+        corpus = FactorCorpus()
+        corpus.add(2353, [(13, 1), (181, 1)])
+        corpus.add(1000, [(2, 3), (5, 3)])
+        path = os.path.join(self.tmpdir, 'snapshot.ffs')
+        export(path, final_folder=self.tmpdir, corpus=corpus)
+
+        snapshot = Snapshot(path)
+        self.assertEqual(snapshot.tables(), ['criterions', 'factorizations', 'pcns'])
+        self.assertEqual(list(snapshot.column('pcns', 'n')), [2, 4])
+        self.assertEqual(
+            snapshot.row('pcns', 1),
+            {'p': 2, 'e': 1, 'n': 4, 'criterion': 0, 'poly': 'x^4 + x^3 + 1', 'factorization': '3 * 5'}
+        )
+        self.assertEqual(list(snapshot.column('criterions', 'criterion')), [6, 2])
+        self.assertEqual(snapshot.find('criterions', 2, 1, 6)['poly'], 'x^6 + x^5 + x^4 + x + 1')
+        self.assertIsNone(snapshot.find('criterions', 3, 1, 6))
+        self.assertEqual(snapshot.factorization(1000), [(2, 3), (5, 3)])
+        self.assertIsNone(snapshot.factorization(1001))
+        self.assertEqual(len(list(snapshot.iterrows('factorizations'))), 2)
+        snapshot.close()
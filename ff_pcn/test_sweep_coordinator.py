@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""
+Test for sweep_coordinator.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from ff_pcn.database import Database
+from ff_pcn.sweep_coordinator import SweepQueue, run_worker
+
+
+def _run_unit(unit):
+    p, n = unit['args']
+    return [[p, 1, n, '(%d, 1, %d) => regular' % (p, n)]]
+
+
+def _run_unit_failing(unit):
+    if unit['args'][0] == 3:
+        raise ValueError('broken unit')
+    return _run_unit(unit)
+
+
+class SweepQueueTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmpdir, 'queue')
+        self.result_folder = os.path.join(self.tmpdir, 'result')
+        os.makedirs(self.result_folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_lease_complete(self):
+        queue = SweepQueue(self.folder)
+        self.assertTrue(queue.submit('existence', (2, 5)))
+        self.assertTrue(queue.submit('existence', (3, 5)))
+        self.assertFalse(queue.submit('existence', (2, 5)))
+        first = queue.lease()
+        second = queue.lease()
+        self.assertIsNone(queue.lease())
+        self.assertEqual((first['args'], second['args']), ([2, 5], [3, 5]))
+        self.assertEqual(queue.status(), {'pending': 0, 'leased': 2, 'done': 0, 'collected': 0, 'failed': 0})
+        self.assertTrue(queue.complete(first, _run_unit(first), worker='a'))
+        self.assertFalse(queue.finished())
+        self.assertTrue(queue.complete(second, _run_unit(second), worker='a'))
+        self.assertTrue(queue.finished())
+        self.assertEqual(queue.collect(Database(self.result_folder)), 2)
+        with open(os.path.join(self.result_folder, 'ex_5.txt')) as fp:
+            self.assertEqual(fp.read().splitlines(), ['(2, 1, 5) => regular', '(3, 1, 5) => regular'])
+
+    def test_reclaim_and_duplicates(self):
+        queue = SweepQueue(self.folder, lease_time=0.2)
+        queue.submit('existence', (2, 7))
+        slow = queue.lease()
+        self.assertEqual(queue.reclaim(), 0)
+        time.sleep(0.3)
+        fast = queue.lease()
+        self.assertEqual(fast['name'], slow['name'])
+        self.assertTrue(queue.complete(fast, _run_unit(fast), worker='fast'))
+        self.assertFalse(queue.complete(slow, _run_unit(slow), worker='slow'))
+        queue.collect(Database(self.result_folder))
+        self.assertFalse(queue.complete(slow, _run_unit(slow), worker='slow'))
+        self.assertEqual(queue.status(), {'pending': 0, 'leased': 0, 'done': 0, 'collected': 1, 'failed': 0})
+
+    def test_run_worker(self):
+        queue = SweepQueue(self.folder)
+        for p in (2, 3, 5, 7):
+            queue.submit('existence', (p, 11))
+        self.assertEqual(run_worker(self.folder, poll=0, run_unit=_run_unit), 4)
+        self.assertEqual(queue.status()['done'], 4)
+
+    def test_collect_search(self):
+        database = Database(self.result_folder)
+        database.add(2, 1, 13, '(2, 1, 13) => False partial 100')
+        queue = SweepQueue(self.folder)
+        queue.submit('search', (2, 1, 13, 100))
+        unit = queue.lease()
+        queue.complete(unit, [[2, 1, 13, '(2, 1, 13) => found x']], worker='a')
+        self.assertEqual(queue.collect(database), 1)
+        with open(os.path.join(self.result_folder, 'ex_13.txt')) as fp:
+            self.assertEqual(fp.read().splitlines(), ['(2, 1, 13) => found x'])
+
+    def test_run_worker_failing_unit(self):
+        queue = SweepQueue(self.folder)
+        for p in (2, 3, 5):
+            queue.submit('existence', (p, 11))
+        self.assertEqual(run_worker(self.folder, poll=0, run_unit=_run_unit_failing), 2)
+        self.assertEqual(queue.status(), {'pending': 0, 'leased': 0, 'done': 2, 'collected': 0, 'failed': 1})
+        with open(queue.path('failed', 'existence_3_11')) as fp:
+            self.assertEqual(json.load(fp)['error'], 'ValueError: broken unit')
+        self.assertFalse(queue.submit('existence', (3, 11)))
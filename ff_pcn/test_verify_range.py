@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""
+Test for verify_range.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ff_pcn import prime_cache
+from ff_pcn.verify_range import check_factorization, parse_factorization, range_files, read_rows, summary, verify, verify_row
+
+
+def _verify_factorization(row):
+    p, n, poly, factorization = row
+    return p, n, [] if check_factorization(p, n, parse_factorization(factorization)) else ['factorization']
+
+
+class VerifyRangeTestCase(TestCase):
+
+    def setUp(self):
+        self.prime_cache = prime_cache._prime_cache
+        prime_cache._prime_cache = prime_cache.PrimeCache(path=None)
+        self.tmpdir = tempfile.mkdtemp()
+        self.fil = os.path.join(self.tmpdir, 'pcns_3.csv')
+        with open(self.fil, 'w') as fp:
+            fp.write('\n'.join([
+                'p,n,poly,factorization',
+                '3,2,x^2 + x + 2,2^3',
+                '3,3,x^3 + x^2 + 2,2 * 13',
+                '3,4,x^4 + x^3 + 2,2^3 * 10',
+                '3,5,x^5 + x^4 + 2,2 * 11^2',
+            ]))
+
+    def tearDown(self):
+        prime_cache._prime_cache = self.prime_cache
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse_factorization(self):
+        self.assertEqual(parse_factorization('2^5 * 3^2 * 5 * 101'), [(2, 5), (3, 2), (5, 1), (101, 1)])
+        self.assertEqual(parse_factorization('7'), [(7, 1)])
+
+    def test_check_factorization(self):
+        self.assertTrue(check_factorization(3, 4, [(2, 4), (5, 1)]))
+        self.assertIn(5, prime_cache._prime_cache)
+        self.assertFalse(check_factorization(3, 4, [(2, 3), (10, 1)]))
+        self.assertFalse(check_factorization(3, 4, [(2, 4)]))
+
+    def test_verify_row_error(self):
+        self.assertEqual(verify_row((3, 4, 'x^4 + x^3 + 2', '2^3 * ten')), (3, 4, ['error']))
+
+    def test_published_factorizations(self):
+        files = range_files()
+        self.assertEqual(os.path.basename(files[0]), 'pcns_2.csv')
+        for p, n, poly, factorization in read_rows(files[:20]):
+            self.assertTrue(check_factorization(p, n, parse_factorization(factorization)), (p, n))
+
+    def test_verify_resume(self):
+        log = os.path.join(self.tmpdir, 'log.csv')
+        with open(log, 'w') as fp:
+            fp.write('3,2,\n')
+        self.assertEqual([row[:2] for row in read_rows([self.fil], done={(3, 2): []})], [(3, 3), (3, 4), (3, 5)])
+        results = verify([self.fil], log=log, processes=2, verify_row=_verify_factorization)
+        self.assertEqual(results, {(3, 2): [], (3, 3): [], (3, 4): ['factorization'], (3, 5): []})
+        with open(log) as fp:
+            self.assertEqual(len(fp.readlines()), 4)
+        self.assertEqual(summary(results).splitlines(), ['verified: 4, failed: 1', 'factorization: 1', '(3, 4): factorization'])
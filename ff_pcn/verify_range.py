@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+"""
+Module verifying the published PCN polynomials of final/range/pcns_<p>.csv.
+
+Every row (p, n, poly, factorization) is checked on a process pool:
+  - factorization: the given factorization consists of primes and equals p^n - 1,
+  - degree and irreducibility of poly,
+  - primitivity of the root, using the given factorization,
+  - complete normality of the root.
+A row raising an exception (e.g. unparsable polynomial) is recorded as failed with 'error'.
+
+Results are appended to a log file as they arrive, so an interrupted run
+resumes with the rows not yet in the log.
+
+Usage:
+    python ff_pcn/verify_range.py [FILE ...] [--log FILE] [--processes N]
+"""
+
+__author__ = "Stefan Hackenberg"
+
+
+import argparse
+import collections
+import csv
+import glob
+import logging
+import multiprocessing
+import os
+import sys
+
+
+RANGE_FOLDER = os.path.abspath(os.path.join(__file__, '../../final/range'))
+
+VERIFY_LOG = os.path.abspath(os.path.join(__file__, '../../result/verify_range.csv'))
+
+CHECKS = ['factorization', 'degree', 'irreducible', 'primitive', 'completely_normal', 'error']
+
+
+def parse_factorization(s):
+    """
+    Returns list of (prime, multiplicity) of a factorization like '2^3 * 3 * 5'.
+    """
+    ret = []
+    for pm in s.split('*'):
+        pm = pm.strip().split('^')
+        ret += [(int(pm[0]), int(pm[1]) if len(pm) > 1 else 1)]
+    return ret
+
+
+def range_files(folder=RANGE_FOLDER):
+    """
+    Returns all pcns_<p>.csv files of folder sorted by p.
+    """
+    return sorted(
+        glob.glob(os.path.join(folder, 'pcns_*.csv')),
+        key=lambda fil: int(os.path.basename(fil)[5:-4])
+    )
+
+
+def read_rows(files, done=()):
+    """
+    Yields rows (p, n, poly, factorization) of files, skipping (p, n) in done.
+    """
+    for fil in files:
+        with open(fil) as fp:
+            for row in csv.DictReader(fp):
+                p, n = int(row['p']), int(row['n'])
+                if (p, n) in done:
+                    continue
+                yield p, n, row['poly'], row['factorization']
+
+
+def check_factorization(p, n, facs):
+    """
+    Returns True if facs is a factorization of p^n - 1 into primes.
+    Primality is proven once per prime by the prime cache, see ff_pcn.prime_cache.
+    """
+    from ff_pcn.backend import prod
+    from ff_pcn.prime_cache import get_prime_cache
+    return prod(r**m for r, m in facs) == p**n - 1 and get_prime_cache().verify(facs, processes=1)
+
+
+def verify_row(row):
+    """
+    Verifies a row (p, n, poly, factorization).
+    Returns (p, n, failed checks), failed checks is ['error'] if the verification raised.
+    """
+    try:
+        return _verify_row(row)
+    except Exception:
+        logging.getLogger(__name__).exception('verify_row: (%s, %s) raised', row[0], row[1])
+        return row[0], row[1], ['error']
+
+
+def _verify_row(row):
+    from ff_pcn.backend import sage
+    from ff_pcn.field_cache import get_field_cache
+    from ff_pcn.finite_field_theory import completely_normal, is_primitive
+    from ff_pcn.instrumentation import get_instrumentation
+    instrumentation = get_instrumentation()
+    p, n, poly, factorization = row
+    failed = []
+    facs = parse_factorization(factorization)
+    with instrumentation.timer('verify.factorization'):
+        if not check_factorization(p, n, facs):
+            failed += ['factorization']
+
+    GF, PolynomialRing = sage().GF, sage().PolynomialRing
+    f = PolynomialRing(GF(p), 'x')(poly)
+    if f.degree() != n:
+        return p, n, failed + ['degree']
+    with instrumentation.timer('verify.irreducible'):
+        if not f.is_irreducible():
+            return p, n, failed + ['irreducible']
+    if 'factorization' not in failed:
+        with instrumentation.timer('verify.primitive'):
+            if not is_primitive(get_field_cache().field(p, n, f).gen(), facs):
+                failed += ['primitive']
+    with instrumentation.timer('verify.completely_normal'):
+        if not completely_normal(p, 1, n, f):
+            failed += ['completely_normal']
+    return p, n, failed
+
+
+def read_log(log):
+    """
+    Returns dict mapping (p, n) to failed checks of all rows in log.
+    """
+    ret = dict()
+    if not os.path.exists(log):
+        return ret
+    with open(log) as fp:
+        for row in csv.reader(fp):
+            ret[(int(row[0]), int(row[1]))] = row[2].split() if len(row) > 2 else []
+    return ret
+
+
+def summary(results):
+    """
+    Returns summary of dict (p, n) -> failed checks as string.
+    """
+    counts = collections.Counter(check for failed in results.values() for check in failed)
+    failures = sorted(pn for pn, failed in results.items() if failed)
+    lines = ['verified: %d, failed: %d' % (len(results), len(failures))]
+    lines += ['%s: %d' % (check, counts[check]) for check in CHECKS if counts[check]]
+    lines += ['(%d, %d): %s' % (p, n, ' '.join(results[(p, n)])) for p, n in failures]
+    return '\n'.join(lines)
+
+
+def verify(files=None, log=VERIFY_LOG, processes=None, chunksize=4, verify_row=verify_row):
+    """
+    Verifies all rows of files not yet in log on a pool and appends the results to log.
+    Returns dict (p, n) -> failed checks of all rows in log.
+    """
+    results = read_log(log)
+    rows = read_rows(files or range_files(), done=results)
+    if not os.path.exists(os.path.dirname(log)):
+        os.makedirs(os.path.dirname(log))
+    pool = multiprocessing.Pool(processes or multiprocessing.cpu_count())
+    try:
+        with open(log, 'a') as fp:
+            writer = csv.writer(fp)
+            for p, n, failed in pool.imap_unordered(verify_row, rows, chunksize=chunksize):
+                writer.writerow([p, n, ' '.join(failed)])
+                fp.flush()
+                results[(p, n)] = failed
+                if failed:
+                    logging.getLogger(__name__).critical('verify: (%d, %d) failed %s', p, n, failed)
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*', help='Files to verify, default all of final/range.')
+    parser.add_argument('--log', default=VERIFY_LOG)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    print(summary(verify(args.files, log=args.log, processes=args.processes)))
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath(os.path.join(__file__, '../../')))
+    logging.basicConfig(level=logging.INFO)
+    main()
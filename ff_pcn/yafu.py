@@ -15,6 +15,7 @@ import logging
 import multiprocessing
 import argparse
 import shutil
+from ff_pcn.instrumentation import get_instrumentation
 
 
 YAFU_WORK_FOLDER = './yafu_job'
@@ -58,10 +59,12 @@ def factor_with_yafu(nb,
         )
 
         try:
-            proc.communicate(timeout=timeout)
+            with get_instrumentation().timer('yafu'):
+                proc.communicate(timeout=timeout)
         except subprocess.TimeoutExpired:
             proc.kill()
             proc.communicate()
+            get_instrumentation().count('yafu.aborted')
             logging.critical('Abort %s %d', nb, num)
             if abort_append_to:
                 with open(abort_append_to, 'a') as fp:
@@ -71,6 +74,7 @@ def factor_with_yafu(nb,
                 out = open(tmpdir+'/out.txt').read()
             else:
                 out = '({0})/{0}'.format(num)
+            get_instrumentation().count('yafu.finished')
             logging.critical('Finished: %s, %s', nb, out)
             if factor_append_to:
                 with open(factor_append_to, 'a') as fp:
@@ -105,6 +109,7 @@ def main():
     TIMEOUT = args.timeout
     YAFU_ARGS = args.yafu_args.split()
     factor_batch_with_yafu(args.file)
+    logging.info('instrumentation:\n%s', get_instrumentation().report())
 
 
 if __name__ == '__main__':